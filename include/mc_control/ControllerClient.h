@@ -7,6 +7,7 @@
 #include <mc_control/client_api.h>
 
 #include <mc_rtc/Configuration.h>
+#include <mc_rtc/MessagePackView.h>
 #include <mc_rtc/gui/plot/types.h>
 #include <mc_rtc/gui/types.h>
 
@@ -111,8 +112,20 @@ protected:
   /** Kill the connection and data flow */
   void stop();
 
+  /** Handle a GUI state message
+   *
+   * This converts the state back to MessagePack, prefer the overload that
+   * takes the message as received from the server
+   */
   void handle_gui_state(mc_rtc::Configuration state);
 
+  /** Handle a GUI state message as received from the server
+   *
+   * The message is read in place, the elements are only converted to
+   * mc_rtc::Configuration when they change
+   */
+  void handle_gui_state(const char * data, size_t size);
+
   void handle_category(const std::vector<std::string> & parent,
                        const std::string & category,
                        const mc_rtc::Configuration & data);
@@ -447,6 +460,9 @@ protected:
    *
    * This should open a new plotting window with the provided title.
    *
+   * If the plot is active but has no new data in this message, end_plot() is
+   * called right after this.
+   *
    * \p id The plot id, this serves to disambiguate plots with the same title that are started right after closing the
    * previous one
    *
@@ -590,6 +606,46 @@ protected:
   mc_rtc::Configuration data_;
 
 private:
+  /** Last known state of an element */
+  struct WidgetState
+  {
+    std::string name;
+    /** MessagePack form of the element */
+    std::vector<char> raw;
+    /** Element converted from raw */
+    mc_rtc::Configuration data;
+    /** Stack id of the element */
+    int sid;
+  };
+
+  /** Last known state of a category */
+  struct CategoryState
+  {
+    std::string name;
+    std::vector<WidgetState> widgets;
+    std::vector<CategoryState> sub;
+  };
+
+  /** Elements received from the server */
+  CategoryState state_;
+  /** True if a keyframe was received */
+  bool has_state_ = false;
+  /** MessagePack form of the static data */
+  std::vector<char> data_raw_;
+  /** Sequence number of the last message */
+  uint64_t seq_ = 0;
+  /** True if every message since the last keyframe was received */
+  bool synced_ = false;
+
+  /** Update a category from a keyframe, the elements that did not change are kept as-is */
+  void load_category(CategoryState & category, const mc_rtc::MessagePackView & data);
+
+  /** Update the elements of a category that changed in a delta */
+  void load_delta(CategoryState & category, const mc_rtc::MessagePackView & data);
+
+  /** Handle the last known state of a category */
+  void handle_category_state(const std::vector<std::string> & parent, const CategoryState & category);
+
   /** Default implementations for widgets' creations display a warning message to the user */
   void default_impl(const std::string & type, const ElementId & id);
 
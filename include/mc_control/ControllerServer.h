@@ -12,7 +12,10 @@
 #include <nanomsg/pubsub.h>
 #include <nanomsg/reqrep.h>
 
+#include <condition_variable>
+#include <mutex>
 #include <string>
+#include <thread>
 #include <vector>
 
 namespace mc_control
@@ -37,29 +40,86 @@ struct MC_CONTROL_DLLAPI ControllerServer
    *
    * \param pull_bind_uri List of URI the PULL socket should bind to
    *
+   * \param keyframe_dt Period between two complete GUI states (keyframes),
+   * the messages in-between only hold the elements that changed
+   *
+   * \param threaded If true, the GUI messages are written and sent and the
+   * requests are received in separate threads, see publish() and
+   * handle_requests()
+   *
    * Check nanomsg documentation for supported protocols
    */
   ControllerServer(double dt,
                    double server_dt,
                    const std::vector<std::string> & pub_bind_uri,
-                   const std::vector<std::string> & pull_bind_uri);
+                   const std::vector<std::string> & pull_bind_uri,
+                   double keyframe_dt = 1.0,
+                   bool threaded = false);
 
   ~ControllerServer();
 
-  /** Handle requests made by the GUI users */
+  /** Handle requests made by the GUI users
+   *
+   * If the server is threaded, this only handles the requests already
+   * received by the server thread. Otherwise, this handles a bounded number
+   * of the pending requests, the others are handled on the next call
+   */
   void handle_requests(mc_rtc::gui::StateBuilder & gui_builder);
 
-  /** Publish the current GUI state */
+  /** Publish the current GUI state
+   *
+   * If the server is threaded, this only takes a snapshot of the GUI state,
+   * the message is written and sent by the server thread
+   */
   void publish(mc_rtc::gui::StateBuilder & gui_builder);
 
 private:
   unsigned int iter_;
   unsigned int rate_;
+  /** Number of messages published between two keyframes */
+  unsigned int keyframe_rate_;
 
   int pub_socket_;
   int pull_socket_;
 
   std::vector<char> buffer_;
+
+  /** GUI published in the last message, a keyframe is sent when it changes */
+  mc_rtc::gui::StateBuilder * gui_ = nullptr;
+
+  /** True if a snapshot should be taken */
+  bool snapshot_ = false;
+  /** True if the next message should be a keyframe */
+  bool keyframe_ = false;
+
+  /** Server thread publishing the snapshots, not started if the server is not threaded */
+  std::thread thread_;
+  /** Server thread receiving the requests, not started if the server is not threaded */
+  std::thread receive_thread_;
+  bool running_ = true;
+  /** Protects the state shared with the server thread */
+  std::mutex mutex_;
+  std::condition_variable cv_;
+  /** GUI with a snapshot waiting to be published by the server thread */
+  mc_rtc::gui::StateBuilder * pending_gui_ = nullptr;
+  /** True if the pending snapshot should be published as a keyframe */
+  bool pending_keyframe_ = false;
+  /** Requests received by the server thread */
+  std::vector<mc_rtc::Configuration> requests_;
+  /** Requests being handled */
+  std::vector<mc_rtc::Configuration> handled_requests_;
+
+  /** Receive a request from the PULL socket
+   *
+   * \returns False if there is no more request to receive
+   */
+  bool receive_request(mc_rtc::Configuration & request);
+
+  /** Publication thread loop, wakes up when a snapshot is ready */
+  void run();
+
+  /** Reception thread loop, wakes up when requests are received */
+  void receive();
 };
 
 } // namespace mc_control
@@ -434,9 +434,15 @@ public:
     mc_rtc::Logger::Policy log_policy = mc_rtc::Logger::Policy::NON_THREADED;
     std::string log_directory;
     std::string log_template = "mc-control";
+    size_t log_buffer_size = mc_rtc::Logger::default_buffer_size;
+    size_t log_rotation_size = 0;
+    double log_rotation_duration = 0;
+    bool log_index = false;
 
     bool enable_gui_server = true;
     double gui_timestep = 0.05;
+    double gui_keyframe_timestep = 1.0;
+    bool gui_server_threaded = false;
     std::vector<std::string> gui_server_pub_uris{};
     std::vector<std::string> gui_server_rep_uris{};
 
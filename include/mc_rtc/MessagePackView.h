@@ -0,0 +1,143 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#pragma once
+
+#include <mc_rtc/utils_api.h>
+
+#include <cstddef>
+#include <cstdint>
+#include <string>
+
+namespace mc_rtc
+{
+
+/** Read-only view of a MessagePack object
+ *
+ * The view does not copy or decode the data, it only points into a buffer
+ * owned by someone else that must outlive the view. Nested objects are
+ * accessed through views into the same buffer.
+ *
+ * Accessing the data with the wrong type or out of bounds throws a
+ * std::runtime_error, so does creating a view of incomplete data.
+ */
+struct MC_RTC_UTILS_DLLAPI MessagePackView
+{
+  /** Type of the viewed object */
+  enum class Type
+  {
+    Nil = 0,
+    Bool,
+    Int,
+    UInt,
+    Float,
+    Double,
+    String,
+    Binary,
+    Array,
+    Map,
+    Extension
+  };
+
+  /** Iterate over the elements of an array or the keys and values of a map */
+  struct MC_RTC_UTILS_DLLAPI Iterator
+  {
+    MessagePackView operator*() const;
+    Iterator & operator++();
+    inline bool operator!=(const Iterator & rhs) const
+    {
+      return remaining_ != rhs.remaining_;
+    }
+
+  private:
+    friend struct MessagePackView;
+    Iterator(const char * data, const char * limit, size_t remaining);
+    const char * data_;
+    const char * limit_;
+    size_t remaining_;
+  };
+
+  /** View of the first object in [data, data + size) */
+  MessagePackView(const char * data, size_t size);
+
+  /** Type of the object */
+  inline Type type() const
+  {
+    return type_;
+  }
+
+  inline bool isNil() const
+  {
+    return type_ == Type::Nil;
+  }
+
+  /** Number of elements of an array or number of key-value pairs of a map, 0 for other types */
+  size_t size() const;
+
+  /** Access the i-th element of an array, this goes through the previous elements */
+  MessagePackView operator[](size_t i) const;
+
+  /** Access the value of a map with the given (string) key, this goes through the map */
+  MessagePackView operator()(const std::string & key) const;
+
+  /** True if this is a map that has the given (string) key */
+  bool has(const std::string & key) const;
+
+  /** First element of an array or first key of a map */
+  Iterator begin() const;
+
+  Iterator end() const;
+
+  /** Raw MessagePack data of the object */
+  inline const char * data() const
+  {
+    return data_;
+  }
+
+  /** Size of the raw MessagePack data of the object */
+  inline size_t bytes() const
+  {
+    return static_cast<size_t>(end_ - data_);
+  }
+
+  bool asBool() const;
+
+  /** Integer value, accepts unsigned integers that fit */
+  int64_t asInt() const;
+
+  /** Unsigned integer value, accepts positive integers */
+  uint64_t asUInt() const;
+
+  /** Floating-point value, accepts integers */
+  double asDouble() const;
+
+  /** Value of a string or binary object */
+  std::string asString() const;
+
+  /** True if the string or binary object has the given value, no copy involved */
+  bool equals(const std::string & value) const;
+
+  /** True if both objects have the same binary form */
+  bool operator==(const MessagePackView & rhs) const;
+
+  inline bool operator!=(const MessagePackView & rhs) const
+  {
+    return !(*this == rhs);
+  }
+
+private:
+  /** Start of the object */
+  const char * data_;
+  /** End of the object */
+  const char * end_;
+  /** End of the buffer the object belongs to */
+  const char * limit_;
+  Type type_;
+  /** Size of the type header */
+  size_t header_;
+  /** Number of elements (array), pairs (map) or bytes (string, binary and extension payload) */
+  uint64_t length_;
+};
+
+} // namespace mc_rtc
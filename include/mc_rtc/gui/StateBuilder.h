@@ -8,6 +8,9 @@
 #include <mc_rtc/gui/elements.h>
 #include <mc_rtc/gui/plot.h>
 
+#include <chrono>
+#include <memory>
+#include <mutex>
 #include <unordered_map>
 
 namespace mc_rtc
@@ -23,6 +26,37 @@ enum class ElementsStacking
   Horizontal
 };
 
+/** Type of a GUI message */
+enum class MessageType
+{
+  /** The message holds the complete state */
+  Keyframe = 0,
+  /** The message only holds the elements that changed since the previous message */
+  Delta
+};
+
+/** Describe how often an element or a plot is evaluated and published
+ *
+ * Elements are only sent to the client when they change, the rate limits how
+ * often their callbacks are called to check if they did
+ */
+struct MC_RTC_GUI_DLLAPI PublicationRate
+{
+  /** Published in every message, this is the default */
+  static PublicationRate Always();
+
+  /** Published at most once every period (in seconds) */
+  static PublicationRate Period(double period);
+
+  /** Published when added and then only after StateBuilder::notifyChange, this is not available for plots */
+  static PublicationRate OnChange();
+
+  /** Minimum time between two publications (in seconds) */
+  double period = 0;
+  /** True if the element is only published after StateBuilder::notifyChange */
+  bool onChange = false;
+};
+
 /** Used to build a GUI state from multiple objects */
 struct MC_RTC_GUI_DLLAPI StateBuilder
 {
@@ -36,7 +70,7 @@ struct MC_RTC_GUI_DLLAPI StateBuilder
    * - Adding fields to an existing Element
    * - Adding an Element type
    */
-  static constexpr int8_t PROTOCOL_VERSION = 2;
+  static constexpr int8_t PROTOCOL_VERSION = 3;
 
   /** Constructor */
   StateBuilder();
@@ -223,15 +257,84 @@ struct MC_RTC_GUI_DLLAPI StateBuilder
   /** Remove a plot identified by the provided name */
   void removePlot(const std::string & name);
 
+  /** Set the publication rate of an element
+   *
+   * \param category Category of the element
+   *
+   * \param name Name of the element
+   *
+   * \param rate Publication rate, the element is published in the next
+   * message regardless
+   */
+  void setPublicationRate(const std::vector<std::string> & category, const std::string & name, PublicationRate rate);
+
+  /** Set the publication rate of a plot
+   *
+   * When the plot is not due, the message only tells the client that the plot
+   * is still active
+   *
+   * \param name Name of the plot
+   *
+   * \param rate Publication rate, PublicationRate::OnChange() is not allowed
+   */
+  void setPlotPublicationRate(const std::string & name, PublicationRate rate);
+
+  /** Publish an element in the next message regardless of its publication rate
+   *
+   * This is how elements with the PublicationRate::OnChange() rate are updated
+   */
+  void notifyChange(const std::vector<std::string> & category, const std::string & name);
+
   /** Update the GUI message
    *
-   * \param data Will hold binary data representing the GUI
+   * \param data Will hold binary data representing the complete GUI state (keyframe)
    *
    * \returns Effective size of the GUI message
    *
    */
   size_t update(std::vector<char> & data);
 
+  /** Update the GUI message
+   *
+   * Every element that is due according to its PublicationRate is evaluated
+   * but, unless a keyframe is requested, only the elements whose binary form
+   * changed since the previous message are written. A keyframe is written
+   * anyway if elements or categories were added or removed or if the static
+   * data was modified since the previous message. Plots data is written when
+   * the plot is due.
+   *
+   * \param data Will hold binary data representing the GUI
+   *
+   * \param keyframe If true, write the complete GUI state
+   *
+   * \returns Effective size of the GUI message
+   *
+   */
+  size_t update(std::vector<char> & data, bool keyframe);
+
+  /** Evaluate every element and plot that is due and keep their binary form for the next message
+   *
+   * This is the part of update() that calls the elements' callbacks, it must
+   * be called from the thread that modifies the GUI. The message can then be
+   * written from another thread with writeSnapshot(). The snapshot holds the
+   * layout of the GUI at the time it is taken so the GUI can be modified
+   * before the message is written.
+   *
+   * \returns False if the snapshot was skipped because another thread is
+   * taking the previous one
+   */
+  bool snapshot();
+
+  /** Write the GUI message from the last snapshot
+   *
+   * This can be called from any thread, see update(std::vector<char> &, bool)
+   * for the parameters.
+   *
+   * \returns Effective size of the GUI message, 0 if there is no new snapshot
+   * since the previous message
+   */
+  size_t writeSnapshot(std::vector<char> & data, bool keyframe);
+
   /** Handle a request */
   bool handleRequest(const std::vector<std::string> & category,
                      const std::string & name,
@@ -258,14 +361,105 @@ private:
    * This is mainly useful to restart a plot with the same name in a single iteration
    */
   uint64_t plot_id_ = 0;
+  /** Clock used to schedule the publications */
+  using clock = std::chrono::steady_clock;
+  /** Publication schedule of an element or a plot */
+  struct MC_RTC_GUI_DLLAPI Publication
+  {
+    PublicationRate rate;
+    /** Time of the last publication */
+    clock::time_point last;
+    /** True if the next snapshot must publish regardless of the rate */
+    bool pending = true;
+
+    /** True if a snapshot taken at time now should publish, updates the schedule accordingly */
+    bool due(clock::time_point now);
+  };
+  struct MC_RTC_GUI_DLLAPI PlotStore
+  {
+    PlotStore(plot_callback_t write, plot::Plot type, uint64_t id);
+    plot_callback_t write;
+    plot::Plot type;
+    uint64_t id;
+    Publication publication;
+  };
   /** Holds all currently active plots */
-  std::unordered_map<std::string, plot_callback_t> plots_;
+  std::unordered_map<std::string, PlotStore> plots_;
   /** True if data binary form needs to be generated again */
   bool update_data_ = true;
-  /** Holds data's binary form */
+  /** True if elements or categories were added or removed since the last snapshot */
+  bool layout_changed_ = true;
+  /** Used to write elements in a snapshot */
+  std::vector<char> element_buffer_;
+
+  /** Binary form of an element shared by snapshot() and writeSnapshot()
+   *
+   * It is shared so that it outlives the element if the element is removed
+   * while the message is written
+   */
+  struct Published
+  {
+    /** Binary form in the last snapshot, protected by mutex_ */
+    std::vector<char> snapshot;
+    /** True if snapshot was not taken by writeSnapshot() yet, protected by mutex_ */
+    bool evaluated = false;
+    // The following members are only used by writeSnapshot()
+    /** Binary form taken from the snapshot */
+    std::vector<char> taken;
+    /** True if taken was not compared with buffer yet */
+    bool fresh = false;
+    /** Binary form in the last message */
+    std::vector<char> buffer;
+    /** True if the binary form changed in the last message */
+    bool changed = true;
+  };
+  /** Layout of the GUI used to write the message */
+  struct Layout
+  {
+    std::string name;
+    std::vector<std::shared_ptr<Published>> elements;
+    std::vector<Layout> sub;
+    /** Number of elements that changed in the last message */
+    size_t changed = 0;
+    /** Number of sub-categories with changes in the last message */
+    size_t changedSub = 0;
+  };
+
+  /** Protects the snapshot handed to writeSnapshot(), it is only held to swap buffers */
+  std::mutex mutex_;
+  /** True if a snapshot was taken since the previous message */
+  bool snapshot_ready_ = false;
+  /** True if the next message must be a keyframe */
+  bool keyframe_ = true;
+  /** Elements evaluated in the snapshot that were not taken by writeSnapshot() yet */
+  std::vector<std::shared_ptr<Published>> evaluated_;
+  /** Swapped with evaluated_ by writeSnapshot(), kept to reuse its memory */
+  std::vector<std::shared_ptr<Published>> taken_;
+  /** Layout of the GUI in the snapshot, only set if it changed */
+  std::unique_ptr<Layout> snapshot_layout_;
+  /** Holds plots' binary form in the snapshot */
+  std::vector<char> plots_buffer_;
+  /** Holds plots' binary size */
+  size_t plots_buffer_size_ = 0;
+  /** Holds data's binary form in the snapshot, only set if it changed */
   std::vector<char> data_buffer_;
   /** Holds data's binary size */
   size_t data_buffer_size_ = 0;
+  /** True if data_buffer_ holds new data */
+  bool data_ready_ = false;
+
+  // The following members are only used by writeSnapshot()
+  /** Layout of the GUI in the message */
+  Layout layout_;
+  /** Plots' binary form in the message */
+  std::vector<char> message_plots_buffer_;
+  size_t message_plots_buffer_size_ = 0;
+  /** Data's binary form in the message */
+  std::vector<char> message_data_buffer_;
+  size_t message_data_buffer_size_ = 0;
+  /** Sequence number of the last message */
+  uint64_t seq_ = 0;
+
   struct Category;
   struct MC_RTC_GUI_DLLAPI ElementStore
   {
@@ -274,6 +468,8 @@ private:
     std::function<Element &()> element;
     void (*write)(Element &, mc_rtc::MessagePackBuilder &);
     bool (*handleRequest)(Element &, const mc_rtc::Configuration &);
+    std::shared_ptr<Published> published;
+    Publication publication;
 
     template<typename T>
     ElementStore(T self, const Category & category, ElementsStacking stacking);
@@ -306,8 +502,26 @@ private:
   /** Get a category, creates it if does not exist */
   Category & getCategory(const std::vector<std::string> & category);
 
-  /** Update the GUI data state for a given category */
-  void update(mc_rtc::MessagePackBuilder & builder, Category & category);
+  /** Write every element of a category and its sub-categories that is due in the snapshot */
+  void snapshot(Category & category, clock::time_point now);
+
+  /** Find an element, returns nullptr if it does not exist */
+  ElementStore * getElement(const std::vector<std::string> & category, const std::string & name);
+
+  /** Copy the layout of a category and its sub-categories */
+  void layout(const Category & category, Layout & out);
+
+  /** Check which elements of a category and its sub-categories changed in the snapshot
+   *
+   * \returns True if anything in the category changed
+   */
+  bool updateElements(Layout & category);
+
+  /** Write the GUI data state for a given category */
+  void update(mc_rtc::MessagePackBuilder & builder, Layout & category);
+
+  /** Write the elements that changed in a given category */
+  void updateDelta(mc_rtc::MessagePackBuilder & builder, Layout & category);
 
   std::string cat2str(const std::vector<std::string> & category);
 
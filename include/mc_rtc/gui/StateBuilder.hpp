@@ -42,6 +42,7 @@ void StateBuilder::addElementImpl(const std::vector<std::string> & category,
     return;
   }
   cat.elements.emplace_back(element, cat, stacking);
+  layout_changed_ = true;
   if(rem == 0)
   {
     cat.id += 1;
@@ -69,6 +70,7 @@ template<typename T>
 StateBuilder::ElementStore::ElementStore(T self, const Category & category, ElementsStacking stacking)
 {
   self.id(category.id);
+  published = std::make_shared<Published>();
   // FIXME In C++14 we could have T && self and move it into the lambda
   element = [self]() mutable -> Element & { return self; };
   if(stacking == ElementsStacking::Vertical)
@@ -150,7 +152,7 @@ void StateBuilder::addXYPlot(const std::string & name,
     yRightConfig.write(builder);
     data.write(builder);
   };
-  plots_[name] = makePlotCallback(cb, args...);
+  plots_.emplace(name, PlotStore(makePlotCallback(cb, args...), plot::Plot::XY, id));
 }
 
 template<typename T, typename... Args>
@@ -193,7 +195,7 @@ void StateBuilder::addPlot(const std::string & name,
     yLeftConfig.write(builder);
     yRightConfig.write(builder);
   };
-  plots_[name] = makePlotCallback(cb, args...);
+  plots_.emplace(name, PlotStore(makePlotCallback(cb, args...), plot::Plot::Standard, id));
 }
 
 template<typename T>
@@ -0,0 +1,75 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#pragma once
+
+#include <mc_rtc/utils_api.h>
+
+#include <fstream>
+#include <string>
+#include <vector>
+
+namespace mc_rtc
+{
+
+namespace log
+{
+
+/** Write a compressed columnar log (.cflat)
+ *
+ * Like the .flat format, the log is a set of numeric and string columns but
+ * every column is split into blocks of rows that are compressed separately.
+ * The file ends with a footer that gives the position and the statistics
+ * (min/max/NaN count) of every column and block so that readers only have to
+ * decode the columns and the blocks they need.
+ *
+ * Such logs can be loaded by mc_rtc::log::FlatLog and mc_log_ui
+ */
+struct MC_RTC_UTILS_DLLAPI CompressedFlatLogWriter
+{
+  /** Default number of rows in a block */
+  static constexpr size_t default_block_size = 4096;
+
+  /** Open a log for writing
+   *
+   * \param fpath Path to the output file
+   *
+   * \param block_size Number of rows in a block
+   */
+  CompressedFlatLogWriter(const std::string & fpath, size_t block_size = default_block_size);
+
+  /** Finish the log if close() was not called */
+  ~CompressedFlatLogWriter();
+
+  CompressedFlatLogWriter(const CompressedFlatLogWriter &) = delete;
+  CompressedFlatLogWriter & operator=(const CompressedFlatLogWriter &) = delete;
+
+  /** Write a numeric column, missing data should be NaN */
+  void write(const std::string & entry, const double * data, size_t size);
+
+  /** Write a string column, missing data should be empty */
+  void write(const std::string & entry, const std::vector<std::string> & data);
+
+  /** Write the footer and close the file
+   *
+   * \returns True if the log was written sucessfully
+   */
+  bool close();
+
+private:
+  std::ofstream ofs_;
+  size_t block_size_;
+  /** Serialized footer of the columns written so far */
+  std::string footer_;
+  uint64_t columns_ = 0;
+  /** Position of the next write */
+  uint64_t offset_ = 0;
+
+  template<typename T>
+  void write(const std::string & entry, bool numeric, const T * data, size_t size);
+};
+
+} // namespace log
+
+} // namespace mc_rtc
@@ -9,6 +9,9 @@
 
 #include <SpaceVecAlg/SpaceVecAlg>
 
+#include <limits>
+#include <memory>
+#include <set>
 #include <stdexcept>
 #include <string>
 #include <unordered_map>
@@ -34,11 +37,26 @@ struct MC_RTC_UTILS_DLLAPI FlatLog
   /** Delete copy assignment */
   FlatLog & operator=(const FlatLog &) = delete;
 
-  /** Load a file into the log, erase the current content of the flat log */
-  void load(const std::string & fpath);
+  /** Load a file into the log, erase the current content of the flat log
+   *
+   * fpath can be a binary log, a flat log, a compressed flat log or a log
+   * manifest, for binary logs, compressed flat logs and manifests, only the
+   * entries in the [from, to] time window are loaded
+   */
+  void load(const std::string & fpath, double from = 0, double to = std::numeric_limits<double>::infinity());
 
-  /** Append a file into the flat log, the resulting content is the concatenation of the two logs*/
-  void append(const std::string & fpath);
+  /** Append a file into the flat log, the resulting content is the concatenation of the two logs
+   *
+   * \see load(const std::string &, double, double)
+   */
+  void append(const std::string & fpath, double from = 0, double to = std::numeric_limits<double>::infinity());
+
+  /** Set the number of threads used to decode binary logs
+   *
+   * Large logs are split into chunks that are decoded concurrently and then
+   * merged, 0 (the default) uses one thread per core
+   */
+  void threads(size_t n);
 
   /** Returns the size of the log */
   size_t size() const;
@@ -131,26 +149,87 @@ struct MC_RTC_UTILS_DLLAPI FlatLog
     LogType type = mc_rtc::log::LogType::None;
     unique_void_ptr data;
   };
+  /** Type-erased storage for the records of an entry that share the same type */
+  struct column_base
+  {
+    virtual ~column_base() = default;
+    /** Resize the storage to hold size records */
+    virtual void resize(size_t size) = 0;
+    /** Move the content of a record at the given index, the record type must match the storage type */
+    virtual void set(size_t idx, record & r) = 0;
+    /** Move the records of a storage of the same type at the end of this one */
+    virtual void append(column_base & other) = 0;
+  };
+
+  /** Contiguous storage for the records of type T, see details::ColumnStorage */
+  template<typename T>
+  struct column_data;
+
+  /** Records of a given type for an entry
+   *
+   * data holds one slot per log index, valid[i] is true when the record at
+   * index i has this column's type
+   */
+  struct column
+  {
+    LogType type = LogType::None;
+    std::vector<bool> valid;
+    std::unique_ptr<column_base> data;
+  };
+
   struct entry
   {
     std::string name;
-    std::vector<record> records;
+    /** One column per type encountered for this entry, usually a single one */
+    std::vector<column> columns;
   };
 
 private:
   std::vector<entry> data_;
 
-  /** Retrieve records for a given entry */
-  const std::vector<record> & at(const std::string & entry) const;
+  /** Entry name to position in data_ */
+  std::unordered_map<std::string, size_t> index_;
+
+  /** Number of records in the log */
+  size_t size_ = 0;
+
+  /** Number of threads used to decode binary logs, 0 for one per core */
+  size_t threads_ = 0;
+
+  /** Retrieve the storage for a given entry */
+  const entry & at(const std::string & entry) const;
 
   /** Retrieve the index of a given entry, creates the entry if it doesn't exist */
-  size_t index(const std::string & entry, size_t size);
+  size_t index(const std::string & entry);
+
+  /** Retrieve the column of the given type for an entry, creates the column if it doesn't exist */
+  column & getColumn(entry & e, LogType type);
+
+  /** Resize every column to the current size of the log */
+  void resize();
 
   /** Append a flat file to the log, all entries will be either double or strings */
   void appendFlat(const std::string & fpath);
 
-  /** Append a binary file to the log */
-  void appendBin(const std::string & fpath);
+  /** Append a compressed flat file to the log, only the blocks in the time window are decoded
+   *
+   * \see CompressedFlatLogWriter
+   */
+  void appendCompressedFlat(const std::string & fpath, double from, double to);
+
+  /** Append a binary file or a log manifest to the log */
+  void appendBin(const std::string & fpath, double from, double to);
+
+  /** Append a binary file to the log, decoding its chunks concurrently */
+  void appendBin(const std::string & fpath, size_t threads);
+
+  /** Append the records of an entry, indexes maps the keys to entries and is updated when keys are provided */
+  void appendRecords(std::vector<size_t> & indexes,
+                     const std::vector<std::string> & keys,
+                     std::vector<record> & records);
+
+  /** Move the content of another log at the end of this one */
+  void merge(FlatLog && log);
 };
 
 } // namespace log
@@ -26,80 +26,130 @@ struct CheckLogType
   }
 };
 
+/** Type used to store T in a FlatLog column
+ *
+ * bool is wrapped so that the storage is not a std::vector<bool> and a
+ * pointer to the stored value can be returned
+ */
 template<typename T>
-const T * record_cast(const FlatLog::record & r)
+struct ColumnStorage
 {
-  if(CheckLogType<T>::check(r.type))
+  using type = T;
+  static const T * ptr(const type & v)
   {
-    return static_cast<const T *>(r.data.get());
+    return &v;
   }
-  return nullptr;
-}
+};
 
-template<typename T>
-bool convert(const FlatLog::record & r, T & out)
+template<>
+struct ColumnStorage<bool>
 {
-  const T * ptr = record_cast<T>(r);
-  if(ptr)
+  struct type
+  {
+    type() = default;
+    type(bool v) : value(v) {}
+    bool value = false;
+  };
+  static const bool * ptr(const type & v)
   {
-    out = *ptr;
+    return &v.value;
   }
-  return ptr;
-}
+};
 
 } // namespace details
 
 template<typename T>
-std::vector<const T *> FlatLog::getRaw(const std::string & entry) const
+struct FlatLog::column_data : public FlatLog::column_base
 {
-  if(!has(entry))
+  using storage_t = typename details::ColumnStorage<T>::type;
+  std::vector<storage_t, Eigen::aligned_allocator<storage_t>> data;
+
+  void resize(size_t size) override
   {
-    LOG_ERROR("No entry named " << entry << " in the loaded log")
-    return {};
+    data.resize(size);
   }
-  std::vector<const T *> ret;
-  const auto & data = at(entry);
-  ret.reserve(data.size());
-  for(const auto & r : data)
+
+  void set(size_t idx, record & r) override
   {
-    ret.push_back(details::record_cast<T>(r));
+    data[idx] = std::move(*static_cast<T *>(r.data.get()));
   }
-  return ret;
+
+  void append(column_base & other) override
+  {
+    auto & odata = static_cast<column_data<T> &>(other).data;
+    data.insert(data.end(), std::make_move_iterator(odata.begin()), std::make_move_iterator(odata.end()));
+  }
+
+  const T * at(size_t idx) const
+  {
+    return details::ColumnStorage<T>::ptr(data[idx]);
+  }
+};
+
+namespace details
+{
+
+/** Returns the column holding T records in the entry, nullptr if there is none */
+template<typename T>
+const FlatLog::column_data<T> * get_column(const FlatLog::entry & e, const std::vector<bool> *& valid)
+{
+  for(const auto & c : e.columns)
+  {
+    if(CheckLogType<T>::check(c.type))
+    {
+      valid = &c.valid;
+      return static_cast<const FlatLog::column_data<T> *>(c.data.get());
+    }
+  }
+  valid = nullptr;
+  return nullptr;
 }
 
+} // namespace details
+
 template<typename T>
-std::vector<T> FlatLog::get(const std::string & entry, const T & def) const
+std::vector<const T *> FlatLog::getRaw(const std::string & entry) const
 {
   if(!has(entry))
   {
     LOG_ERROR("No entry named " << entry << " in the loaded log")
     return {};
   }
-  const auto & data = at(entry);
-  std::vector<T> ret(data.size(), def);
-  for(size_t i = 0; i < data.size(); ++i)
+  std::vector<const T *> ret(size(), nullptr);
+  const std::vector<bool> * valid = nullptr;
+  const auto * column = details::get_column<T>(at(entry), valid);
+  if(column)
   {
-    details::convert<T>(data[i], ret[i]);
+    for(size_t i = 0; i < ret.size(); ++i)
+    {
+      if((*valid)[i])
+      {
+        ret[i] = column->at(i);
+      }
+    }
   }
   return ret;
 }
 
-template<>
-inline std::vector<bool> FlatLog::get(const std::string & entry, const bool & def) const
+template<typename T>
+std::vector<T> FlatLog::get(const std::string & entry, const T & def) const
 {
   if(!has(entry))
   {
     LOG_ERROR("No entry named " << entry << " in the loaded log")
     return {};
   }
-  const auto & data = at(entry);
-  std::vector<bool> ret(data.size(), def);
-  for(size_t i = 0; i < data.size(); ++i)
+  std::vector<T> ret(size(), def);
+  const std::vector<bool> * valid = nullptr;
+  const auto * column = details::get_column<T>(at(entry), valid);
+  if(column)
   {
-    const bool * ptr = details::record_cast<bool>(data[i]);
-    if(ptr)
+    for(size_t i = 0; i < ret.size(); ++i)
     {
-      ret[i] = *ptr;
+      if((*valid)[i])
+      {
+        ret[i] = *column->at(i);
+      }
     }
   }
   return ret;
@@ -113,30 +163,29 @@ std::vector<T> FlatLog::get(const std::string & entry) const
     LOG_ERROR("No entry named " << entry << " in the loaded log")
     return {};
   }
-  const auto & data = at(entry);
   std::vector<T> ret;
+  const std::vector<bool> * valid = nullptr;
+  const auto * column = details::get_column<T>(at(entry), valid);
   size_t start_i = 0;
-  T def{};
-  while(start_i < data.size())
+  while(column && start_i < size() && !(*valid)[start_i])
   {
-    const auto & r = data[start_i];
-    if(details::convert<T>(r, def))
-    {
-      break;
-    }
     start_i++;
   }
-  if(start_i == data.size())
+  if(!column || start_i == size())
   {
     LOG_ERROR(entry << " was not logged as the requested data type")
     return ret;
   }
-  ret.resize(start_i, def);
-  ret.reserve(data.size());
-  for(size_t i = start_i; i < data.size(); ++i)
+  const T * last = column->at(start_i);
+  ret.reserve(size());
+  ret.resize(start_i, *last);
+  for(size_t i = start_i; i < size(); ++i)
   {
-    details::convert<T>(data[i], def);
-    ret.push_back(def);
+    if((*valid)[i])
+    {
+      last = column->at(i);
+    }
+    ret.push_back(*last);
   }
   return ret;
 }
@@ -160,13 +209,18 @@ const T * FlatLog::getRaw(const std::string & entry, size_t i) const
     LOG_ERROR("No entry named " << entry << " in the loaded log")
     return nullptr;
   }
-  const auto & data = at(entry);
-  if(i >= data.size())
+  if(i >= size())
   {
-    LOG_ERROR("Requested data (" << entry << ") out of available range (" << i << ", available: " << data.size() << ")")
+    LOG_ERROR("Requested data (" << entry << ") out of available range (" << i << ", available: " << size() << ")")
     return nullptr;
   }
-  return details::record_cast<T>(data[i]);
+  const std::vector<bool> * valid = nullptr;
+  const auto * column = details::get_column<T>(at(entry), valid);
+  if(column && (*valid)[i])
+  {
+    return column->at(i);
+  }
+  return nullptr;
 }
 
 } // namespace log
@@ -28,6 +28,10 @@ struct MC_RTC_UTILS_DLLAPI Logger
 public:
   /** Magic number used to identify binary logs */
   static const uint8_t magic[4];
+  /** Magic number used to identify binary logs' time index */
+  static const uint8_t index_magic[4];
+  /** Default size (in bytes) of the buffer used by the threaded policy */
+  static constexpr size_t default_buffer_size = 32 * 1024 * 1024;
   /** A function that fills LogData vectors */
   typedef std::function<void(mc_rtc::MessagePackBuilder &)> serialize_fn;
   /*! \brief Defines available policies for the logger */
@@ -47,6 +51,10 @@ public:
      * thread from the global controller running thread. As a result, some
      * buffering occurs and you might lose some data if the controller
      * crashes. This is intended for real-time environments.
+     *
+     * Data is copied into a pre-allocated buffer without any allocation. If
+     * the buffer is full, the data is dropped, the number of dropped entries
+     * is logged as perf_LogDropped and the buffer usage as perf_LogBuffer
      */
     THREADED = 1
   };
@@ -59,8 +67,13 @@ public:
    * \param directory Path to the directory where log files will be stored
    *
    * \param tmpl Log file template
+   *
+   * \param buffer_size Size of the buffer (in bytes) used by the threaded policy
    */
-  Logger(const Policy & policy, const std::string & directory, const std::string & tmpl);
+  Logger(const Policy & policy,
+         const std::string & directory,
+         const std::string & tmpl,
+         size_t buffer_size = default_buffer_size);
 
   /*! \brief Destructor */
   ~Logger();
@@ -72,8 +85,13 @@ public:
    * \param directory Path to the directory where log files will be stored
    *
    * \param tmpl Log file template
+   *
+   * \param buffer_size Size of the buffer (in bytes) used by the threaded policy
    */
-  void setup(const Policy & policy, const std::string & directory, const std::string & tmpl);
+  void setup(const Policy & policy,
+             const std::string & directory,
+             const std::string & tmpl,
+             size_t buffer_size = default_buffer_size);
 
   /*! \brief Start logging
    *
@@ -89,6 +107,38 @@ public:
    */
   void start(const std::string & ctl_name, double timestep, bool resume = false);
 
+  /*! \brief Split the log into segments
+   *
+   * When enabled, a new segment is started every time the current segment
+   * reaches the maximum size or duration. Segments are written to
+   * [tmpl]-[ctl_name]-[date]-[segment].bin and each of them can be read on
+   * its own. The -latest symlink points to the segment being written. The
+   * list of segments of a run is written to [tmpl]-[ctl_name]-[date].json,
+   * this manifest can be read as a single log by mc_rtc::log::FlatLog and
+   * mc_rtc::log::iterate_binary_log.
+   *
+   * This takes effect on the next call to start()
+   *
+   * \param max_size Maximum size of a segment (in bytes), 0 for no size limit
+   *
+   * \param max_duration Maximum duration of a segment (in seconds), 0 for no
+   * duration limit
+   *
+   * If both parameters are 0, the log is written in a single file
+   */
+  void rotation(size_t max_size, double max_duration);
+
+  /*! \brief Write a time index next to the log
+   *
+   * The index maps the time of every entry to its position in the log file
+   * and the position of the keys, see mc_rtc::log::index_binary_log
+   *
+   * This takes effect on the next call to start()
+   *
+   * \param enable If true, write the index
+   */
+  void index(bool enable);
+
   /*! \brief Log controller's data
    *
    * Print controller data to the log.
@@ -140,6 +190,13 @@ public:
 private:
   /** Store implementation detail related to the logging policy */
   std::shared_ptr<LoggerImpl> impl_ = nullptr;
+  /** Policy used by impl_ */
+  Policy policy_ = Policy::NON_THREADED;
+  /** Segments maximum size (bytes) and duration (s) */
+  size_t rotation_size_ = 0;
+  double rotation_duration_ = 0;
+  /** True if the time index is written */
+  bool index_ = false;
   /** Set to true when log entries are added or removed */
   bool log_entries_changed_ = false;
   /** Contains all the log entries callback */
@@ -7,6 +7,8 @@
 #include <mc_rtc/MessagePackBuilder.h>
 #include <mc_rtc/log/FlatLog.h>
 
+#include <limits>
+
 namespace mc_rtc
 {
 
@@ -25,7 +27,83 @@ using binary_log_copy_callback = std::function<bool(const std::vector<std::strin
                                                     const char *,
                                                     uint64_t)>;
 
+/** Returns the files that make up a log
+ *
+ * If fpath is a manifest (.json) written by mc_rtc::Logger in rotation mode,
+ * returns the segments of the run that overlap [from, to] in order, otherwise
+ * returns fpath
+ *
+ * \param fpath Path to a binary log file or a log manifest
+ *
+ * \param from Start of the time window
+ *
+ * \param to End of the time window
+ */
+std::vector<std::string> MC_RTC_UTILS_DLLAPI log_segments(const std::string & fpath,
+                                                          double from = 0,
+                                                          double to = std::numeric_limits<double>::infinity());
+
+/** Entry in the time index of a binary log */
+struct LogIndexEntry
+{
+  /** Time of the entry */
+  double t;
+  /** Offset of the entry in the log file */
+  uint64_t offset;
+  /** Offset of the last entry holding the keys at or before this entry */
+  uint64_t keys_offset;
+};
+
+/** Path of the time index for a given binary log
+ *
+ * The index of [name].bin is [name].idx, symbolic links are resolved first
+ */
+std::string MC_RTC_UTILS_DLLAPI log_index_path(const std::string & fpath);
+
+/** Write the time index of a binary log
+ *
+ * The index starts with mc_rtc::Logger::index_magic followed by one
+ * LogIndexEntry for every entry in the log. It is used by iterate_binary_log
+ * to go straight to the requested time window.
+ *
+ * \param fpath Path to the binary log file
+ *
+ * \param time Key used as time source
+ *
+ * \returns True if the index was written
+ */
+bool MC_RTC_UTILS_DLLAPI index_binary_log(const std::string & fpath, const std::string & time = "t");
+
+/** Part of a binary log that can be decoded independently of the rest of the log */
+struct LogChunk
+{
+  /** Offset of the last entry holding the keys at or before begin */
+  uint64_t keys_offset;
+  /** Offset of the first entry in the chunk */
+  uint64_t begin;
+  /** Offset past the last entry in the chunk */
+  uint64_t end;
+};
+
+/** Split a binary log into chunks of similar size
+ *
+ * Only the size prefix and the first bytes of each entry are read so this is
+ * much cheaper than iterating the log
+ *
+ * \param fpath Path to the binary log file
+ *
+ * \param n Maximum number of chunks
+ *
+ * \param min_size Minimum size of a chunk (in bytes)
+ *
+ * \returns The chunks in order, empty if the log cannot be read
+ */
+std::vector<LogChunk> MC_RTC_UTILS_DLLAPI binary_log_chunks(const std::string & fpath, size_t n, uint64_t min_size = 0);
+
 /** Iterate over a given binary log data
+ *
+ * If fpath is a log manifest, the segments of the run are iterated in order
+ * as if they were a single log
  *
  * For each entry in the log, this will call the provided callback. The
  * callback has six arguments:
@@ -48,6 +126,11 @@ using binary_log_copy_callback = std::function<bool(const std::vector<std::strin
  *
  * If the callback returns false, parsing is aborted
  *
+ * When a time window is provided, only the entries in this window are
+ * provided to the callback and the first of these always holds the keys.
+ * If the log has a time index, the iteration starts directly at the first
+ * entry in the window, otherwise the beginning of the log is skipped.
+ *
  * \param fpath Path to the binary log file
  *
  * \param callback Called for every entry in the log
@@ -59,12 +142,18 @@ using binary_log_copy_callback = std::function<bool(const std::vector<std::strin
  * not a Double record, the parsing will fail. If this parameter is empty, no
  * extraction is attempted and the third callback parameter is always -1
  *
+ * \param from Start of the time window, ignored if time is empty
+ *
+ * \param to End of the time window, ignored if time is empty
+ *
  * \returns True if parsing was sucessful, false otherwise
  */
 bool MC_RTC_UTILS_DLLAPI iterate_binary_log(const std::string & fpath,
                                             const binary_log_copy_callback & callback,
                                             bool extract,
-                                            const std::string & time = "t");
+                                            const std::string & time = "t",
+                                            double from = 0,
+                                            double to = std::numeric_limits<double>::infinity());
 
 /** Iterate over a given binary log data
  *
@@ -72,6 +161,23 @@ bool MC_RTC_UTILS_DLLAPI iterate_binary_log(const std::string & fpath,
  * doesn't have to bother with the copy callback.
  */
 bool MC_RTC_UTILS_DLLAPI iterate_binary_log(const std::string & fpath,
+                                            const binary_log_callback & callback,
+                                            bool extract,
+                                            const std::string & time = "t",
+                                            double from = 0,
+                                            double to = std::numeric_limits<double>::infinity());
+
+/** Iterate over a chunk of a binary log
+ *
+ * This has the same functionality as the other overloads but only the entries
+ * in the chunk are provided to the callback and the first of these always
+ * holds the keys. Different chunks of the same log can be iterated
+ * concurrently.
+ *
+ * \see binary_log_chunks
+ */
+bool MC_RTC_UTILS_DLLAPI iterate_binary_log(const std::string & fpath,
+                                            const LogChunk & chunk,
                                             const binary_log_callback & callback,
                                             bool extract,
                                             const std::string & time = "t");
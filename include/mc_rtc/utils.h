@@ -6,7 +6,11 @@
 
 #include <mc_rtc/logging.h>
 
+#include <algorithm>
 #include <atomic>
+#include <cstring>
+#include <limits>
+#include <memory>
 
 namespace
 {
@@ -79,4 +83,129 @@ private:
   std::atomic_size_t head_;
 };
 
+/** Lock-free thread-safe single-producer single-consumer circular buffer of
+ * variable-size messages
+ *
+ * The storage is allocated once at construction. Each message is stored as
+ * its size followed by its content, padded to 8 bytes, and is never split: if
+ * it does not fit before the end of the storage, a wrap marker is written and
+ * the message is stored at the beginning.
+ *
+ */
+struct ByteRingBuffer
+{
+public:
+  ByteRingBuffer(size_t capacity)
+  : capacity_(std::max<size_t>(align(capacity), 2 * sizeof(uint64_t))), data_(new char[capacity_]), tail_(0), head_(0)
+  {
+    if(!tail_.is_lock_free())
+    {
+      LOG_WARNING("Your platform does not support std::atomic_size_t as lock free operations")
+    }
+  }
+
+  /** Returns false if the push failed (i.e. not enough space left) */
+  bool push(const char * data, size_t size)
+  {
+    const size_t need = sizeof(uint64_t) + align(size);
+    const size_t tail = tail_.load(std::memory_order_relaxed);
+    const size_t head = head_.load(std::memory_order_acquire);
+    size_t start = tail;
+    if(tail >= head)
+    {
+      if(tail + need > capacity_ || (tail + need == capacity_ && head == 0))
+      {
+        // Wrap around, the message must not catch up with the consumer
+        if(need >= head)
+        {
+          return false;
+        }
+        write_size(tail, wrap_marker);
+        start = 0;
+      }
+    }
+    else if(tail + need >= head)
+    {
+      return false;
+    }
+    write_size(start, size);
+    std::memcpy(data_.get() + start + sizeof(uint64_t), data, size);
+    size_t next_tail = start + need;
+    tail_.store(next_tail == capacity_ ? 0 : next_tail, std::memory_order_release);
+    return true;
+  }
+
+  /** Access the oldest message without removing it, returns false if the buffer is empty */
+  bool front(const char *& data, size_t & size)
+  {
+    size_t head = head_.load(std::memory_order_relaxed);
+    if(head == tail_.load(std::memory_order_acquire))
+    {
+      return false;
+    }
+    size = read_size(head);
+    if(size == wrap_marker)
+    {
+      head = 0;
+      head_.store(head, std::memory_order_release);
+      size = read_size(head);
+    }
+    data = data_.get() + head + sizeof(uint64_t);
+    return true;
+  }
+
+  /** Remove the oldest message, front() must have returned true before */
+  void pop()
+  {
+    const size_t head = head_.load(std::memory_order_relaxed);
+    const size_t next_head = head + sizeof(uint64_t) + align(read_size(head));
+    head_.store(next_head == capacity_ ? 0 : next_head, std::memory_order_release);
+  }
+
+  /** Returns true if the buffer is empty */
+  bool empty() const
+  {
+    return head_ == tail_;
+  }
+
+  /** Number of bytes currently used in the buffer */
+  size_t used() const
+  {
+    const size_t head = head_;
+    const size_t tail = tail_;
+    return tail >= head ? tail - head : capacity_ - head + tail;
+  }
+
+  /** Size of the storage in bytes */
+  size_t capacity() const
+  {
+    return capacity_;
+  }
+
+private:
+  static constexpr uint64_t wrap_marker = std::numeric_limits<uint64_t>::max();
+
+  static size_t align(size_t size)
+  {
+    return (size + sizeof(uint64_t) - 1) & ~(sizeof(uint64_t) - 1);
+  }
+
+  void write_size(size_t idx, uint64_t size)
+  {
+    std::memcpy(data_.get() + idx, &size, sizeof(uint64_t));
+  }
+
+  uint64_t read_size(size_t idx) const
+  {
+    uint64_t size = 0;
+    std::memcpy(&size, data_.get() + idx, sizeof(uint64_t));
+    return size;
+  }
+
+  const size_t capacity_;
+  std::unique_ptr<char[]> data_;
+  std::atomic_size_t tail_;
+  std::atomic_size_t head_;
+};
+
 } // namespace
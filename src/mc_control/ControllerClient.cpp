@@ -11,6 +11,7 @@
 #include <nanomsg/pipeline.h>
 #include <nanomsg/pubsub.h>
 
+#include <algorithm>
 #include <chrono>
 #include <sstream>
 #include <stdexcept>
@@ -33,6 +34,35 @@ std::string cat2str(const std::vector<std::string> & cat)
   return ret;
 }
 
+/** True if raw holds the same MessagePack data as view */
+bool same(const std::vector<char> & raw, const mc_rtc::MessagePackView & view)
+{
+  return raw.size() == view.bytes() && std::equal(raw.begin(), raw.end(), view.data());
+}
+
+/** Find the state named name in states, the state at hint is checked first */
+template<typename State>
+typename std::vector<State>::iterator find(std::vector<State> & states,
+                                           size_t hint,
+                                           const mc_rtc::MessagePackView & name)
+{
+  if(hint < states.size() && name.equals(states[hint].name))
+  {
+    return states.begin() + static_cast<std::ptrdiff_t>(hint);
+  }
+  return std::find_if(states.begin(), states.end(), [&name](const State & s) { return name.equals(s.name); });
+}
+
+/** Update the state of an element from its MessagePack form */
+template<typename WidgetState>
+void update_widget(WidgetState & widget, const mc_rtc::MessagePackView & data)
+{
+  widget.name = data[0].asString();
+  widget.raw.assign(data.data(), data.data() + data.bytes());
+  widget.data = mc_rtc::Configuration::fromMessagePack(data.data(), data.bytes());
+  widget.sid = widget.data.at(2, -1);
+}
+
 } // namespace
 
 namespace mc_control
@@ -41,6 +71,12 @@ namespace mc_control
 namespace
 {
 
+/** Maximum time spent waiting for a message before checking the client state (ms) */
+constexpr int poll_timeout_ms = 50;
+
+/** Maximum number of messages handled in a row */
+constexpr size_t max_messages_per_poll = 16;
+
 void init_socket(int & socket, int proto, const std::string & uri, const std::string & name)
 {
   socket = nn_socket(AF_SP, proto);
@@ -103,15 +139,36 @@ void ControllerClient::reconnect(const std::string & sub_conn_uri, const std::st
 void ControllerClient::start()
 {
   run_ = true;
+  // Wait for a keyframe from the (new) server
+  state_ = CategoryState{};
+  has_state_ = false;
+  synced_ = false;
+  data_raw_.clear();
   sub_th_ = std::thread([this]() {
-    std::vector<char> buff(65536);
     auto t_last_received = std::chrono::system_clock::now();
     while(run_)
     {
-      memset(buff.data(), 0, buff.size() * sizeof(char));
-      auto recv = nn_recv(sub_socket_, buff.data(), buff.size(), NN_DONTWAIT);
+      // Wait for a message, the timeout only bounds the time it takes to notice a stop() or a server timeout
+      nn_pollfd pfd;
+      pfd.fd = sub_socket_;
+      pfd.events = NN_POLLIN;
+      pfd.revents = 0;
+      int ready = nn_poll(&pfd, 1, poll_timeout_ms);
       auto now = std::chrono::system_clock::now();
-      if(recv < 0)
+      if(ready < 0)
+      {
+        auto err = nn_errno();
+        if(err == ETERM)
+        {
+          break;
+        }
+        if(err != EINTR)
+        {
+          LOG_ERROR("ControllerClient failed to poll with errno: " << err)
+        }
+        continue;
+      }
+      if(ready == 0)
       {
         if(timeout_ > 0 && now - t_last_received > std::chrono::duration<double>(timeout_))
         {
@@ -121,27 +178,30 @@ void ControllerClient::start()
             handle_gui_state(mc_rtc::Configuration{});
           }
         }
-        auto err = nn_errno();
-        if(err != EAGAIN)
-        {
-          LOG_ERROR("ControllerClient failed to receive with errno: " << err)
-        }
+        continue;
       }
-      else if(recv > 0)
+      // Handle the messages that are already there, at most max_messages_per_poll before checking run_ again
+      for(size_t i = 0; i < max_messages_per_poll && run_; ++i)
       {
-        if(recv > static_cast<int>(buff.size()))
+        // The message is allocated by nanomsg so it always fits
+        void * buff = nullptr;
+        auto recv = nn_recv(sub_socket_, &buff, NN_MSG, NN_DONTWAIT);
+        if(recv < 0)
         {
-          LOG_WARNING("Receive buffer was too small to receive the latest state message, will resize for next time")
-          buff.resize(2 * buff.size());
-          continue;
+          auto err = nn_errno();
+          if(err != EAGAIN)
+          {
+            LOG_ERROR("ControllerClient failed to receive with errno: " << err)
+          }
+          break;
         }
         t_last_received = now;
-        if(run_)
+        if(run_ && recv > 0)
         {
-          handle_gui_state(mc_rtc::Configuration::fromMessagePack(buff.data(), static_cast<size_t>(recv)));
+          handle_gui_state(static_cast<const char *>(buff), static_cast<size_t>(recv));
         }
+        nn_freemsg(buff);
       }
-      std::this_thread::sleep_for(std::chrono::microseconds(500));
     }
   });
 }
@@ -180,26 +240,167 @@ void ControllerClient::handle_gui_state(mc_rtc::Configuration state)
     stopped();
     return;
   }
+  std::vector<char> buffer;
+  size_t size = state.toMessagePack(buffer);
+  handle_gui_state(buffer.data(), size);
+}
+
+void ControllerClient::handle_gui_state(const char * data, size_t size)
+{
   started();
-  int version = state[0];
-  if(version != mc_rtc::gui::StateBuilder::PROTOCOL_VERSION)
+  try
   {
-    LOG_ERROR("Receive message, version: " << version << " but I can only handle version: "
-                                           << mc_rtc::gui::StateBuilder::PROTOCOL_VERSION)
-    handle_category({}, "", {});
-    stopped();
-    return;
+    mc_rtc::MessagePackView state(data, size);
+    auto it = state.begin();
+    int version = state.size() ? static_cast<int>((*it).asInt()) : -1;
+    if(version != mc_rtc::gui::StateBuilder::PROTOCOL_VERSION)
+    {
+      LOG_ERROR("Receive message, version: " << version << " but I can only handle version: "
+                                             << mc_rtc::gui::StateBuilder::PROTOCOL_VERSION)
+      handle_category({}, "", {});
+      stopped();
+      return;
+    }
+    if(state.size() != 6)
+    {
+      LOG_ERROR_AND_THROW(std::runtime_error, "Invalid GUI state size: " << state.size())
+    }
+    auto type = static_cast<mc_rtc::gui::MessageType>((*++it).asInt());
+    uint64_t seq = (*++it).asUInt();
+    auto static_data = *++it;
+    auto elements = *++it;
+    auto plots = *++it;
+    if(type == mc_rtc::gui::MessageType::Keyframe)
+    {
+      if(!same(data_raw_, static_data))
+      {
+        data_raw_.assign(static_data.data(), static_data.data() + static_data.bytes());
+        data_ = mc_rtc::Configuration::fromMessagePack(static_data.data(), static_data.bytes());
+      }
+      load_category(state_, elements);
+      has_state_ = true;
+      synced_ = true;
+    }
+    else if(synced_ && seq == seq_ + 1)
+    {
+      load_delta(state_, elements);
+    }
+    else
+    {
+      // A message was missed, keep the last known state until the next keyframe
+      synced_ = false;
+    }
+    seq_ = seq;
+    if(has_state_)
+    {
+      handle_category_state({}, state_);
+      for(auto plot : plots)
+      {
+        handle_plot(mc_rtc::Configuration::fromMessagePack(plot.data(), plot.bytes()));
+      }
+    }
   }
-  data_ = state[1];
-  handle_category({}, "", state[2]);
-  auto plots = state[3];
-  for(size_t i = 0; i < plots.size(); ++i)
+  catch(const std::runtime_error & exc)
   {
-    handle_plot(plots[i]);
+    LOG_ERROR("Failed to read the GUI state: " << exc.what())
   }
   stopped();
 }
 
+void ControllerClient::load_category(CategoryState & category, const mc_rtc::MessagePackView & data)
+{
+  size_t n = data.size();
+  if(n < 2)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "Invalid category in GUI state")
+  }
+  auto it = data.begin();
+  category.name = (*it).asString();
+  std::vector<WidgetState> widgets;
+  widgets.reserve(n - 2);
+  for(size_t i = 0; i < n - 2; ++i)
+  {
+    auto widget = *++it;
+    auto previous = find(category.widgets, i, widget[0]);
+    if(previous != category.widgets.end() && same(previous->raw, widget))
+    {
+      widgets.push_back(std::move(*previous));
+    }
+    else
+    {
+      widgets.emplace_back();
+      update_widget(widgets.back(), widget);
+    }
+  }
+  std::vector<CategoryState> sub;
+  auto sub_data = *++it;
+  sub.reserve(sub_data.size());
+  size_t i = 0;
+  for(auto s : sub_data)
+  {
+    auto previous = find(category.sub, i++, s[0]);
+    if(previous != category.sub.end())
+    {
+      sub.push_back(std::move(*previous));
+    }
+    else
+    {
+      sub.emplace_back();
+    }
+    load_category(sub.back(), s);
+  }
+  category.widgets = std::move(widgets);
+  category.sub = std::move(sub);
+}
+
+void ControllerClient::load_delta(CategoryState & category, const mc_rtc::MessagePackView & data)
+{
+  if(data.size() != 3)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "Invalid category in GUI state delta")
+  }
+  auto it = data.begin();
+  size_t i = 0;
+  for(auto widget : *++it)
+  {
+    auto w = find(category.widgets, i++, widget[0]);
+    if(w != category.widgets.end())
+    {
+      update_widget(*w, widget);
+    }
+  }
+  i = 0;
+  for(auto s : *++it)
+  {
+    auto sub = find(category.sub, i++, s[0]);
+    if(sub != category.sub.end())
+    {
+      load_delta(*sub, s);
+    }
+  }
+}
+
+void ControllerClient::handle_category_state(const std::vector<std::string> & parent, const CategoryState & category)
+{
+  if(category.name.size())
+  {
+    this->category(parent, category.name);
+  }
+  auto next_category = parent;
+  if(category.name.size())
+  {
+    next_category.push_back(category.name);
+  }
+  for(const auto & w : category.widgets)
+  {
+    handle_widget({next_category, w.name, w.sid}, w.data);
+  }
+  for(const auto & s : category.sub)
+  {
+    handle_category_state(next_category, s);
+  }
+}
+
 void ControllerClient::handle_category(const std::vector<std::string> & parent,
                                        const std::string & category,
                                        const mc_rtc::Configuration & data)
@@ -568,6 +769,15 @@ void ControllerClient::handle_form(const ElementId & id, const mc_rtc::Configura
 
 void ControllerClient::handle_plot(const mc_rtc::Configuration & plot)
 {
+  if(plot.size() == 3)
+  {
+    // The plot is still active but has no new data in this message
+    uint64_t id = plot[1];
+    std::string title = plot[2];
+    start_plot(id, title);
+    end_plot(id);
+    return;
+  }
   auto pType = static_cast<mc_rtc::gui::plot::Plot>(static_cast<uint64_t>(plot[0]));
   switch(pType)
   {
@@ -8,16 +8,44 @@
 #include <nanomsg/pipeline.h>
 #include <nanomsg/pubsub.h>
 
+#include <algorithm>
+#include <chrono>
+
 namespace mc_control
 {
 
+namespace
+{
+
+/** Maximum time spent waiting for a request before checking the server state (ms) */
+constexpr int poll_timeout_ms = 50;
+
+/** Maximum number of requests received in a row */
+constexpr size_t max_requests_per_poll = 64;
+
+void handle_request(mc_rtc::gui::StateBuilder & gui_builder, const mc_rtc::Configuration & config)
+{
+  auto category = config("category", std::vector<std::string>{});
+  auto name = config("name", std::string{});
+  auto data = config("data", mc_rtc::Configuration{});
+  if(!gui_builder.handleRequest(category, name, data))
+  {
+    LOG_ERROR("Invokation of the following method failed" << std::endl << config.dump(true) << std::endl)
+  }
+}
+
+} // namespace
+
 ControllerServer::ControllerServer(double dt,
                                    double server_dt,
                                    const std::vector<std::string> & pub_bind_uri,
-                                   const std::vector<std::string> & pull_bind_uri)
+                                   const std::vector<std::string> & pull_bind_uri,
+                                   double keyframe_dt,
+                                   bool threaded)
 {
   iter_ = 0;
   rate_ = static_cast<unsigned int>(ceil(server_dt / dt));
+  keyframe_rate_ = std::max(static_cast<unsigned int>(ceil(keyframe_dt / (rate_ * dt))), 1u);
   auto init_socket = [](int & socket, int proto, const std::vector<std::string> & uris, const std::string & name) {
     socket = nn_socket(AF_SP, proto);
     if(socket < 0)
@@ -35,51 +63,171 @@ ControllerServer::ControllerServer(double dt,
   };
   init_socket(pub_socket_, NN_PUB, pub_bind_uri, "PUB socket");
   init_socket(pull_socket_, NN_PULL, pull_bind_uri, "PULL socket");
+  if(threaded)
+  {
+    thread_ = std::thread([this]() { run(); });
+    receive_thread_ = std::thread([this]() { receive(); });
+  }
 }
 
 ControllerServer::~ControllerServer()
 {
+  if(thread_.joinable())
+  {
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      running_ = false;
+    }
+    cv_.notify_one();
+    thread_.join();
+    receive_thread_.join();
+  }
   nn_shutdown(pub_socket_, 0);
   nn_shutdown(pull_socket_, 0);
 }
 
-void ControllerServer::handle_requests(mc_rtc::gui::StateBuilder & gui_builder)
+bool ControllerServer::receive_request(mc_rtc::Configuration & request)
 {
-  /*FIXME Avoid freeing the message constantly */
   void * buf = nullptr;
-  int recv = 0;
-  do
+  int recv = nn_recv(pull_socket_, &buf, NN_MSG, NN_DONTWAIT);
+  if(recv < 0)
   {
-    recv = nn_recv(pull_socket_, &buf, NN_MSG, NN_DONTWAIT);
-    if(recv < 0)
+    auto err = nn_errno();
+    if(err != EAGAIN)
     {
-      auto err = nn_errno();
-      if(err != EAGAIN)
-      {
-        LOG_ERROR("ControllerServer failed to receive requested with errno: " << err)
-      }
+      LOG_ERROR("ControllerServer failed to receive requested with errno: " << err)
+    }
+    return false;
+  }
+  request = mc_rtc::Configuration::fromData(static_cast<const char *>(buf));
+  nn_freemsg(buf);
+  return true;
+}
+
+void ControllerServer::handle_requests(mc_rtc::gui::StateBuilder & gui_builder)
+{
+  if(thread_.joinable())
+  {
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      std::swap(requests_, handled_requests_);
     }
-    else
+    for(const auto & request : handled_requests_)
     {
-      auto config = mc_rtc::Configuration::fromData(static_cast<const char *>(buf));
-      auto category = config("category", std::vector<std::string>{});
-      auto name = config("name", std::string{});
-      auto data = config("data", mc_rtc::Configuration{});
-      if(!gui_builder.handleRequest(category, name, data))
+      handle_request(gui_builder, request);
+    }
+    handled_requests_.clear();
+    return;
+  }
+  // Requests that do not fit in this batch are handled on the next iteration
+  mc_rtc::Configuration request;
+  for(size_t i = 0; i < max_requests_per_poll && receive_request(request); ++i)
+  {
+    handle_request(gui_builder, request);
+  }
+}
+
+void ControllerServer::publish(mc_rtc::gui::StateBuilder & gui_builder)
+{
+  if(iter_ % rate_ == 0)
+  {
+    snapshot_ = true;
+    keyframe_ = keyframe_ || (iter_ / rate_) % keyframe_rate_ == 0;
+  }
+  iter_++;
+  if(!snapshot_)
+  {
+    return;
+  }
+  keyframe_ = keyframe_ || &gui_builder != gui_;
+  gui_ = &gui_builder;
+  if(!thread_.joinable())
+  {
+    auto s = gui_builder.update(buffer_, keyframe_);
+    if(s)
+    {
+      nn_send(pub_socket_, buffer_.data(), s, 0);
+    }
+  }
+  else
+  {
+    if(!gui_builder.snapshot())
+    {
+      // The server thread is taking the previous snapshot, try again on the next iteration
+      return;
+    }
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      pending_gui_ = &gui_builder;
+      pending_keyframe_ = pending_keyframe_ || keyframe_;
+    }
+    cv_.notify_one();
+  }
+  snapshot_ = false;
+  keyframe_ = false;
+}
+
+void ControllerServer::run()
+{
+  std::unique_lock<std::mutex> lock(mutex_);
+  while(running_)
+  {
+    cv_.wait(lock, [this]() { return !running_ || pending_gui_ != nullptr; });
+    auto gui = pending_gui_;
+    bool keyframe = pending_keyframe_;
+    pending_gui_ = nullptr;
+    pending_keyframe_ = false;
+    lock.unlock();
+    if(gui)
+    {
+      auto s = gui->writeSnapshot(buffer_, keyframe);
+      if(s)
       {
-        LOG_ERROR("Invokation of the following method failed" << std::endl << config.dump(true) << std::endl)
+        nn_send(pub_socket_, buffer_.data(), s, 0);
       }
-      nn_freemsg(buf);
     }
-  } while(recv > 0);
+    lock.lock();
+  }
 }
 
-void ControllerServer::publish(mc_rtc::gui::StateBuilder & gui_builder)
+void ControllerServer::receive()
 {
-  if(iter_++ % rate_ == 0)
+  std::vector<mc_rtc::Configuration> received;
+  mc_rtc::Configuration request;
+  while(true)
   {
-    auto s = gui_builder.update(buffer_);
-    nn_send(pub_socket_, buffer_.data(), s, 0);
+    // Wait for a request, the timeout only bounds the time it takes to notice the server is stopped
+    nn_pollfd pfd;
+    pfd.fd = pull_socket_;
+    pfd.events = NN_POLLIN;
+    pfd.revents = 0;
+    int ready = nn_poll(&pfd, 1, poll_timeout_ms);
+    if(ready < 0)
+    {
+      auto err = nn_errno();
+      if(err == ETERM)
+      {
+        return;
+      }
+      if(err != EINTR)
+      {
+        LOG_ERROR("ControllerServer failed to poll with errno: " << err)
+      }
+    }
+    else if(ready > 0)
+    {
+      for(size_t i = 0; i < max_requests_per_poll && receive_request(request); ++i)
+      {
+        received.push_back(request);
+      }
+    }
+    std::lock_guard<std::mutex> lock(mutex_);
+    if(!running_)
+    {
+      return;
+    }
+    requests_.insert(requests_.end(), received.begin(), received.end());
+    received.clear();
   }
 }
 
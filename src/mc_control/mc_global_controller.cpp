@@ -191,7 +191,9 @@ MCGlobalController::MCGlobalController(const GlobalConfiguration & conf)
   {
     for(auto c : controllers)
     {
-      c.second->logger().setup(config.log_policy, config.log_directory, config.log_template);
+      c.second->logger().setup(config.log_policy, config.log_directory, config.log_template, config.log_buffer_size);
+      c.second->logger().rotation(config.log_rotation_size, config.log_rotation_duration);
+      c.second->logger().index(config.log_index);
     }
   }
   if(config.enable_gui_server)
@@ -203,7 +205,8 @@ MCGlobalController::MCGlobalController(const GlobalConfiguration & conf)
     else
     {
       server_.reset(new mc_control::ControllerServer(config.timestep, config.gui_timestep, config.gui_server_pub_uris,
-                                                     config.gui_server_rep_uris));
+                                                     config.gui_server_rep_uris, config.gui_keyframe_timestep,
+                                                     config.gui_server_threaded));
     }
   }
 }
@@ -729,7 +732,10 @@ bool MCGlobalController::AddController(const std::string & name)
     controllers[name]->realRobots(real_robots);
     if(config.enable_log)
     {
-      controllers[name]->logger().setup(config.log_policy, config.log_directory, config.log_template);
+      controllers[name]->logger().setup(config.log_policy, config.log_directory, config.log_template,
+                                        config.log_buffer_size);
+      controllers[name]->logger().rotation(config.log_rotation_size, config.log_rotation_duration);
+      controllers[name]->logger().index(config.log_index);
     }
 
     // Give access to real robots to each enabled controller
@@ -812,7 +818,10 @@ bool MCGlobalController::AddController(const std::string & name, std::shared_ptr
   controllers[name]->realRobots(real_robots);
   if(config.enable_log)
   {
-    controllers[name]->logger().setup(config.log_policy, config.log_directory, config.log_template);
+    controllers[name]->logger().setup(config.log_policy, config.log_directory, config.log_template,
+                                      config.log_buffer_size);
+    controllers[name]->logger().rotation(config.log_rotation_size, config.log_rotation_duration);
+    controllers[name]->logger().index(config.log_index);
   }
   return true;
 }
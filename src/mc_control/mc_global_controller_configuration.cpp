@@ -284,6 +284,20 @@ MCGlobalController::GlobalConfiguration::GlobalConfiguration(const std::string &
     }
   }
   config("LogTemplate", log_template);
+  {
+    unsigned int buffer_size = static_cast<unsigned int>(log_buffer_size / (1024 * 1024));
+    config("LogBufferSize", buffer_size);
+    log_buffer_size = static_cast<size_t>(buffer_size) * 1024 * 1024;
+  }
+  if(config.has("LogRotation"))
+  {
+    auto rotation = config("LogRotation");
+    unsigned int size = 0;
+    rotation("Size", size);
+    log_rotation_size = static_cast<size_t>(size) * 1024 * 1024;
+    rotation("Duration", log_rotation_duration);
+  }
+  config("LogIndex", log_index);
 
   /////////////////////////
   //  GUI server options //
@@ -293,6 +307,8 @@ MCGlobalController::GlobalConfiguration::GlobalConfiguration(const std::string &
     auto gui_config = config("GUIServer");
     enable_gui_server = gui_config("Enable", false);
     gui_timestep = gui_config("Timestep", 0.05);
+    gui_keyframe_timestep = gui_config("KeyframeTimestep", 1.0);
+    gui_server_threaded = gui_config("Threaded", false);
     if(gui_config.has("IPC"))
     {
       auto ipc_config = gui_config("IPC");
@@ -0,0 +1,125 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#include <mc_rtc/log/CompressedFlatLog.h>
+
+#include "internals/CompressedFlatLog.h"
+
+namespace mc_rtc
+{
+
+namespace log
+{
+
+constexpr size_t CompressedFlatLogWriter::default_block_size;
+
+namespace
+{
+
+using namespace internal::cflat;
+
+Stats stats(const double * data, size_t size)
+{
+  Stats ret;
+  for(size_t i = 0; i < size; ++i)
+  {
+    ret.update(data[i]);
+  }
+  return ret;
+}
+
+Stats stats(const std::string * data, size_t size)
+{
+  Stats ret;
+  for(size_t i = 0; i < size; ++i)
+  {
+    ret.nan += data[i].empty();
+  }
+  return ret;
+}
+
+} // namespace
+
+CompressedFlatLogWriter::CompressedFlatLogWriter(const std::string & fpath, size_t block_size)
+: ofs_(fpath, std::ofstream::binary), block_size_(std::max<size_t>(block_size, 1))
+{
+  if(!ofs_.is_open())
+  {
+    LOG_ERROR("Failed to open " << fpath << " for writing")
+    return;
+  }
+  ofs_.write(magic, sizeof(magic));
+  ofs_.write((const char *)&version, sizeof(version));
+  offset_ = sizeof(magic) + sizeof(version);
+}
+
+CompressedFlatLogWriter::~CompressedFlatLogWriter()
+{
+  close();
+}
+
+void CompressedFlatLogWriter::write(const std::string & entry, const double * data, size_t size)
+{
+  write(entry, true, data, size);
+}
+
+void CompressedFlatLogWriter::write(const std::string & entry, const std::vector<std::string> & data)
+{
+  write(entry, false, data.data(), data.size());
+}
+
+template<typename T>
+void CompressedFlatLogWriter::write(const std::string & entry, bool numeric, const T * data, size_t size)
+{
+  if(!ofs_.is_open())
+  {
+    return;
+  }
+  std::string blocks;
+  Stats column_stats;
+  uint64_t nblocks = 0;
+  for(size_t start = 0; start < size; start += block_size_)
+  {
+    size_t n = std::min(block_size_, size - start);
+    auto block = encode(data + start, n);
+    auto block_stats = stats(data + start, n);
+    column_stats.update(block_stats);
+    ofs_.write(block.data(), static_cast<std::streamsize>(block.size()));
+    internal::cflat::write(blocks, offset_);
+    internal::cflat::write(blocks, static_cast<uint64_t>(block.size()));
+    internal::cflat::write(blocks, block_stats);
+    offset_ += block.size();
+    nblocks++;
+  }
+  internal::cflat::write(footer_, numeric);
+  internal::cflat::write(footer_, static_cast<uint64_t>(entry.size()));
+  footer_.append(entry);
+  internal::cflat::write(footer_, static_cast<uint64_t>(size));
+  internal::cflat::write(footer_, column_stats);
+  internal::cflat::write(footer_, nblocks);
+  footer_.append(blocks);
+  columns_++;
+}
+
+bool CompressedFlatLogWriter::close()
+{
+  if(!ofs_.is_open())
+  {
+    return false;
+  }
+  uint64_t footer = offset_;
+  uint64_t block_size = block_size_;
+  ofs_.write((const char *)&block_size, sizeof(uint64_t));
+  ofs_.write((const char *)&columns_, sizeof(uint64_t));
+  ofs_.write(footer_.data(), static_cast<std::streamsize>(footer_.size()));
+  ofs_.write((const char *)&footer, sizeof(uint64_t));
+  ofs_.write(magic, sizeof(magic));
+  bool ok = static_cast<bool>(ofs_);
+  ofs_.close();
+  return ok;
+}
+
+} // namespace log
+
+} // namespace mc_rtc
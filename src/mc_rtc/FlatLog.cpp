@@ -9,8 +9,11 @@
 #include <boost/filesystem.hpp>
 namespace bfs = boost::filesystem;
 
+#include "internals/CompressedFlatLog.h"
 #include "internals/LogEntry.h"
+#include <algorithm>
 #include <fstream>
+#include <thread>
 
 namespace mc_rtc
 {
@@ -20,72 +23,191 @@ namespace log
 
 FlatLog::record::record() : type(), data(nullptr, internal::void_deleter<int>) {}
 
+namespace
+{
+
+/** Binary logs are not split in chunks smaller than this */
+constexpr uint64_t min_chunk_size = 256 * 1024;
+
+std::unique_ptr<FlatLog::column_base> make_column_data(LogType type)
+{
+#define CASE_ENUM(ENUM, CPPT) \
+  case LogType::ENUM:         \
+    return std::unique_ptr<FlatLog::column_base>(new FlatLog::column_data<CPPT>());
+  switch(type)
+  {
+    CASE_ENUM(Bool, bool)
+    CASE_ENUM(Int8_t, int8_t)
+    CASE_ENUM(Int16_t, int16_t)
+    CASE_ENUM(Int32_t, int32_t)
+    CASE_ENUM(Int64_t, int64_t)
+    CASE_ENUM(Uint8_t, uint8_t)
+    CASE_ENUM(Uint16_t, uint16_t)
+    CASE_ENUM(Uint32_t, uint32_t)
+    CASE_ENUM(Uint64_t, uint64_t)
+    CASE_ENUM(Float, float)
+    CASE_ENUM(Double, double)
+    CASE_ENUM(String, std::string)
+    CASE_ENUM(Vector2d, Eigen::Vector2d)
+    CASE_ENUM(Vector3d, Eigen::Vector3d)
+    CASE_ENUM(Vector6d, Eigen::Vector6d)
+    CASE_ENUM(VectorXd, Eigen::VectorXd)
+    CASE_ENUM(Quaterniond, Eigen::Quaterniond)
+    CASE_ENUM(PTransformd, sva::PTransformd)
+    CASE_ENUM(ForceVecd, sva::ForceVecd)
+    CASE_ENUM(MotionVecd, sva::MotionVecd)
+    CASE_ENUM(VectorDouble, std::vector<double>)
+    default:
+      return nullptr;
+  }
+#undef CASE_ENUM
+}
+
+} // namespace
+
 FlatLog::FlatLog(const std::string & fpath)
 {
   load(fpath);
 }
 
-void FlatLog::load(const std::string & fpath)
+void FlatLog::load(const std::string & fpath, double from, double to)
 {
   data_.clear();
-  append(fpath);
+  index_.clear();
+  size_ = 0;
+  append(fpath, from, to);
 }
 
-void FlatLog::append(const std::string & f)
+void FlatLog::append(const std::string & f, double from, double to)
 {
   auto fpath = bfs::path(f);
   if(fpath.extension() == ".flat")
   {
     appendFlat(f);
   }
+  else if(fpath.extension() == ".cflat")
+  {
+    appendCompressedFlat(f, from, to);
+  }
   else
   {
-    appendBin(f);
+    appendBin(f, from, to);
   }
 }
 
-void FlatLog::appendBin(const std::string & f)
+void FlatLog::appendBin(const std::string & f, double from, double to)
 {
+  bool window = from > 0 || to < std::numeric_limits<double>::infinity();
+  size_t threads = threads_ != 0 ? threads_ : std::max<size_t>(std::thread::hardware_concurrency(), 1);
+  if(!window && threads > 1)
+  {
+    for(const auto & s : log_segments(f))
+    {
+      appendBin(s, threads);
+    }
+    return;
+  }
   std::vector<size_t> currentIndexes = {};
-  std::vector<size_t> missingIndexes = {};
-  size_t size = data_.size() ? data_[0].records.size() : 0;
   mc_rtc::log::binary_log_callback callback = [&](const std::vector<std::string> & ks,
                                                   std::vector<mc_rtc::log::FlatLog::record> & records, double) {
-    if(ks.size())
+    appendRecords(currentIndexes, ks, records);
+    return true;
+  };
+  iterate_binary_log(f, callback, true, window ? "t" : "", from, to);
+  resize();
+}
+
+void FlatLog::appendBin(const std::string & f, size_t threads)
+{
+  auto chunks = binary_log_chunks(f, threads, min_chunk_size);
+  std::vector<FlatLog> parts(chunks.size());
+  std::vector<std::thread> workers;
+  for(size_t i = 0; i < chunks.size(); ++i)
+  {
+    auto decode = [&, i]() {
+      auto & part = parts[i];
+      std::vector<size_t> currentIndexes = {};
+      iterate_binary_log(f, chunks[i],
+                         [&](const std::vector<std::string> & ks, std::vector<FlatLog::record> & records, double) {
+                           part.appendRecords(currentIndexes, ks, records);
+                           return true;
+                         },
+                         true, "");
+      part.resize();
+    };
+    if(i + 1 == chunks.size())
     {
-      for(const auto & k : missingIndexes)
-      {
-        data_[k].records.resize(size);
-      }
-      currentIndexes.clear();
-      for(const auto & k : ks)
-      {
-        currentIndexes.push_back(index(k, size));
-      }
-      missingIndexes.clear();
-      for(size_t i = 0; i < data_.size(); ++i)
-      {
-        if(std::find(currentIndexes.begin(), currentIndexes.end(), i) == currentIndexes.end())
-        {
-          missingIndexes.push_back(i);
-        }
-      }
+      // Use the calling thread for the last chunk
+      decode();
     }
-    for(size_t i = 0; i < records.size(); ++i)
+    else
     {
-      auto & out = data_[currentIndexes[i]].records;
-      out.push_back(std::move(records[i]));
+      workers.emplace_back(decode);
     }
-    size += 1;
-    return true;
-  };
-  iterate_binary_log(f, callback, true, "");
-  for(const auto & k : missingIndexes)
+  }
+  for(auto & w : workers)
+  {
+    w.join();
+  }
+  for(auto & part : parts)
   {
-    data_[k].records.resize(size);
+    merge(std::move(part));
   }
 }
 
+void FlatLog::appendRecords(std::vector<size_t> & indexes,
+                            const std::vector<std::string> & keys,
+                            std::vector<record> & records)
+{
+  if(keys.size())
+  {
+    indexes.clear();
+    for(const auto & k : keys)
+    {
+      indexes.push_back(index(k));
+    }
+  }
+  for(size_t i = 0; i < records.size(); ++i)
+  {
+    auto & r = records[i];
+    if(r.type == LogType::None || !r.data)
+    {
+      continue;
+    }
+    auto & c = getColumn(data_[indexes[i]], r.type);
+    if(c.valid.size() <= size_)
+    {
+      // std::vector growth policy keeps this amortized
+      c.valid.resize(size_ + 1, false);
+      c.data->resize(size_ + 1);
+    }
+    c.valid[size_] = true;
+    c.data->set(size_, r);
+  }
+  size_ += 1;
+}
+
+void FlatLog::merge(FlatLog && log)
+{
+  for(auto & e : log.data_)
+  {
+    size_t idx = index(e.name);
+    for(auto & c : e.columns)
+    {
+      auto & column = getColumn(data_[idx], c.type);
+      column.valid.resize(size_, false);
+      column.valid.insert(column.valid.end(), c.valid.begin(), c.valid.end());
+      column.data->resize(size_);
+      column.data->append(*c.data);
+    }
+  }
+  size_ += log.size_;
+  resize();
+  log.data_.clear();
+  log.index_.clear();
+  log.size_ = 0;
+}
+
 void FlatLog::appendFlat(const std::string & f)
 {
   auto fpath = bfs::path(f);
@@ -100,14 +222,9 @@ void FlatLog::appendFlat(const std::string & f)
     LOG_ERROR("Failed to open " << f)
     return;
   }
-  size_t size = 0;
-  if(data_.size())
-  {
-    size = data_[0].records.size();
-  }
   uint64_t nEntries = 0;
   ifs.read((char *)&nEntries, sizeof(uint64_t));
-  size_t nsize = 0;
+  size_t nsize = size_;
   for(size_t i = 0; i < nEntries; ++i)
   {
     bool is_numeric = false;
@@ -116,52 +233,163 @@ void FlatLog::appendFlat(const std::string & f)
     ifs.read((char *)&sz, sizeof(uint64_t));
     std::string key(sz, '0');
     ifs.read(&key[0], static_cast<int>(sz * sizeof(char)));
-    auto idx = index(key, size);
+    auto & e = data_[index(key)];
     ifs.read((char *)&sz, sizeof(uint64_t));
-    auto & entries = data_[idx].records;
-    for(size_t i = 0; i < sz; ++i)
+    auto & c = getColumn(e, is_numeric ? LogType::Double : LogType::String);
+    c.valid.resize(size_ + sz, false);
+    c.data->resize(size_ + sz);
+    if(is_numeric)
     {
-      if(is_numeric)
+      auto & data = static_cast<column_data<double> &>(*c.data).data;
+      ifs.read(reinterpret_cast<char *>(data.data() + size_), static_cast<std::streamsize>(sz * sizeof(double)));
+      for(size_t j = size_; j < size_ + sz; ++j)
       {
-        double data = 0;
-        ifs.read((char *)&data, sizeof(double));
-        if(std::isnan(data))
+        c.valid[j] = !std::isnan(data[j]);
+      }
+    }
+    else
+    {
+      auto & data = static_cast<column_data<std::string> &>(*c.data).data;
+      for(size_t j = size_; j < size_ + sz; ++j)
+      {
+        uint64_t str_sz = 0;
+        ifs.read((char *)&str_sz, sizeof(uint64_t));
+        if(str_sz != 0)
         {
-          entries.emplace_back(LogType::None, record::unique_void_ptr{nullptr, internal::void_deleter<int>});
+          data[j].resize(str_sz);
+          ifs.read(&data[j][0], static_cast<std::streamsize>(str_sz * sizeof(char)));
+          c.valid[j] = true;
         }
-        else
+      }
+    }
+    nsize = std::max<size_t>(nsize, size_ + sz);
+  }
+  size_ = nsize;
+  resize();
+}
+
+void FlatLog::threads(size_t n)
+{
+  threads_ = n;
+}
+
+void FlatLog::appendCompressedFlat(const std::string & f, double from, double to)
+{
+  std::ifstream ifs(f, std::ifstream::binary);
+  if(!ifs.is_open())
+  {
+    LOG_ERROR("Failed to open " << f)
+    return;
+  }
+  uint64_t block_rows = 0;
+  std::vector<internal::cflat::Column> columns;
+  if(!internal::cflat::read_footer(ifs, block_rows, columns) || block_rows == 0)
+  {
+    LOG_ERROR("Log " << f << " is not a valid compressed flat log")
+    return;
+  }
+  std::vector<char> buffer;
+  auto read_block = [&](const internal::cflat::Block & b) {
+    buffer.resize(b.size);
+    ifs.seekg(static_cast<std::streamoff>(b.offset));
+    ifs.read(buffer.data(), static_cast<std::streamsize>(b.size));
+    return static_cast<bool>(ifs);
+  };
+  // Rows to load
+  uint64_t begin = 0;
+  uint64_t end = 0;
+  for(const auto & c : columns)
+  {
+    end = std::max(end, c.rows);
+  }
+  if(from > 0 || to < std::numeric_limits<double>::infinity())
+  {
+    auto it = std::find_if(columns.begin(), columns.end(),
+                           [](const internal::cflat::Column & c) { return c.numeric && c.key == "t"; });
+    if(it == columns.end())
+    {
+      LOG_ERROR("Request time key: t not found in log")
+      return;
+    }
+    // Only decode the time blocks that overlap the window
+    begin = end;
+    end = 0;
+    std::vector<double> t(block_rows);
+    for(size_t i = 0; i < it->blocks.size(); ++i)
+    {
+      const auto & b = it->blocks[i];
+      if(b.stats.max < from || b.stats.min > to)
+      {
+        continue;
+      }
+      uint64_t start = i * block_rows;
+      size_t n = static_cast<size_t>(std::min(block_rows, it->rows - start));
+      if(!read_block(b) || !internal::cflat::decode(buffer.data(), b.size, t.data(), n))
+      {
+        LOG_ERROR("Failed to decode " << it->key << " in " << f)
+        return;
+      }
+      for(size_t j = 0; j < n; ++j)
+      {
+        if(t[j] >= from && t[j] <= to)
         {
-          entries.emplace_back(LogType::Double,
-                               record::unique_void_ptr{new double(data), internal::void_deleter<double>});
+          begin = std::min(begin, start + j);
+          end = std::max(end, start + j + 1);
         }
       }
-      else
+    }
+    if(end <= begin)
+    {
+      return;
+    }
+  }
+  size_t rows = static_cast<size_t>(end - begin);
+  std::vector<double> numbers(block_rows);
+  std::vector<std::string> strings(block_rows);
+  for(const auto & c : columns)
+  {
+    auto & e = data_[index(c.key)];
+    auto & col = getColumn(e, c.numeric ? LogType::Double : LogType::String);
+    col.valid.resize(size_ + rows, false);
+    col.data->resize(size_ + rows);
+    for(size_t i = begin / block_rows; i < c.blocks.size() && i * block_rows < end; ++i)
+    {
+      const auto & b = c.blocks[i];
+      uint64_t start = i * block_rows;
+      size_t n = static_cast<size_t>(std::min(block_rows, c.rows - start));
+      bool ok = read_block(b);
+      ok = ok
+           && (c.numeric ? internal::cflat::decode(buffer.data(), b.size, numbers.data(), n)
+                         : internal::cflat::decode(buffer.data(), b.size, strings.data(), n));
+      if(!ok)
       {
-        uint64_t str_sz = 0;
-        ifs.read((char *)&str_sz, sizeof(uint64_t));
-        if(str_sz == 0)
+        LOG_ERROR("Failed to decode " << c.key << " in " << f)
+        break;
+      }
+      for(uint64_t j = std::max(start, begin); j < std::min<uint64_t>(start + n, end); ++j)
+      {
+        size_t idx = size_ + static_cast<size_t>(j - begin);
+        size_t k = static_cast<size_t>(j - start);
+        if(c.numeric)
         {
-          entries.emplace_back(LogType::None, record::unique_void_ptr{nullptr, internal::void_deleter<int>});
+          static_cast<column_data<double> &>(*col.data).data[idx] = numbers[k];
+          col.valid[idx] = !std::isnan(numbers[k]);
         }
         else
         {
-          std::string * str = new std::string(str_sz, '0');
-          ifs.read(&((*str)[0]), static_cast<int>(str_sz * sizeof(char)));
-          entries.emplace_back(LogType::String, record::unique_void_ptr{str, internal::void_deleter<std::string>});
+          col.valid[idx] = !strings[k].empty();
+          static_cast<column_data<std::string> &>(*col.data).data[idx] = std::move(strings[k]);
         }
       }
     }
-    nsize = entries.size();
-  }
-  for(auto & e : data_)
-  {
-    e.records.resize(nsize);
   }
+  size_ += rows;
+  resize();
 }
 
 size_t FlatLog::size() const
 {
-  return data_.size() == 0 ? 0 : data_[0].records.size();
+  return size_;
 }
 
 std::set<std::string> FlatLog::entries() const
@@ -176,8 +404,7 @@ std::set<std::string> FlatLog::entries() const
 
 bool FlatLog::has(const std::string & entry) const
 {
-  return std::find_if(data_.begin(), data_.end(), [&entry](const FlatLog::entry & e) { return e.name == entry; })
-         != data_.end();
+  return index_.count(entry) != 0;
 }
 
 std::set<LogType> FlatLog::types(const std::string & entry) const
@@ -188,11 +415,13 @@ std::set<LogType> FlatLog::types(const std::string & entry) const
     return {};
   }
   std::set<LogType> ret;
-  for(const auto & r : at(entry))
+  for(const auto & c : at(entry).columns)
   {
-    ret.insert(r.type);
+    if(std::find(c.valid.begin(), c.valid.end(), true) != c.valid.end())
+    {
+      ret.insert(c.type);
+    }
   }
-  ret.erase(mc_rtc::log::LogType::None);
   return ret;
 }
 
@@ -203,41 +432,70 @@ LogType FlatLog::type(const std::string & entry) const
     LOG_ERROR("No entry named " << entry << " in the loaded log")
     return {};
   }
-  for(const auto & r : at(entry))
+  LogType ret = mc_rtc::log::LogType::None;
+  size_t first = size_;
+  for(const auto & c : at(entry).columns)
   {
-    if(r.type != mc_rtc::log::LogType::None)
+    size_t idx = static_cast<size_t>(std::find(c.valid.begin(), c.valid.end(), true) - c.valid.begin());
+    if(idx < first)
     {
-      return r.type;
+      first = idx;
+      ret = c.type;
     }
   }
-  return mc_rtc::log::LogType::None;
+  return ret;
+}
+
+const FlatLog::entry & FlatLog::at(const std::string & entry) const
+{
+  auto it = index_.find(entry);
+  if(it == index_.end())
+  {
+    throw(std::runtime_error("No such entry"));
+  }
+  return data_[it->second];
 }
 
-const std::vector<FlatLog::record> & FlatLog::at(const std::string & entry) const
+size_t FlatLog::index(const std::string & entry)
 {
-  for(const auto & d : data_)
+  auto it = index_.find(entry);
+  if(it != index_.end())
   {
-    if(d.name == entry)
+    return it->second;
+  }
+  data_.push_back({entry, {}});
+  index_[entry] = data_.size() - 1;
+  return data_.size() - 1;
+}
+
+FlatLog::column & FlatLog::getColumn(entry & e, LogType type)
+{
+  for(auto & c : e.columns)
+  {
+    if(c.type == type)
     {
-      return d.records;
+      return c;
     }
   }
-  throw(std::runtime_error("No such entry"));
+  e.columns.emplace_back();
+  auto & c = e.columns.back();
+  c.type = type;
+  c.data = make_column_data(type);
+  c.valid.resize(size_, false);
+  c.data->resize(size_);
+  return c;
 }
 
-size_t FlatLog::index(const std::string & entry, size_t size)
+void FlatLog::resize()
 {
-  for(size_t i = 0; i < data_.size(); ++i)
+  for(auto & e : data_)
   {
-    auto & e = data_[i];
-    if(e.name == entry)
+    for(auto & c : e.columns)
     {
-      e.records.resize(size);
-      return i;
+      c.valid.resize(size_, false);
+      c.data->resize(size_);
     }
   }
-  data_.push_back({entry, std::vector<FlatLog::record>{size}});
-  return data_.size() - 1;
 }
 
 } // namespace log
@@ -2,21 +2,27 @@
  * Copyright 2015-2019 CNRS-UM LIRMM, CNRS-AIST JRL
  */
 
+#include <mc_rtc/Configuration.h>
 #include <mc_rtc/log/Logger.h>
+#include <mc_rtc/log/iterate_binary_log.h>
 #include <mc_rtc/utils.h>
 
 #include <boost/filesystem.hpp>
 namespace bfs = boost::filesystem;
 
 #include <chrono>
+#include <condition_variable>
 #include <fstream>
 #include <iomanip>
+#include <mutex>
 #include <thread>
 
 namespace mc_rtc
 {
 
 const uint8_t Logger::magic[4] = {0x41, 0x4e, 0x4e, 0x45};
+const uint8_t Logger::index_magic[4] = {0x41, 0x4e, 0x4e, 0x49};
+constexpr size_t Logger::default_buffer_size;
 
 struct LoggerImpl
 {
@@ -27,8 +33,20 @@ struct LoggerImpl
 
   virtual ~LoggerImpl() {}
 
-  virtual void initialize(const bfs::path & path) = 0;
-  virtual void write(char * data, size_t size) = 0;
+  /** Start a new run, t is the time of the first entry */
+  virtual void initialize(const bfs::path & path, double t) = 0;
+  /** Returns false if the data could not be written */
+  virtual bool write(char * data, size_t size) = 0;
+  /** Start a new segment before the next write, returns false if the request could not be made */
+  virtual bool rotate(double t) = 0;
+  /** Index the next write, keys is true if it holds the keys, returns false if the request could not be made */
+  virtual bool index(double t, bool keys) = 0;
+
+  /** Ratio of the buffer in use, always zero for unbuffered policies */
+  virtual double buffer_usage() const
+  {
+    return 0;
+  }
 
   std::vector<char> data_;
 
@@ -36,13 +54,129 @@ struct LoggerImpl
   std::string tmpl;
   double log_iter_ = 0;
   bool valid_ = true;
+  /** Number of entries dropped because they could not be written */
+  uint64_t dropped_ = 0;
   std::ofstream log_;
+  /** Path of the -latest symlink */
+  bfs::path latest_;
+
+  /** Segments maximum size (bytes) and duration (s), 0 to disable */
+  size_t rotation_size_ = 0;
+  double rotation_duration_ = 0;
+  /** True if the time index is written */
+  bool index_enabled_ = false;
+  /** Data written to the current segment and its starting time, used on the logging side */
+  size_t segment_size_ = 0;
+  double segment_start_ = 0;
+
+  bool rotating() const
+  {
+    return rotation_size_ != 0 || rotation_duration_ != 0;
+  }
 
 protected:
-  inline void fwrite(char * data, uint64_t size)
+  /** Path of the run without extension, segments are [run]-[segment].bin and the manifest is [run].json */
+  bfs::path run_;
+  /** Start time of each segment in the current run */
+  std::vector<double> segments_;
+  /** Time index of the current file */
+  std::ofstream index_;
+  /** Position of the next write and of the last keys in the current file */
+  uint64_t offset_ = 0;
+  uint64_t keys_offset_ = 0;
+
+  void write_index(double t, bool keys)
+  {
+    if(keys)
+    {
+      keys_offset_ = offset_;
+    }
+    mc_rtc::log::LogIndexEntry entry{t, offset_, keys_offset_};
+    index_.write((const char *)&entry, sizeof(entry));
+  }
+
+  /** Open the run file or its first segment */
+  void open_run(const bfs::path & path, double t)
+  {
+    if(log_.is_open())
+    {
+      log_.close();
+    }
+    if(rotating())
+    {
+      run_ = path;
+      run_.replace_extension();
+      segments_.clear();
+      next_segment(t);
+    }
+    else
+    {
+      open(path.string());
+      link_latest(path);
+    }
+  }
+
+  /** Close the current segment and open the next one */
+  void next_segment(double t)
+  {
+    if(log_.is_open())
+    {
+      log_.close();
+    }
+    segments_.push_back(t);
+    auto path = segment_path(segments_.size() - 1);
+    open(path.string());
+    link_latest(path);
+    write_manifest();
+  }
+
+  bfs::path segment_path(size_t i) const
+  {
+    std::stringstream ss;
+    ss << run_.filename().string() << "-" << std::setw(4) << std::setfill('0') << i << ".bin";
+    return run_.parent_path() / ss.str();
+  }
+
+  /** Write the list of segments, see mc_rtc::log::log_segments */
+  void write_manifest() const
+  {
+    mc_rtc::Configuration manifest;
+    auto segments = manifest.array("segments", segments_.size());
+    for(size_t i = 0; i < segments_.size(); ++i)
+    {
+      auto segment = segments.object();
+      segment.add("file", segment_path(i).filename().string());
+      segment.add("start", segments_[i]);
+    }
+    manifest.save(run_.string() + ".json");
+  }
+
+  void link_latest(const bfs::path & path)
+  {
+    if(bfs::is_symlink(latest_))
+    {
+      bfs::remove(latest_);
+    }
+    if(!bfs::exists(latest_))
+    {
+      boost::system::error_code ec;
+      bfs::create_symlink(path, latest_, ec);
+      if(!ec)
+      {
+        LOG_INFO("Updated latest log symlink: " << latest_)
+      }
+      else
+      {
+        LOG_INFO("Failed to create latest log symlink: " << ec.message())
+      }
+    }
+  }
+
+  inline void fwrite(const char * data, uint64_t size)
   {
     log_.write((char *)&size, sizeof(uint64_t));
     log_.write(data, static_cast<int>(size));
+    offset_ += sizeof(uint64_t) + size;
   }
 
   // Open file and write magic number to it right away
@@ -50,6 +184,17 @@ protected:
   {
     log_.open(path, std::ofstream::binary);
     log_.write((const char *)&Logger::magic, sizeof(Logger::magic));
+    offset_ = sizeof(Logger::magic);
+    keys_offset_ = offset_;
+    if(index_.is_open())
+    {
+      index_.close();
+    }
+    if(index_enabled_)
+    {
+      index_.open(mc_rtc::log::log_index_path(path), std::ofstream::binary);
+      index_.write((const char *)&Logger::index_magic, sizeof(Logger::index_magic));
+    }
   }
 };
 
@@ -59,107 +204,180 @@ struct LoggerNonThreadedPolicyImpl : public LoggerImpl
 {
   LoggerNonThreadedPolicyImpl(const std::string & directory, const std::string & tmpl) : LoggerImpl(directory, tmpl) {}
 
-  virtual void initialize(const bfs::path & path) final
+  virtual void initialize(const bfs::path & path, double t) final
   {
-    if(log_.is_open())
+    open_run(path, t);
+  }
+
+  virtual bool write(char * data, size_t size) final
+  {
+    if(valid_)
     {
-      log_.close();
+      fwrite(data, size);
     }
-    open(path.string());
+    return true;
   }
 
-  virtual void write(char * data, size_t size) final
+  virtual bool rotate(double t) final
+  {
+    next_segment(t);
+    return true;
+  }
+
+  virtual bool index(double t, bool keys) final
   {
     if(valid_)
     {
-      fwrite(data, size);
+      write_index(t, keys);
     }
+    return true;
   }
 };
 
 struct LoggerThreadedPolicyImpl : public LoggerImpl
 {
-  LoggerThreadedPolicyImpl(const std::string & directory, const std::string & tmpl) : LoggerImpl(directory, tmpl)
+  LoggerThreadedPolicyImpl(const std::string & directory, const std::string & tmpl, size_t buffer_size)
+  : LoggerImpl(directory, tmpl), buffer_(buffer_size)
   {
     log_sync_th_ = std::thread([this]() {
-      while(log_sync_th_run_ && valid_)
+      while(log_sync_th_run_)
       {
-        while(!write_data())
-          ;
-        std::this_thread::sleep_for(std::chrono::microseconds(500));
+        write_data();
+        std::unique_lock<std::mutex> lock(log_sync_mutex_);
+        log_sync_waiting_ = true;
+        if(buffer_.empty() && log_sync_th_run_)
+        {
+          // The timeout only guards against a missed notification
+          log_sync_cv_.wait_for(lock, std::chrono::milliseconds(10));
+        }
+        log_sync_waiting_ = false;
       }
-      while(!write_data())
-        ;
+      write_data();
     });
   }
 
   ~LoggerThreadedPolicyImpl()
   {
-    log_sync_th_run_ = false;
+    {
+      std::unique_lock<std::mutex> lock(log_sync_mutex_);
+      log_sync_th_run_ = false;
+    }
+    log_sync_cv_.notify_one();
     if(log_sync_th_.joinable())
     {
       log_sync_th_.join();
     }
   }
 
-  // Returns true when all data has been consumed
-  bool write_data()
+  /** Write all data available in the buffer */
+  void write_data()
   {
-    if(data_.pop(pop_))
+    const char * data = nullptr;
+    size_t size = 0;
+    while(buffer_.front(data, size))
     {
-      char * data = pop_.first;
-      size_t size = pop_.second;
-      fwrite(data, size);
-      delete[] data;
-      return false;
+      // Log entries always start with a MessagePack array marker, see rotate() and index()
+      if(size == sizeof(rotate_marker_) && data[0] == 0)
+      {
+        double t = 0;
+        std::memcpy(&t, data + 1, sizeof(double));
+        next_segment(t);
+      }
+      else if(size == sizeof(index_marker_) && data[0] == 1)
+      {
+        double t = 0;
+        std::memcpy(&t, data + 1, sizeof(double));
+        write_index(t, data[1 + sizeof(double)] != 0);
+      }
+      else
+      {
+        fwrite(data, size);
+      }
+      buffer_.pop();
     }
-    return true;
   }
 
-  virtual void initialize(const bfs::path & path) final
+  virtual void initialize(const bfs::path & path, double t) final
   {
     if(log_.is_open())
     {
       /* Wait until the previous log is flushed */
-      while(!data_.empty())
+      while(!buffer_.empty())
       {
+        log_sync_cv_.notify_one();
         std::this_thread::sleep_for(std::chrono::microseconds(500));
       }
-      log_.close();
     }
-    open(path.string());
+    open_run(path, t);
+  }
+
+  virtual bool write(char * data, size_t size) final
+  {
+    if(!buffer_.push(data, size))
+    {
+      dropped_++;
+      return false;
+    }
+    // Order the push with the check below, see the waiting side in the writing thread
+    std::atomic_thread_fence(std::memory_order_seq_cst);
+    if(log_sync_waiting_)
+    {
+      log_sync_cv_.notify_one();
+    }
+    return true;
+  }
+
+  virtual bool rotate(double t) final
+  {
+    std::memcpy(rotate_marker_ + 1, &t, sizeof(double));
+    return buffer_.push(rotate_marker_, sizeof(rotate_marker_));
+  }
+
+  virtual bool index(double t, bool keys) final
+  {
+    std::memcpy(index_marker_ + 1, &t, sizeof(double));
+    index_marker_[1 + sizeof(double)] = keys;
+    return buffer_.push(index_marker_, sizeof(index_marker_));
   }
 
-  virtual void write(char * data, size_t size) final
+  virtual double buffer_usage() const final
   {
-    char * ndata = new char[size];
-    std::memcpy(ndata, data, size);
-    data_.push({ndata, size});
+    return static_cast<double>(buffer_.used()) / static_cast<double>(buffer_.capacity());
   }
 
   std::thread log_sync_th_;
-  bool log_sync_th_run_ = true;
-  CircularBuffer<std::pair<char *, size_t>, 512> data_;
-  std::pair<char *, size_t> pop_;
+  std::atomic<bool> log_sync_th_run_{true};
+  std::mutex log_sync_mutex_;
+  std::condition_variable log_sync_cv_;
+  /** True while the writing thread is (about to be) waiting for data */
+  std::atomic<bool> log_sync_waiting_{false};
+  ByteRingBuffer buffer_;
+  /** Segment request in the buffer: a zero byte followed by the segment start time */
+  char rotate_marker_[1 + sizeof(double)] = {0};
+  /** Index request in the buffer: a one byte followed by the entry time and whether it holds the keys */
+  char index_marker_[2 + sizeof(double)] = {1};
 };
 } // namespace
 
-Logger::Logger(const Policy & policy, const std::string & directory, const std::string & tmpl)
+Logger::Logger(const Policy & policy, const std::string & directory, const std::string & tmpl, size_t buffer_size)
 {
-  setup(policy, directory, tmpl);
+  setup(policy, directory, tmpl, buffer_size);
 }
 
 Logger::~Logger() {}
 
-void Logger::setup(const Policy & policy, const std::string & directory, const std::string & tmpl)
+void Logger::setup(const Policy & policy, const std::string & directory, const std::string & tmpl, size_t buffer_size)
 {
+  policy_ = policy;
   switch(policy)
   {
     case Policy::NON_THREADED:
       impl_.reset(new LoggerNonThreadedPolicyImpl(directory, tmpl));
+      removeLogEntry("perf_LogDropped");
+      removeLogEntry("perf_LogBuffer");
       break;
     case Policy::THREADED:
-      impl_.reset(new LoggerThreadedPolicyImpl(directory, tmpl));
+      impl_.reset(new LoggerThreadedPolicyImpl(directory, tmpl, buffer_size));
       break;
   };
 }
@@ -186,36 +404,31 @@ void Logger::start(const std::string & ctl_name, double timestep, bool resume)
     return log_path;
   };
   auto log_path = get_log_path();
-  impl_->initialize(log_path);
   std::stringstream ss_sym;
   ss_sym << impl_->tmpl << "-" << ctl_name << "-latest.bin";
-  bfs::path log_sym_path = impl_->directory / bfs::path(ss_sym.str().c_str());
-  if(bfs::is_symlink(log_sym_path))
-  {
-    bfs::remove(log_sym_path);
-  }
-  if(!bfs::exists(log_sym_path))
-  {
-    boost::system::error_code ec;
-    bfs::create_symlink(log_path, log_sym_path, ec);
-    if(!ec)
-    {
-      LOG_INFO("Updated latest log symlink: " << log_sym_path)
-    }
-    else
-    {
-      LOG_INFO("Failed to create latest log symlink: " << ec.message())
-    }
-  }
+  impl_->latest_ = impl_->directory / bfs::path(ss_sym.str().c_str());
+  impl_->rotation_size_ = rotation_size_;
+  impl_->rotation_duration_ = rotation_duration_;
+  impl_->index_enabled_ = index_;
+  impl_->segment_size_ = 0;
+  impl_->segment_start_ = resume ? impl_->log_iter_ : 0;
+  impl_->initialize(log_path, impl_->segment_start_);
   if(impl_->log_.is_open())
   {
     if(!log_entries_.count("t"))
     {
       addLogEntry("t", [this, timestep]() {
+        // The logged time is the one used in the index and the manifest
+        double t = impl_->log_iter_;
         impl_->log_iter_ += timestep;
-        return impl_->log_iter_ - timestep;
+        return t;
       });
     }
+    if(policy_ == Policy::THREADED && !log_entries_.count("perf_LogDropped"))
+    {
+      addLogEntry("perf_LogDropped", [this]() { return impl_->dropped_; });
+      addLogEntry("perf_LogBuffer", [this]() { return impl_->buffer_usage(); });
+    }
     if(!resume)
     {
       impl_->log_iter_ = 0;
@@ -233,6 +446,23 @@ void Logger::start(const std::string & ctl_name, double timestep, bool resume)
 
 void Logger::log()
 {
+  if(impl_->rotating())
+  {
+    double t = impl_->log_iter_;
+    if((impl_->rotation_size_ != 0 && impl_->segment_size_ >= impl_->rotation_size_)
+       || (impl_->rotation_duration_ != 0 && t - impl_->segment_start_ >= impl_->rotation_duration_))
+    {
+      if(impl_->rotate(t))
+      {
+        // Every segment starts with the keys so that it can be read on its own
+        log_entries_changed_ = true;
+        impl_->segment_size_ = 0;
+        impl_->segment_start_ = t;
+      }
+    }
+  }
+  // Data that is not indexed is dropped
+  bool indexed = !impl_->index_enabled_ || impl_->index(impl_->log_iter_, log_entries_changed_);
   mc_rtc::MessagePackBuilder builder(impl_->data_);
   builder.start_array(2);
   if(log_entries_changed_)
@@ -257,7 +487,31 @@ void Logger::log()
   builder.finish_array();
   builder.finish_array();
   size_t s = builder.finish();
-  impl_->write(impl_->data_.data(), s);
+  if(!indexed)
+  {
+    impl_->dropped_++;
+    log_entries_changed_ = true;
+  }
+  else if(impl_->write(impl_->data_.data(), s))
+  {
+    impl_->segment_size_ += sizeof(uint64_t) + s;
+  }
+  else
+  {
+    // The dropped data might have held the keys, write them with the next data
+    log_entries_changed_ = true;
+  }
+}
+
+void Logger::index(bool enable)
+{
+  index_ = enable;
+}
+
+void Logger::rotation(size_t max_size, double max_duration)
+{
+  rotation_size_ = max_size;
+  rotation_duration_ = max_duration;
 }
 
 void Logger::removeLogEntry(const std::string & name)
@@ -0,0 +1,416 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#include <mc_rtc/MessagePackView.h>
+#include <mc_rtc/logging.h>
+
+#include <cstring>
+#include <limits>
+#include <sstream>
+#include <stdexcept>
+
+namespace mc_rtc
+{
+
+namespace
+{
+
+using Type = MessagePackView::Type;
+
+/** Read a big-endian unsigned integer */
+template<typename T>
+T load(const char * p)
+{
+  uint64_t v = 0;
+  for(size_t i = 0; i < sizeof(T); ++i)
+  {
+    v = (v << 8) | static_cast<uint8_t>(p[i]);
+  }
+  return static_cast<T>(v);
+}
+
+uint64_t load(const char * p, size_t n)
+{
+  switch(n)
+  {
+    case 1:
+      return load<uint8_t>(p);
+    case 2:
+      return load<uint16_t>(p);
+    case 4:
+      return load<uint32_t>(p);
+    default:
+      return load<uint64_t>(p);
+  }
+}
+
+/** Read the type header at p
+ *
+ * length is the number of elements of an array, the number of pairs of a map
+ * and the number of bytes that follow the header for other types
+ */
+void readHeader(const char * p, const char * limit, Type & type, size_t & header, uint64_t & length)
+{
+  auto require = [&](size_t n) {
+    if(static_cast<size_t>(limit - p) < n)
+    {
+      LOG_ERROR_AND_THROW(std::runtime_error, "Incomplete MessagePack data")
+    }
+  };
+  auto sized = [&](Type t, size_t n) {
+    require(1 + n);
+    type = t;
+    header = 1 + n;
+    length = load(p + 1, n);
+  };
+  auto fixed = [&](Type t, size_t n) {
+    type = t;
+    length = n;
+  };
+  require(1);
+  auto b = static_cast<uint8_t>(*p);
+  header = 1;
+  length = 0;
+  if(b <= 0x7f)
+  {
+    type = Type::UInt;
+    return;
+  }
+  if(b >= 0xe0)
+  {
+    type = Type::Int;
+    return;
+  }
+  if((b & 0xf0) == 0x80)
+  {
+    fixed(Type::Map, b & 0x0f);
+    return;
+  }
+  if((b & 0xf0) == 0x90)
+  {
+    fixed(Type::Array, b & 0x0f);
+    return;
+  }
+  if((b & 0xe0) == 0xa0)
+  {
+    fixed(Type::String, b & 0x1f);
+    return;
+  }
+  switch(b)
+  {
+    case 0xc0:
+      type = Type::Nil;
+      return;
+    case 0xc2:
+    case 0xc3:
+      type = Type::Bool;
+      return;
+    case 0xc4:
+    case 0xc5:
+    case 0xc6:
+      sized(Type::Binary, static_cast<size_t>(1) << (b - 0xc4));
+      return;
+    case 0xc7:
+    case 0xc8:
+    case 0xc9:
+      // The extension type follows the size
+      sized(Type::Extension, static_cast<size_t>(1) << (b - 0xc7));
+      header += 1;
+      return;
+    case 0xca:
+      fixed(Type::Float, 4);
+      return;
+    case 0xcb:
+      fixed(Type::Double, 8);
+      return;
+    case 0xcc:
+    case 0xcd:
+    case 0xce:
+    case 0xcf:
+      fixed(Type::UInt, static_cast<size_t>(1) << (b - 0xcc));
+      return;
+    case 0xd0:
+    case 0xd1:
+    case 0xd2:
+    case 0xd3:
+      fixed(Type::Int, static_cast<size_t>(1) << (b - 0xd0));
+      return;
+    case 0xd4:
+    case 0xd5:
+    case 0xd6:
+    case 0xd7:
+    case 0xd8:
+      // The extension type follows the header
+      fixed(Type::Extension, static_cast<size_t>(1) << (b - 0xd4));
+      header = 2;
+      return;
+    case 0xd9:
+    case 0xda:
+    case 0xdb:
+      sized(Type::String, static_cast<size_t>(1) << (b - 0xd9));
+      return;
+    case 0xdc:
+    case 0xdd:
+      sized(Type::Array, static_cast<size_t>(2) << (b - 0xdc));
+      return;
+    case 0xde:
+    case 0xdf:
+      sized(Type::Map, static_cast<size_t>(2) << (b - 0xde));
+      return;
+    default:
+      LOG_ERROR_AND_THROW(std::runtime_error, "Invalid MessagePack type " << static_cast<int>(b))
+  }
+}
+
+/** Returns the end of the object that starts at p */
+const char * skip(const char * p, const char * limit)
+{
+  uint64_t remaining = 1;
+  while(remaining)
+  {
+    Type type;
+    size_t header;
+    uint64_t length;
+    readHeader(p, limit, type, header, length);
+    if(static_cast<size_t>(limit - p) < header)
+    {
+      LOG_ERROR_AND_THROW(std::runtime_error, "Incomplete MessagePack data")
+    }
+    p += header;
+    remaining -= 1;
+    if(type == Type::Array)
+    {
+      remaining += length;
+    }
+    else if(type == Type::Map)
+    {
+      remaining += 2 * length;
+    }
+    else
+    {
+      if(static_cast<uint64_t>(limit - p) < length)
+      {
+        LOG_ERROR_AND_THROW(std::runtime_error, "Incomplete MessagePack data")
+      }
+      p += length;
+    }
+  }
+  return p;
+}
+
+} // namespace
+
+MessagePackView::Iterator::Iterator(const char * data, const char * limit, size_t remaining)
+: data_(data), limit_(limit), remaining_(remaining)
+{
+}
+
+MessagePackView MessagePackView::Iterator::operator*() const
+{
+  return MessagePackView(data_, static_cast<size_t>(limit_ - data_));
+}
+
+MessagePackView::Iterator & MessagePackView::Iterator::operator++()
+{
+  data_ = skip(data_, limit_);
+  remaining_ -= 1;
+  return *this;
+}
+
+MessagePackView::MessagePackView(const char * data, size_t size) : data_(data), limit_(data + size)
+{
+  readHeader(data_, limit_, type_, header_, length_);
+  end_ = skip(data_, limit_);
+}
+
+size_t MessagePackView::size() const
+{
+  if(type_ == Type::Array || type_ == Type::Map)
+  {
+    return static_cast<size_t>(length_);
+  }
+  return 0;
+}
+
+MessagePackView MessagePackView::operator[](size_t i) const
+{
+  if(type_ != Type::Array || i >= length_)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "Out-of-bound access for a MessagePack array")
+  }
+  auto it = begin();
+  for(size_t j = 0; j < i; ++j)
+  {
+    ++it;
+  }
+  return *it;
+}
+
+MessagePackView MessagePackView::operator()(const std::string & key) const
+{
+  if(type_ == Type::Map)
+  {
+    for(auto it = begin(); it != end(); ++it)
+    {
+      bool match = (*it).equals(key);
+      ++it;
+      if(match)
+      {
+        return *it;
+      }
+    }
+  }
+  LOG_ERROR_AND_THROW(std::runtime_error, "No entry named " << key << " in the MessagePack map")
+}
+
+bool MessagePackView::has(const std::string & key) const
+{
+  if(type_ != Type::Map)
+  {
+    return false;
+  }
+  for(auto it = begin(); it != end(); ++it)
+  {
+    if((*it).equals(key))
+    {
+      return true;
+    }
+    ++it;
+  }
+  return false;
+}
+
+MessagePackView::Iterator MessagePackView::begin() const
+{
+  size_t remaining = 0;
+  if(type_ == Type::Array)
+  {
+    remaining = static_cast<size_t>(length_);
+  }
+  else if(type_ == Type::Map)
+  {
+    remaining = static_cast<size_t>(2 * length_);
+  }
+  return Iterator(data_ + header_, limit_, remaining);
+}
+
+MessagePackView::Iterator MessagePackView::end() const
+{
+  return Iterator(end_, limit_, 0);
+}
+
+bool MessagePackView::asBool() const
+{
+  if(type_ != Type::Bool)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack object is not a bool")
+  }
+  return static_cast<uint8_t>(*data_) == 0xc3;
+}
+
+int64_t MessagePackView::asInt() const
+{
+  if(type_ == Type::UInt)
+  {
+    auto v = asUInt();
+    if(v > static_cast<uint64_t>(std::numeric_limits<int64_t>::max()))
+    {
+      LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack integer does not fit in int64_t")
+    }
+    return static_cast<int64_t>(v);
+  }
+  if(type_ != Type::Int)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack object is not an integer")
+  }
+  if(header_ == 1 && length_ == 0)
+  {
+    return static_cast<int8_t>(*data_);
+  }
+  switch(length_)
+  {
+    case 1:
+      return static_cast<int8_t>(load<uint8_t>(data_ + 1));
+    case 2:
+      return static_cast<int16_t>(load<uint16_t>(data_ + 1));
+    case 4:
+      return static_cast<int32_t>(load<uint32_t>(data_ + 1));
+    default:
+      return static_cast<int64_t>(load<uint64_t>(data_ + 1));
+  }
+}
+
+uint64_t MessagePackView::asUInt() const
+{
+  if(type_ == Type::Int)
+  {
+    auto v = asInt();
+    if(v < 0)
+    {
+      LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack integer is negative")
+    }
+    return static_cast<uint64_t>(v);
+  }
+  if(type_ != Type::UInt)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack object is not an integer")
+  }
+  if(length_ == 0)
+  {
+    return static_cast<uint8_t>(*data_);
+  }
+  return load(data_ + 1, static_cast<size_t>(length_));
+}
+
+double MessagePackView::asDouble() const
+{
+  switch(type_)
+  {
+    case Type::Float:
+    {
+      auto bits = load<uint32_t>(data_ + 1);
+      float f;
+      std::memcpy(&f, &bits, sizeof(f));
+      return f;
+    }
+    case Type::Double:
+    {
+      auto bits = load<uint64_t>(data_ + 1);
+      double d;
+      std::memcpy(&d, &bits, sizeof(d));
+      return d;
+    }
+    case Type::Int:
+      return static_cast<double>(asInt());
+    case Type::UInt:
+      return static_cast<double>(asUInt());
+    default:
+      LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack object is not a number")
+  }
+}
+
+std::string MessagePackView::asString() const
+{
+  if(type_ != Type::String && type_ != Type::Binary)
+  {
+    LOG_ERROR_AND_THROW(std::runtime_error, "MessagePack object is not a string")
+  }
+  return {data_ + header_, static_cast<size_t>(length_)};
+}
+
+bool MessagePackView::equals(const std::string & value) const
+{
+  if(type_ != Type::String && type_ != Type::Binary)
+  {
+    return false;
+  }
+  return length_ == value.size() && std::memcmp(data_ + header_, value.data(), value.size()) == 0;
+}
+
+bool MessagePackView::operator==(const MessagePackView & rhs) const
+{
+  return bytes() == rhs.bytes() && std::memcmp(data_, rhs.data_, bytes()) == 0;
+}
+
+} // namespace mc_rtc
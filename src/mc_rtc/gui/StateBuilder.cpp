@@ -32,6 +32,44 @@ constexpr double Range::inf;
 
 Element::Element(const std::string & name) : name_(name) {}
 
+PublicationRate PublicationRate::Always()
+{
+  return {};
+}
+
+PublicationRate PublicationRate::Period(double period)
+{
+  PublicationRate rate;
+  rate.period = period;
+  return rate;
+}
+
+PublicationRate PublicationRate::OnChange()
+{
+  PublicationRate rate;
+  rate.onChange = true;
+  return rate;
+}
+
+bool StateBuilder::Publication::due(clock::time_point now)
+{
+  if(!pending)
+  {
+    if(rate.onChange || now - last < std::chrono::duration<double>(rate.period))
+    {
+      return false;
+    }
+  }
+  pending = false;
+  last = now;
+  return true;
+}
+
+StateBuilder::PlotStore::PlotStore(plot_callback_t write, plot::Plot type, uint64_t id)
+: write(write), type(type), id(id)
+{
+}
+
 StateBuilder::StateBuilder()
 {
   reset();
@@ -41,6 +79,7 @@ void StateBuilder::reset()
 {
   elements_.elements.clear();
   elements_.sub.clear();
+  layout_changed_ = true;
 }
 
 std::string StateBuilder::cat2str(const std::vector<std::string> & cat)
@@ -66,6 +105,64 @@ void StateBuilder::removePlot(const std::string & name)
   }
 }
 
+void StateBuilder::setPlotPublicationRate(const std::string & name, PublicationRate rate)
+{
+  if(rate.onChange)
+  {
+    LOG_ERROR("Plot " << name << " cannot be published on change")
+    return;
+  }
+  auto it = plots_.find(name);
+  if(it == plots_.end())
+  {
+    LOG_ERROR("No plot titled " << name)
+    return;
+  }
+  it->second.publication.rate = rate;
+  it->second.publication.pending = true;
+}
+
+void StateBuilder::setPublicationRate(const std::vector<std::string> & category,
+                                      const std::string & name,
+                                      PublicationRate rate)
+{
+  auto el = getElement(category, name);
+  if(!el)
+  {
+    LOG_ERROR("No element " << name << " in category " << cat2str(category))
+    return;
+  }
+  el->publication.rate = rate;
+  el->publication.pending = true;
+}
+
+void StateBuilder::notifyChange(const std::vector<std::string> & category, const std::string & name)
+{
+  auto el = getElement(category, name);
+  if(el)
+  {
+    el->publication.pending = true;
+  }
+}
+
+StateBuilder::ElementStore * StateBuilder::getElement(const std::vector<std::string> & category,
+                                                      const std::string & name)
+{
+  auto cat_ = getCategory(category, false);
+  if(!cat_.first)
+  {
+    return nullptr;
+  }
+  auto & cat = cat_.second;
+  auto it = std::find_if(cat.elements.begin(), cat.elements.end(),
+                         [&name](const ElementStore & el) { return el().name() == name; });
+  if(it == cat.elements.end())
+  {
+    return nullptr;
+  }
+  return &(*it);
+}
+
 void StateBuilder::removeCategory(const std::vector<std::string> & category)
 {
   if(category.size() == 0)
@@ -83,6 +180,7 @@ void StateBuilder::removeCategory(const std::vector<std::string> & category)
       return;
     }
     cat.second.sub.erase(it);
+    layout_changed_ = true;
   }
 }
 
@@ -112,48 +210,221 @@ void StateBuilder::removeElement(const std::vector<std::string> & category, cons
     if(it != cat.elements.end())
     {
       cat.elements.erase(it);
+      layout_changed_ = true;
     }
   }
 }
 
 size_t StateBuilder::update(std::vector<char> & buffer)
 {
-  mc_rtc::MessagePackBuilder builder(buffer);
-  builder.start_array(4);
+  return update(buffer, true);
+}
 
-  // Write protocol version
-  builder.write(PROTOCOL_VERSION);
+size_t StateBuilder::update(std::vector<char> & buffer, bool keyframe)
+{
+  snapshot();
+  return writeSnapshot(buffer, keyframe);
+}
 
-  // Write static data
+bool StateBuilder::snapshot()
+{
+  std::unique_lock<std::mutex> lock(mutex_, std::try_to_lock);
+  if(!lock.owns_lock())
+  {
+    return false;
+  }
+
+  // Generate static data, clients only get it through keyframes
   if(update_data_)
   {
     data_buffer_size_ = data_.toMessagePack(data_buffer_);
+    data_ready_ = true;
     update_data_ = false;
+    keyframe_ = true;
   }
-  builder.write_object(data_buffer_.data(), data_buffer_size_);
+
+  // The message is written with the layout at the time of the snapshot
+  if(layout_changed_)
+  {
+    snapshot_layout_.reset(new Layout());
+    layout(elements_, *snapshot_layout_);
+    layout_changed_ = false;
+    keyframe_ = true;
+  }
+
+  auto now = clock::now();
 
   // Write elements
-  update(builder, elements_);
+  snapshot(elements_, now);
 
-  // Write plots
+  // Write plots, the plots that are not due are only named so the client keeps them
+  mc_rtc::MessagePackBuilder builder(plots_buffer_);
   builder.start_array(plots_.size());
   for(auto & p : plots_)
   {
-    p.second(builder, p.first);
+    auto & plot = p.second;
+    if(plot.publication.due(now))
+    {
+      plot.write(builder, p.first);
+    }
+    else
+    {
+      builder.start_array(3);
+      builder.write(static_cast<uint64_t>(plot.type));
+      builder.write(plot.id);
+      builder.write(p.first);
+      builder.finish_array();
+    }
   }
   builder.finish_array();
+  plots_buffer_size_ = builder.finish();
+
+  snapshot_ready_ = true;
+  return true;
+}
+
+void StateBuilder::snapshot(Category & category, clock::time_point now)
+{
+  for(auto & e : category.elements)
+  {
+    if(!e.publication.due(now))
+    {
+      continue;
+    }
+    auto & published = *e.published;
+    mc_rtc::MessagePackBuilder builder(element_buffer_);
+    e.write(e.element(), builder);
+    size_t size = builder.finish();
+    published.snapshot.assign(element_buffer_.begin(), element_buffer_.begin() + static_cast<std::ptrdiff_t>(size));
+    if(!published.evaluated)
+    {
+      published.evaluated = true;
+      evaluated_.push_back(e.published);
+    }
+  }
+  for(auto & s : category.sub)
+  {
+    snapshot(s, now);
+  }
+}
+
+size_t StateBuilder::writeSnapshot(std::vector<char> & buffer, bool keyframe)
+{
+  // Take the snapshot, the lock is only held to swap buffers so that snapshot() is not delayed
+  std::unique_ptr<Layout> layout;
+  {
+    std::lock_guard<std::mutex> lock(mutex_);
+    if(!snapshot_ready_)
+    {
+      return 0;
+    }
+    snapshot_ready_ = false;
+    keyframe = keyframe || keyframe_;
+    keyframe_ = false;
+    std::swap(layout, snapshot_layout_);
+    std::swap(taken_, evaluated_);
+    for(auto & p : taken_)
+    {
+      std::swap(p->snapshot, p->taken);
+      p->evaluated = false;
+      p->fresh = true;
+    }
+    std::swap(plots_buffer_, message_plots_buffer_);
+    message_plots_buffer_size_ = plots_buffer_size_;
+    if(data_ready_)
+    {
+      std::swap(data_buffer_, message_data_buffer_);
+      message_data_buffer_size_ = data_buffer_size_;
+      data_ready_ = false;
+    }
+  }
+  taken_.clear();
+  if(layout)
+  {
+    layout_ = std::move(*layout);
+  }
+
+  // Check which elements changed
+  updateElements(layout_);
+
+  mc_rtc::MessagePackBuilder builder(buffer);
+  builder.start_array(6);
+
+  // Write protocol version
+  builder.write(PROTOCOL_VERSION);
+
+  // Write message type and sequence number
+  builder.write(
+      static_cast<std::underlying_type<MessageType>::type>(keyframe ? MessageType::Keyframe : MessageType::Delta));
+  builder.write(++seq_);
+
+  if(keyframe)
+  {
+    builder.write_object(message_data_buffer_.data(), message_data_buffer_size_);
+    update(builder, layout_);
+  }
+  else
+  {
+    builder.write();
+    updateDelta(builder, layout_);
+  }
+
+  // Write plots
+  builder.write_object(message_plots_buffer_.data(), message_plots_buffer_size_);
 
   builder.finish_array();
   return builder.finish();
 }
 
-void StateBuilder::update(mc_rtc::MessagePackBuilder & builder, Category & category)
+void StateBuilder::layout(const Category & category, Layout & out)
+{
+  out.name = category.name;
+  out.elements.clear();
+  for(const auto & e : category.elements)
+  {
+    out.elements.push_back(e.published);
+  }
+  out.sub.resize(category.sub.size());
+  for(size_t i = 0; i < category.sub.size(); ++i)
+  {
+    layout(category.sub[i], out.sub[i]);
+  }
+}
+
+bool StateBuilder::updateElements(Layout & category)
+{
+  category.changed = 0;
+  for(auto & p : category.elements)
+  {
+    auto & e = *p;
+    // Elements that were not evaluated keep their previous form
+    e.changed = e.fresh && e.taken != e.buffer;
+    e.fresh = false;
+    if(e.changed)
+    {
+      // The previous form is overwritten by the next snapshot
+      std::swap(e.buffer, e.taken);
+      category.changed += 1;
+    }
+  }
+  category.changedSub = 0;
+  for(auto & s : category.sub)
+  {
+    if(updateElements(s))
+    {
+      category.changedSub += 1;
+    }
+  }
+  return category.changed != 0 || category.changedSub != 0;
+}
+
+void StateBuilder::update(mc_rtc::MessagePackBuilder & builder, Layout & category)
 {
   builder.start_array(1 + category.elements.size() + 1);
   builder.write(category.name);
   for(auto & e : category.elements)
   {
-    e.write(e.element(), builder);
+    builder.write_object(e->buffer.data(), e->buffer.size());
   }
   builder.start_array(category.sub.size());
   for(auto & s : category.sub)
@@ -164,6 +435,31 @@ void StateBuilder::update(mc_rtc::MessagePackBuilder & builder, Category & categ
   builder.finish_array();
 }
 
+void StateBuilder::updateDelta(mc_rtc::MessagePackBuilder & builder, Layout & category)
+{
+  builder.start_array(3);
+  builder.write(category.name);
+  builder.start_array(category.changed);
+  for(auto & e : category.elements)
+  {
+    if(e->changed)
+    {
+      builder.write_object(e->buffer.data(), e->buffer.size());
+    }
+  }
+  builder.finish_array();
+  builder.start_array(category.changedSub);
+  for(auto & s : category.sub)
+  {
+    if(s.changed != 0 || s.changedSub != 0)
+    {
+      updateDelta(builder, s);
+    }
+  }
+  builder.finish_array();
+  builder.finish_array();
+}
+
 bool StateBuilder::handleRequest(const std::vector<std::string> & category,
                                  const std::string & name,
                                  const mc_rtc::Configuration & data)
@@ -188,7 +484,13 @@ bool StateBuilder::handleRequest(const std::vector<std::string> & category,
   Element & elem = el();
   try
   {
-    return el.handleRequest(elem, data);
+    if(el.handleRequest(elem, data))
+    {
+      // The element was most likely modified, publish it in the next message
+      el.publication.pending = true;
+      return true;
+    }
+    return false;
   }
   catch(const mc_rtc::Configuration::Exception & exc)
   {
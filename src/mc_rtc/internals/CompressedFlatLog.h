@@ -0,0 +1,305 @@
+#pragma once
+
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#include <mc_rtc/logging.h>
+
+#include <zlib.h>
+
+#include <cmath>
+#include <cstring>
+#include <istream>
+#include <limits>
+#include <string>
+#include <vector>
+
+/** Compressed columnar log format (.cflat)
+ *
+ * The file starts with the magic number and the format version. It is
+ * followed by the compressed blocks of every column and the footer:
+ *
+ * - [uint64] rows per block
+ * - [uint64] number of columns
+ * - for each column:
+ *   - [bool] true for numeric columns, false for string columns
+ *   - [uint64] key size, key
+ *   - [uint64] number of rows
+ *   - [column stats]
+ *   - [uint64] number of blocks
+ *   - for each block: [uint64] offset, [uint64] size, [block stats]
+ *
+ * Stats are [double] min, [double] max and [uint64] number of NaN (or empty
+ * strings), min and max are NaN for string columns or if there is no data.
+ *
+ * The file ends with [uint64] footer offset and the magic number.
+ *
+ * Numeric blocks are the XOR of every double with the previous one, the bytes
+ * of these values are shuffled (all the first bytes, then all the second
+ * bytes...) and the result is compressed with zlib. String blocks are
+ * [uint64] size, string for every row, compressed with zlib.
+ */
+
+namespace mc_rtc
+{
+
+namespace log
+{
+
+namespace internal
+{
+
+namespace cflat
+{
+
+static const char magic[4] = {'M', 'C', 'C', 'F'};
+
+static const uint64_t version = 1;
+
+/** Min/max/NaN count of some data */
+struct Stats
+{
+  double min = std::numeric_limits<double>::quiet_NaN();
+  double max = std::numeric_limits<double>::quiet_NaN();
+  uint64_t nan = 0;
+
+  void update(double v)
+  {
+    if(std::isnan(v))
+    {
+      nan++;
+    }
+    else
+    {
+      min = std::isnan(min) ? v : std::min(min, v);
+      max = std::isnan(max) ? v : std::max(max, v);
+    }
+  }
+
+  void update(const Stats & other)
+  {
+    if(!std::isnan(other.min))
+    {
+      update(other.min);
+      update(other.max);
+    }
+    nan += other.nan;
+  }
+};
+
+struct Block
+{
+  uint64_t offset;
+  uint64_t size;
+  Stats stats;
+};
+
+struct Column
+{
+  bool numeric;
+  std::string key;
+  uint64_t rows;
+  Stats stats;
+  std::vector<Block> blocks;
+};
+
+inline std::string compress(const std::string & in)
+{
+  uLongf size = compressBound(static_cast<uLong>(in.size()));
+  std::string out(size, 0);
+  if(compress2((Bytef *)&out[0], &size, (const Bytef *)in.data(), static_cast<uLong>(in.size()), Z_BEST_SPEED) != Z_OK)
+  {
+    LOG_ERROR("Failed to compress log data")
+    return {};
+  }
+  out.resize(size);
+  return out;
+}
+
+inline bool uncompress(const char * in, size_t size, std::string & out)
+{
+  uLongf out_size = static_cast<uLongf>(out.size());
+  return ::uncompress((Bytef *)&out[0], &out_size, (const Bytef *)in, static_cast<uLong>(size)) == Z_OK
+         && out_size == out.size();
+}
+
+inline std::string encode(const double * data, size_t n)
+{
+  std::string shuffled(n * sizeof(double), 0);
+  uint64_t prev = 0;
+  for(size_t i = 0; i < n; ++i)
+  {
+    uint64_t v;
+    std::memcpy(&v, &data[i], sizeof(double));
+    uint64_t x = v ^ prev;
+    prev = v;
+    for(size_t b = 0; b < sizeof(double); ++b)
+    {
+      shuffled[b * n + i] = static_cast<char>((x >> (8 * b)) & 0xff);
+    }
+  }
+  return compress(shuffled);
+}
+
+inline bool decode(const char * in, size_t size, double * data, size_t n)
+{
+  std::string shuffled(n * sizeof(double), 0);
+  if(!uncompress(in, size, shuffled))
+  {
+    return false;
+  }
+  uint64_t prev = 0;
+  for(size_t i = 0; i < n; ++i)
+  {
+    uint64_t x = 0;
+    for(size_t b = 0; b < sizeof(double); ++b)
+    {
+      x |= static_cast<uint64_t>(static_cast<uint8_t>(shuffled[b * n + i])) << (8 * b);
+    }
+    prev ^= x;
+    std::memcpy(&data[i], &prev, sizeof(double));
+  }
+  return true;
+}
+
+inline std::string encode(const std::string * data, size_t n)
+{
+  std::string raw;
+  for(size_t i = 0; i < n; ++i)
+  {
+    uint64_t s = data[i].size();
+    raw.append((const char *)&s, sizeof(uint64_t));
+    raw.append(data[i]);
+  }
+  return compress(raw);
+}
+
+inline bool decode(const char * in, size_t size, std::string * data, size_t n)
+{
+  // The uncompressed size is not stored, grow the buffer until it fits
+  std::string raw(std::max<size_t>(4 * size, n * sizeof(uint64_t)), 0);
+  while(true)
+  {
+    uLongf out_size = static_cast<uLongf>(raw.size());
+    int ret = ::uncompress((Bytef *)&raw[0], &out_size, (const Bytef *)in, static_cast<uLong>(size));
+    if(ret == Z_OK)
+    {
+      raw.resize(out_size);
+      break;
+    }
+    if(ret != Z_BUF_ERROR)
+    {
+      return false;
+    }
+    raw.resize(2 * raw.size());
+  }
+  size_t offset = 0;
+  for(size_t i = 0; i < n; ++i)
+  {
+    uint64_t s = 0;
+    if(offset + sizeof(uint64_t) > raw.size())
+    {
+      return false;
+    }
+    std::memcpy(&s, &raw[offset], sizeof(uint64_t));
+    offset += sizeof(uint64_t);
+    if(offset + s > raw.size())
+    {
+      return false;
+    }
+    data[i].assign(&raw[offset], s);
+    offset += s;
+  }
+  return true;
+}
+
+template<typename T>
+void write(std::string & out, const T & value)
+{
+  out.append((const char *)&value, sizeof(T));
+}
+
+inline void write(std::string & out, const Stats & stats)
+{
+  write(out, stats.min);
+  write(out, stats.max);
+  write(out, stats.nan);
+}
+
+template<typename T>
+bool read(std::istream & is, T & value)
+{
+  is.read((char *)&value, sizeof(T));
+  return static_cast<bool>(is);
+}
+
+inline bool read(std::istream & is, Stats & stats)
+{
+  return read(is, stats.min) && read(is, stats.max) && read(is, stats.nan);
+}
+
+/** Read the footer of a .cflat file
+ *
+ * \returns False if the file is not a valid .cflat file
+ */
+inline bool read_footer(std::istream & is, uint64_t & block_rows, std::vector<Column> & columns)
+{
+  char m[sizeof(magic)];
+  uint64_t v = 0;
+  is.read(m, sizeof(m));
+  if(!is || std::memcmp(m, magic, sizeof(magic)) != 0 || !read(is, v) || v != version)
+  {
+    return false;
+  }
+  is.seekg(-static_cast<std::streamoff>(sizeof(uint64_t) + sizeof(magic)), std::istream::end);
+  uint64_t footer = 0;
+  if(!read(is, footer))
+  {
+    return false;
+  }
+  is.read(m, sizeof(m));
+  if(!is || std::memcmp(m, magic, sizeof(magic)) != 0)
+  {
+    return false;
+  }
+  is.seekg(static_cast<std::streamoff>(footer));
+  uint64_t ncolumns = 0;
+  if(!read(is, block_rows) || !read(is, ncolumns))
+  {
+    return false;
+  }
+  columns.resize(ncolumns);
+  for(auto & c : columns)
+  {
+    uint64_t size = 0;
+    if(!read(is, c.numeric) || !read(is, size))
+    {
+      return false;
+    }
+    c.key.resize(size);
+    is.read(&c.key[0], static_cast<std::streamsize>(size));
+    uint64_t nblocks = 0;
+    if(!read(is, c.rows) || !read(is, c.stats) || !read(is, nblocks))
+    {
+      return false;
+    }
+    c.blocks.resize(nblocks);
+    for(auto & b : c.blocks)
+    {
+      if(!read(is, b.offset) || !read(is, b.size) || !read(is, b.stats))
+      {
+        return false;
+      }
+    }
+  }
+  return true;
+}
+
+} // namespace cflat
+
+} // namespace internal
+
+} // namespace log
+
+} // namespace mc_rtc
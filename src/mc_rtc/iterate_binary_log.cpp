@@ -1,3 +1,4 @@
+#include <mc_rtc/Configuration.h>
 #include <mc_rtc/log/Logger.h>
 #include <mc_rtc/log/iterate_binary_log.h>
 
@@ -5,6 +6,7 @@
 namespace bfs = boost::filesystem;
 
 #include "internals/LogEntry.h"
+#include <algorithm>
 #include <fstream>
 
 namespace mc_rtc
@@ -13,46 +15,322 @@ namespace mc_rtc
 namespace log
 {
 
-bool iterate_binary_log(const std::string & f,
-                        const binary_log_copy_callback & callback,
-                        bool extract,
-                        const std::string & time)
+std::vector<std::string> log_segments(const std::string & f, double from, double to)
 {
   auto fpath = bfs::path(f);
+  if(fpath.extension() != ".json")
+  {
+    return {f};
+  }
+  std::vector<std::string> ret;
+  try
+  {
+    mc_rtc::Configuration manifest(f);
+    auto segments = manifest("segments");
+    for(size_t i = 0; i < segments.size(); ++i)
+    {
+      double start = segments[i]("start");
+      double end = i + 1 < segments.size() ? static_cast<double>(segments[i + 1]("start"))
+                                           : std::numeric_limits<double>::infinity();
+      if(start <= to && end >= from)
+      {
+        ret.push_back((fpath.parent_path() / static_cast<std::string>(segments[i]("file"))).string());
+      }
+    }
+  }
+  catch(const mc_rtc::Configuration::Exception & exc)
+  {
+    LOG_ERROR("Failed to read log manifest " << f << "\n" << exc.what())
+    return {};
+  }
+  return ret;
+}
+
+namespace
+{
+
+static_assert(sizeof(LogIndexEntry) == sizeof(double) + 2 * sizeof(uint64_t), "LogIndexEntry should not be padded");
+
+/** Open a binary log and check its magic number */
+bool open_log(const std::string & f, std::ifstream & ifs)
+{
   if(!bfs::exists(f) || !bfs::is_regular(f))
   {
     LOG_ERROR("Could not open log " << f << ", file does not exist")
     return false;
   }
-  std::ifstream ifs(f, std::ifstream::binary);
+  ifs.open(f, std::ifstream::binary);
   if(!ifs.is_open())
   {
     LOG_ERROR("Failed to open " << f)
     return false;
   }
-  std::vector<char> buffer(1024);
-  ifs.read(buffer.data(), sizeof(mc_rtc::Logger::magic));
-  if(memcmp(buffer.data(), &mc_rtc::Logger::magic, sizeof(mc_rtc::Logger::magic)) != 0)
+  uint8_t magic[sizeof(mc_rtc::Logger::magic)];
+  ifs.read((char *)magic, sizeof(magic));
+  if(!ifs || memcmp(magic, &mc_rtc::Logger::magic, sizeof(mc_rtc::Logger::magic)) != 0)
   {
     LOG_ERROR("Log " << f << " is not a valid mc_rtc binary log (Invalid magic number)")
     return false;
   }
+  return true;
+}
+
+/** Read the next entry of a binary log into buffer, returns the entry size or 0 if there is no more data */
+uint64_t read_entry(std::ifstream & ifs, std::vector<char> & buffer)
+{
+  uint64_t entrySize = 0;
+  ifs.read((char *)&entrySize, sizeof(uint64_t));
+  if(!ifs)
+  {
+    return 0;
+  }
+  while(buffer.size() < entrySize)
+  {
+    buffer.resize(2 * buffer.size());
+  }
+  ifs.read(buffer.data(), static_cast<std::streamsize>(entrySize));
+  if(!ifs)
+  {
+    return 0;
+  }
+  return entrySize;
+}
+
+/** Find the position of the time key in an entry holding the keys */
+bool time_index(internal::LogEntry & log, const std::string & time, size_t & t_index)
+{
+  const auto & keys = log.keys();
+  auto it = std::find(keys.begin(), keys.end(), time);
+  if(it == keys.end())
+  {
+    LOG_ERROR("Request time key: " << time << " not found in log")
+    return false;
+  }
+  t_index = static_cast<size_t>(it - keys.begin());
+  if(log.records()[t_index].type != LogType::Double)
+  {
+    LOG_ERROR("Time key: " << time << " not recording double")
+    return false;
+  }
+  return true;
+}
+
+/** Use the index of a binary log to find the first entry at or after t
+ *
+ * If all entries are before t, returns the last entry. Returns false if the
+ * log has no index
+ */
+bool seek_index(const std::string & f, double t, LogIndexEntry & out)
+{
+  std::ifstream ifs(log_index_path(f), std::ifstream::binary);
+  if(!ifs.is_open())
+  {
+    return false;
+  }
+  uint8_t magic[sizeof(mc_rtc::Logger::index_magic)];
+  ifs.read((char *)magic, sizeof(magic));
+  if(!ifs || memcmp(magic, &mc_rtc::Logger::index_magic, sizeof(magic)) != 0)
+  {
+    LOG_WARNING("Ignoring invalid log index " << log_index_path(f))
+    return false;
+  }
+  ifs.seekg(0, std::ifstream::end);
+  uint64_t n = (static_cast<uint64_t>(ifs.tellg()) - sizeof(magic)) / sizeof(LogIndexEntry);
+  if(n == 0)
+  {
+    return false;
+  }
+  auto read = [&](uint64_t i) {
+    LogIndexEntry entry;
+    ifs.seekg(static_cast<std::streamoff>(sizeof(magic) + i * sizeof(LogIndexEntry)));
+    ifs.read((char *)&entry, sizeof(LogIndexEntry));
+    return entry;
+  };
+  uint64_t lo = 0;
+  uint64_t hi = n;
+  while(lo < hi)
+  {
+    uint64_t mid = lo + (hi - lo) / 2;
+    if(read(mid).t < t)
+    {
+      lo = mid + 1;
+    }
+    else
+    {
+      hi = mid;
+    }
+  }
+  out = read(std::min(lo, n - 1));
+  return static_cast<bool>(ifs);
+}
+
+} // namespace
+
+std::string log_index_path(const std::string & f)
+{
+  bfs::path fpath(f);
+  if(bfs::is_symlink(fpath))
+  {
+    fpath = bfs::canonical(fpath);
+  }
+  return fpath.replace_extension(".idx").string();
+}
+
+bool index_binary_log(const std::string & f, const std::string & time)
+{
+  std::ifstream ifs;
+  if(!open_log(f, ifs))
+  {
+    return false;
+  }
+  auto index_path = log_index_path(f);
+  std::ofstream ofs(index_path, std::ofstream::binary);
+  if(!ofs.is_open())
+  {
+    LOG_ERROR("Failed to open " << index_path << " for writing")
+    return false;
+  }
+  ofs.write((const char *)&mc_rtc::Logger::index_magic, sizeof(mc_rtc::Logger::index_magic));
+  std::vector<char> buffer(1024);
+  LogIndexEntry entry{0, 0, 0};
   size_t t_index = 0;
-  bool extract_t = time.size() != 0;
   while(ifs)
+  {
+    entry.offset = static_cast<uint64_t>(ifs.tellg());
+    auto entrySize = read_entry(ifs, buffer);
+    if(entrySize == 0)
+    {
+      break;
+    }
+    internal::LogEntry log(buffer, entrySize, false);
+    if(!log.valid())
+    {
+      return false;
+    }
+    if(log.keys().size())
+    {
+      if(!time_index(log, time, t_index))
+      {
+        return false;
+      }
+      entry.keys_offset = entry.offset;
+    }
+    entry.t = log.getTime(t_index);
+    ofs.write((const char *)&entry, sizeof(LogIndexEntry));
+  }
+  return true;
+}
+
+std::vector<LogChunk> binary_log_chunks(const std::string & f, size_t n, uint64_t min_size)
+{
+  std::ifstream ifs;
+  if(!open_log(f, ifs))
+  {
+    return {};
+  }
+  uint64_t fsize = static_cast<uint64_t>(bfs::file_size(f));
+  uint64_t offset = sizeof(mc_rtc::Logger::magic);
+  uint64_t target = std::max<uint64_t>(min_size, (fsize - offset) / std::max<size_t>(n, 1) + 1);
+  std::vector<LogChunk> ret;
+  LogChunk chunk{offset, offset, offset};
+  uint64_t keys_offset = offset;
+  while(true)
   {
     uint64_t entrySize = 0;
     ifs.read((char *)&entrySize, sizeof(uint64_t));
-    if(!ifs)
+    // Entries are [keys or nil, data] arrays
+    uint8_t header[2];
+    ifs.read((char *)header, sizeof(header));
+    if(!ifs || entrySize < sizeof(header) || offset + sizeof(uint64_t) + entrySize > fsize)
     {
       break;
     }
-    while(buffer.size() < entrySize)
+    if(header[1] != 0xc0)
+    {
+      keys_offset = offset;
+    }
+    if(chunk.end - chunk.begin >= target)
     {
-      buffer.resize(2 * buffer.size());
+      ret.push_back(chunk);
+      chunk = {keys_offset, offset, offset};
     }
-    ifs.read(buffer.data(), static_cast<int>(entrySize));
-    if(!ifs)
+    offset += sizeof(uint64_t) + entrySize;
+    chunk.end = offset;
+    ifs.seekg(static_cast<std::streamoff>(offset));
+  }
+  if(chunk.end != chunk.begin)
+  {
+    ret.push_back(chunk);
+  }
+  return ret;
+}
+
+bool iterate_binary_log(const std::string & f,
+                        const binary_log_copy_callback & callback,
+                        bool extract,
+                        const std::string & time,
+                        double from,
+                        double to)
+{
+  bool window = time.size() && (from > 0 || to < std::numeric_limits<double>::infinity());
+  auto fpath = bfs::path(f);
+  if(fpath.extension() == ".json")
+  {
+    auto segments = window ? log_segments(f, from, to) : log_segments(f);
+    if(segments.empty())
+    {
+      LOG_ERROR("No segments in log manifest " << f)
+      return false;
+    }
+    for(const auto & s : segments)
+    {
+      if(!iterate_binary_log(s, callback, extract, time, from, to))
+      {
+        return false;
+      }
+    }
+    return true;
+  }
+  std::ifstream ifs;
+  if(!open_log(f, ifs))
+  {
+    return false;
+  }
+  std::vector<char> buffer(1024);
+  size_t t_index = 0;
+  bool extract_t = time.size() != 0;
+  // Last keys seen, the first entry given to the callback must hold them
+  std::vector<std::string> keys;
+  bool provide_keys = window;
+  LogIndexEntry start;
+  if(window && seek_index(f, from, start))
+  {
+    ifs.seekg(static_cast<std::streamoff>(start.keys_offset));
+    auto entrySize = read_entry(ifs, buffer);
+    if(entrySize)
+    {
+      internal::LogEntry log(buffer, entrySize, false);
+      if(log.valid() && log.keys().size() && time_index(log, time, t_index))
+      {
+        keys = log.keys();
+      }
+    }
+    ifs.clear();
+    if(keys.size())
+    {
+      ifs.seekg(static_cast<std::streamoff>(start.offset));
+    }
+    else
+    {
+      LOG_WARNING("Log index " << log_index_path(f) << " does not match " << f << ", ignoring it")
+      ifs.seekg(sizeof(mc_rtc::Logger::magic));
+    }
+  }
+  std::vector<char> keys_buffer;
+  while(ifs)
+  {
+    auto entrySize = read_entry(ifs, buffer);
+    if(entrySize == 0)
     {
       break;
     }
@@ -61,26 +339,15 @@ bool iterate_binary_log(const std::string & f,
     {
       return false;
     }
-    if(extract_t && log.keys().size())
+    if(log.keys().size())
     {
-      t_index = log.keys().size();
-      for(size_t i = 0; i < log.keys().size(); ++i)
+      if(extract_t && !time_index(log, time, t_index))
       {
-        const auto & k = log.keys()[i];
-        if(k == time)
-        {
-          t_index = i;
-        }
-      }
-      if(t_index == log.keys().size())
-      {
-        LOG_ERROR("Request time key: " << time << " not found in log")
         return false;
       }
-      if(log.records()[t_index].type != LogType::Double)
+      if(window)
       {
-        LOG_ERROR("Time key: " << time << " not recording double")
-        return false;
+        keys = log.keys();
       }
     }
     double t = -1;
@@ -88,11 +355,32 @@ bool iterate_binary_log(const std::string & f,
     {
       t = log.getTime(t_index);
     }
-    if(!callback(log.keys(), log.records(), t,
-                 [&log](mc_rtc::MessagePackBuilder & builder, const std::vector<std::string> & keys) {
-                   log.copy(builder, keys);
-                 },
-                 buffer.data(), entrySize))
+    if(window && t < from)
+    {
+      continue;
+    }
+    if(window && t > to)
+    {
+      break;
+    }
+    auto copy = [&log](mc_rtc::MessagePackBuilder & builder, const std::vector<std::string> & keys) {
+      log.copy(builder, keys);
+    };
+    bool ok = true;
+    if(provide_keys && log.keys().empty())
+    {
+      // Rebuild the entry with the keys so that the data is consistent with the keys
+      mc_rtc::MessagePackBuilder builder(keys_buffer);
+      log.copy(builder, keys);
+      size_t size = builder.finish();
+      ok = callback(keys, log.records(), t, copy, keys_buffer.data(), size);
+    }
+    else
+    {
+      ok = callback(log.keys(), log.records(), t, copy, buffer.data(), entrySize);
+    }
+    provide_keys = false;
+    if(!ok)
     {
       return false;
     }
@@ -103,14 +391,91 @@ bool iterate_binary_log(const std::string & f,
 bool iterate_binary_log(const std::string & f,
                         const binary_log_callback & callback,
                         bool extract,
-                        const std::string & time)
+                        const std::string & time,
+                        double from,
+                        double to)
 {
   return iterate_binary_log(
       f,
       binary_log_copy_callback([&callback](const std::vector<std::string> & keys, std::vector<FlatLog::record> & data,
                                            double t, const copy_callback &, const char *,
                                            size_t) mutable { return callback(keys, data, t); }),
-      extract, time);
+      extract, time, from, to);
+}
+
+bool iterate_binary_log(const std::string & f,
+                        const LogChunk & chunk,
+                        const binary_log_callback & callback,
+                        bool extract,
+                        const std::string & time)
+{
+  std::ifstream ifs;
+  if(!open_log(f, ifs))
+  {
+    return false;
+  }
+  std::vector<char> buffer(1024);
+  size_t t_index = 0;
+  bool extract_t = time.size() != 0;
+  // Keys of the first entry when it does not hold them
+  std::vector<std::string> keys;
+  if(chunk.keys_offset != chunk.begin)
+  {
+    ifs.seekg(static_cast<std::streamoff>(chunk.keys_offset));
+    auto entrySize = read_entry(ifs, buffer);
+    if(entrySize == 0)
+    {
+      LOG_ERROR("Failed to read the keys of a chunk in " << f)
+      return false;
+    }
+    internal::LogEntry log(buffer, entrySize, false);
+    if(!log.valid() || log.keys().empty())
+    {
+      LOG_ERROR("Invalid keys offset for a chunk in " << f)
+      return false;
+    }
+    if(extract_t && !time_index(log, time, t_index))
+    {
+      return false;
+    }
+    keys = log.keys();
+  }
+  ifs.seekg(static_cast<std::streamoff>(chunk.begin));
+  uint64_t offset = chunk.begin;
+  while(offset < chunk.end)
+  {
+    auto entrySize = read_entry(ifs, buffer);
+    if(entrySize == 0)
+    {
+      break;
+    }
+    offset += sizeof(uint64_t) + entrySize;
+    internal::LogEntry log(buffer, entrySize, extract);
+    if(!log.valid())
+    {
+      return false;
+    }
+    if(log.keys().size())
+    {
+      if(extract_t && !time_index(log, time, t_index))
+      {
+        return false;
+      }
+      keys.clear();
+    }
+    double t = -1;
+    if(extract_t)
+    {
+      t = log.getTime(t_index);
+    }
+    bool ok = callback(keys.size() ? keys : log.keys(), log.records(), t);
+    keys.clear();
+    if(!ok)
+    {
+      return false;
+    }
+  }
+  return true;
 }
 
 } // namespace log
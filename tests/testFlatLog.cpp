@@ -0,0 +1,338 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#include <mc_rtc/log/CompressedFlatLog.h>
+#include <mc_rtc/log/FlatLog.h>
+#include <mc_rtc/log/Logger.h>
+#include <mc_rtc/log/iterate_binary_log.h>
+
+#include <boost/filesystem.hpp>
+#include <boost/test/unit_test.hpp>
+
+#include <algorithm>
+#include <cmath>
+#include <fstream>
+namespace bfs = boost::filesystem;
+
+namespace
+{
+
+/** Write a log where entries appear, disappear and change type */
+std::string make_log(size_t n, mc_rtc::Logger::Policy policy = mc_rtc::Logger::Policy::NON_THREADED)
+{
+  auto dir = bfs::temp_directory_path() / bfs::unique_path("mc_rtc_flatlog_%%%%-%%%%");
+  bfs::create_directories(dir);
+  {
+    mc_rtc::Logger logger(policy, dir.string(), "test");
+    size_t i = 0;
+    logger.addLogEntry("int", [&i]() { return static_cast<int64_t>(i); });
+    logger.addLogEntry("bool", [&i]() { return i % 2 == 0; });
+    logger.addLogEntry("vector", [&i]() { return Eigen::Vector3d(i, 2 * i, 3 * i); });
+    logger.start("FlatLog", 0.005);
+    for(i = 0; i < n; ++i)
+    {
+      if(i == n / 2)
+      {
+        logger.removeLogEntry("vector");
+        logger.addLogEntry("string", [&i]() { return std::to_string(i); });
+        logger.removeLogEntry("int");
+        logger.addLogEntry("int", [&i]() { return static_cast<double>(i); });
+      }
+      logger.log();
+    }
+  }
+  return (dir / "test-FlatLog-latest.bin").string();
+}
+
+/** Check that two logs hold the same T records for an entry */
+template<typename T>
+void check_same(const mc_rtc::log::FlatLog & lhs, const mc_rtc::log::FlatLog & rhs, const std::string & entry)
+{
+  auto l = lhs.getRaw<T>(entry);
+  auto r = rhs.getRaw<T>(entry);
+  BOOST_REQUIRE(l.size() == r.size());
+  for(size_t i = 0; i < l.size(); ++i)
+  {
+    BOOST_REQUIRE((l[i] == nullptr) == (r[i] == nullptr));
+    BOOST_REQUIRE(l[i] == nullptr || *l[i] == *r[i]);
+  }
+}
+
+} // namespace
+
+BOOST_AUTO_TEST_CASE(TestFlatLog)
+{
+  const size_t n = 100;
+  auto path = make_log(n);
+  mc_rtc::log::FlatLog log(path);
+  BOOST_REQUIRE(log.size() == n);
+  BOOST_REQUIRE(log.has("t"));
+  BOOST_REQUIRE(log.has("string"));
+  BOOST_REQUIRE(!log.has("missing"));
+
+  auto t = log.get<double>("t");
+  BOOST_REQUIRE(t.size() == n);
+  BOOST_CHECK_CLOSE(t[n - 1], 0.005 * (n - 1), 1e-6);
+
+  BOOST_CHECK(log.type("int") == mc_rtc::log::LogType::Int64_t);
+  BOOST_CHECK(log.types("int").size() == 2);
+  auto ints = log.getRaw<int64_t>("int");
+  auto doubles = log.getRaw<double>("int");
+  for(size_t i = 0; i < n; ++i)
+  {
+    if(i < n / 2)
+    {
+      BOOST_REQUIRE(ints[i] && !doubles[i]);
+      BOOST_CHECK(*ints[i] == static_cast<int64_t>(i));
+    }
+    else
+    {
+      BOOST_REQUIRE(!ints[i] && doubles[i]);
+      BOOST_CHECK(*doubles[i] == static_cast<double>(i));
+    }
+  }
+
+  auto bools = log.get<bool>("bool", false);
+  for(size_t i = 0; i < n; ++i)
+  {
+    BOOST_CHECK(bools[i] == (i % 2 == 0));
+    BOOST_CHECK(*log.getRaw<bool>("bool", i) == (i % 2 == 0));
+  }
+
+  auto vectors = log.get<Eigen::Vector3d>("vector");
+  BOOST_REQUIRE(vectors.size() == n);
+  BOOST_CHECK(vectors[n - 1] == Eigen::Vector3d(n / 2 - 1, n - 2, 3 * (n / 2 - 1)));
+  BOOST_CHECK(log.getRaw<Eigen::Vector3d>("vector", n - 1) == nullptr);
+
+  BOOST_CHECK(log.get<std::string>("string", 0, "none") == "none");
+  BOOST_CHECK(log.get<std::string>("string", n - 1, "none") == std::to_string(n - 1));
+  BOOST_CHECK(log.getRaw<double>("string", n - 1) == nullptr);
+
+  log.append(path);
+  BOOST_REQUIRE(log.size() == 2 * n);
+  BOOST_CHECK(*log.getRaw<int64_t>("int", n) == 0);
+  BOOST_CHECK(log.getRaw<std::string>("string", n) == nullptr);
+
+  bfs::remove_all(bfs::path(path).parent_path());
+}
+
+BOOST_AUTO_TEST_CASE(TestThreadedLog)
+{
+  const size_t n = 1000;
+  auto path = make_log(n, mc_rtc::Logger::Policy::THREADED);
+  mc_rtc::log::FlatLog log(path);
+  BOOST_REQUIRE(log.size() == n);
+  auto dropped = log.get<uint64_t>("perf_LogDropped");
+  BOOST_REQUIRE(dropped.size() == n);
+  BOOST_CHECK(dropped.back() == 0);
+  BOOST_CHECK(log.has("perf_LogBuffer"));
+  auto t = log.get<double>("t");
+  for(size_t i = 0; i < n; ++i)
+  {
+    BOOST_REQUIRE_SMALL(t[i] - 0.005 * static_cast<double>(i), 1e-9);
+  }
+
+  bfs::remove_all(bfs::path(path).parent_path());
+}
+
+BOOST_AUTO_TEST_CASE(TestLogRotation)
+{
+  for(auto policy : {mc_rtc::Logger::Policy::NON_THREADED, mc_rtc::Logger::Policy::THREADED})
+  {
+    auto dir = bfs::temp_directory_path() / bfs::unique_path("mc_rtc_flatlog_%%%%-%%%%");
+    bfs::create_directories(dir);
+    const size_t n = 100;
+    {
+      mc_rtc::Logger logger(policy, dir.string(), "test");
+      logger.rotation(0, 0.1);
+      size_t i = 0;
+      logger.addLogEntry("i", [&i]() { return static_cast<uint64_t>(i); });
+      logger.start("Rotation", 0.005);
+      for(i = 0; i < n; ++i)
+      {
+        logger.log();
+      }
+    }
+    std::vector<bfs::path> manifests;
+    for(const auto & p : bfs::directory_iterator(dir))
+    {
+      if(p.path().extension() == ".json")
+      {
+        manifests.push_back(p.path());
+      }
+    }
+    BOOST_REQUIRE(manifests.size() == 1);
+    auto manifest = manifests[0].string();
+    auto segments = mc_rtc::log::log_segments(manifest);
+    BOOST_REQUIRE(segments.size() == 5);
+    for(const auto & s : segments)
+    {
+      // Every segment can be read on its own
+      mc_rtc::log::FlatLog segment(s);
+      BOOST_REQUIRE(segment.size() == n / segments.size());
+      BOOST_REQUIRE(segment.has("i"));
+    }
+    BOOST_CHECK(bfs::equivalent(bfs::read_symlink(dir / "test-Rotation-latest.bin"), segments.back()));
+
+    mc_rtc::log::FlatLog log(manifest);
+    BOOST_REQUIRE(log.size() == n);
+    auto is = log.get<uint64_t>("i");
+    for(size_t i = 0; i < n; ++i)
+    {
+      BOOST_REQUIRE(is[i] == i);
+    }
+
+    BOOST_CHECK(mc_rtc::log::log_segments(manifest, 0.22, 0.28).size() == 1);
+    log.load(manifest, 0.2, 0.3);
+    auto t = log.get<double>("t");
+    BOOST_REQUIRE(t.size() >= 20 && t.size() <= 21);
+    BOOST_CHECK(t.front() >= 0.2 && t.back() <= 0.3);
+
+    bfs::remove_all(dir);
+  }
+}
+
+BOOST_AUTO_TEST_CASE(TestLogIndex)
+{
+  for(auto policy : {mc_rtc::Logger::Policy::NON_THREADED, mc_rtc::Logger::Policy::THREADED})
+  {
+    auto dir = bfs::temp_directory_path() / bfs::unique_path("mc_rtc_flatlog_%%%%-%%%%");
+    bfs::create_directories(dir);
+    const size_t n = 200;
+    {
+      mc_rtc::Logger logger(policy, dir.string(), "test");
+      logger.index(true);
+      size_t i = 0;
+      logger.addLogEntry("i", [&i]() { return static_cast<uint64_t>(i); });
+      logger.start("Index", 0.005);
+      for(i = 0; i < n; ++i)
+      {
+        if(i == n / 2)
+        {
+          logger.addLogEntry("j", [&i]() { return static_cast<uint64_t>(i); });
+        }
+        logger.log();
+      }
+    }
+    auto path = (dir / "test-Index-latest.bin").string();
+    auto index = mc_rtc::log::log_index_path(path);
+    BOOST_REQUIRE(bfs::exists(index));
+    BOOST_REQUIRE(bfs::file_size(index)
+                  == sizeof(mc_rtc::Logger::index_magic) + n * sizeof(mc_rtc::log::LogIndexEntry));
+
+    // The index written after the fact matches the one written by the logger
+    auto copy = (dir / "copy.bin").string();
+    bfs::copy_file(bfs::canonical(path), copy);
+    BOOST_REQUIRE(mc_rtc::log::index_binary_log(copy));
+    std::ifstream a(index, std::ios::binary);
+    std::ifstream b(mc_rtc::log::log_index_path(copy), std::ios::binary);
+    BOOST_CHECK(std::equal(std::istreambuf_iterator<char>(a), std::istreambuf_iterator<char>(),
+                           std::istreambuf_iterator<char>(b)));
+
+    size_t frames = 0;
+    double t_first = -1;
+    double t_last = -1;
+    mc_rtc::log::iterate_binary_log(
+        path,
+        [&](const std::vector<std::string> & keys, std::vector<mc_rtc::log::FlatLog::record> &, double t) {
+          // The first frame always carries the keys
+          BOOST_REQUIRE(frames != 0 || std::find(keys.begin(), keys.end(), "j") != keys.end());
+          if(frames == 0)
+          {
+            t_first = t;
+          }
+          t_last = t;
+          frames++;
+          return true;
+        },
+        true, "t", 0.6, 0.7);
+    BOOST_REQUIRE(frames >= 20 && frames <= 21);
+    BOOST_CHECK(t_first >= 0.6 && t_last <= 0.7);
+
+    mc_rtc::log::FlatLog log;
+    log.load(path, 0.6, 0.7);
+    BOOST_REQUIRE(log.size() == frames);
+    auto is = log.get<uint64_t>("i");
+    auto js = log.get<uint64_t>("j");
+    BOOST_CHECK(is.front() == js.front());
+    BOOST_CHECK_SMALL(static_cast<double>(is.front()) * 0.005 - t_first, 1e-9);
+
+    bfs::remove_all(dir);
+  }
+}
+
+BOOST_AUTO_TEST_CASE(TestParallelFlatLog)
+{
+  // Large enough to be split into several chunks
+  const size_t n = 50000;
+  auto path = make_log(n);
+  BOOST_REQUIRE(mc_rtc::log::binary_log_chunks(path, 4, 0).size() == 4);
+  mc_rtc::log::FlatLog sequential;
+  sequential.threads(1);
+  sequential.load(path);
+  mc_rtc::log::FlatLog parallel;
+  parallel.threads(4);
+  parallel.load(path);
+  BOOST_REQUIRE(sequential.size() == n);
+  BOOST_REQUIRE(parallel.size() == n);
+  BOOST_REQUIRE(sequential.entries() == parallel.entries());
+  for(const auto & e : sequential.entries())
+  {
+    BOOST_REQUIRE(sequential.types(e) == parallel.types(e));
+  }
+  check_same<double>(sequential, parallel, "t");
+  check_same<int64_t>(sequential, parallel, "int");
+  check_same<double>(sequential, parallel, "int");
+  check_same<bool>(sequential, parallel, "bool");
+  check_same<Eigen::Vector3d>(sequential, parallel, "vector");
+  check_same<std::string>(sequential, parallel, "string");
+
+  bfs::remove_all(bfs::path(path).parent_path());
+}
+
+BOOST_AUTO_TEST_CASE(TestCompressedFlatLog)
+{
+  auto dir = bfs::temp_directory_path() / bfs::unique_path("mc_rtc_flatlog_%%%%-%%%%");
+  bfs::create_directories(dir);
+  auto path = (dir / "test.cflat").string();
+  const size_t n = 1000;
+  std::vector<double> t(n);
+  std::vector<double> x(n);
+  std::vector<std::string> s(n);
+  for(size_t i = 0; i < n; ++i)
+  {
+    t[i] = 0.005 * static_cast<double>(i);
+    x[i] = i % 10 == 0 ? std::numeric_limits<double>::quiet_NaN() : std::sin(t[i]);
+    s[i] = i % 2 == 0 ? std::to_string(i) : "";
+  }
+  {
+    mc_rtc::log::CompressedFlatLogWriter writer(path, 64);
+    writer.write("t", t.data(), t.size());
+    writer.write("x", x.data(), x.size());
+    writer.write("s", s);
+    BOOST_REQUIRE(writer.close());
+  }
+
+  mc_rtc::log::FlatLog log(path);
+  BOOST_REQUIRE(log.size() == n);
+  BOOST_REQUIRE(log.type("x") == mc_rtc::log::LogType::Double);
+  BOOST_REQUIRE(log.type("s") == mc_rtc::log::LogType::String);
+  auto ts = log.get<double>("t");
+  auto xs = log.getRaw<double>("x");
+  for(size_t i = 0; i < n; ++i)
+  {
+    BOOST_REQUIRE(ts[i] == t[i]);
+    BOOST_REQUIRE((xs[i] == nullptr) == (i % 10 == 0));
+    BOOST_REQUIRE(xs[i] == nullptr || *xs[i] == x[i]);
+    BOOST_REQUIRE(log.get<std::string>("s", i, "none") == (i % 2 == 0 ? s[i] : "none"));
+  }
+
+  log.load(path, 1.0, 2.0);
+  BOOST_REQUIRE(log.size() == 201);
+  BOOST_CHECK(log.get<double>("t", 0, 0) == t[200]);
+  BOOST_CHECK(log.get<std::string>("s", 0, "") == s[200]);
+  BOOST_CHECK(log.get<double>("x", log.size() - 2, 0) == x[399]);
+
+  bfs::remove_all(dir);
+}
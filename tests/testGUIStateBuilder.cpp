@@ -3,6 +3,7 @@
  */
 
 #include <mc_rtc/gui/ArrayLabel.h>
+#include <mc_rtc/gui/Checkbox.h>
 #include <mc_rtc/gui/Label.h>
 #include <mc_rtc/gui/StateBuilder.h>
 
@@ -26,3 +27,138 @@ BOOST_AUTO_TEST_CASE(TestGUIStateBuilder)
   auto state = mc_rtc::Configuration::fromMessagePack(buffer.data(), s);
   std::cout << state.dump(true) << "\n";
 }
+
+BOOST_AUTO_TEST_CASE(TestGUIStateBuilderDelta)
+{
+  using MessageType = mc_rtc::gui::MessageType;
+  DummyProvider provider;
+  mc_rtc::gui::StateBuilder builder;
+  builder.addElement({"dummy", "provider"}, mc_rtc::gui::Label("value", [&provider] { return provider.value; }));
+  builder.addElement({"dummy", "provider"}, mc_rtc::gui::ArrayLabel("point", [&provider] { return provider.point; }));
+  std::vector<char> buffer;
+  auto update = [&](bool keyframe) {
+    auto s = builder.update(buffer, keyframe);
+    return mc_rtc::Configuration::fromMessagePack(buffer.data(), s);
+  };
+  // The first message is always a keyframe
+  auto state = update(false);
+  BOOST_REQUIRE(state.size() == 6);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Keyframe));
+  BOOST_REQUIRE(static_cast<uint64_t>(state[2]) == 1);
+  BOOST_REQUIRE(state[4][1][0][1][0].size() == 4);
+  // Nothing changed
+  state = update(false);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Delta));
+  BOOST_REQUIRE(static_cast<uint64_t>(state[2]) == 2);
+  BOOST_REQUIRE(state[4][1].size() == 0);
+  BOOST_REQUIRE(state[4][2].size() == 0);
+  // Only the label changed
+  provider.value = 0.0;
+  state = update(false);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Delta));
+  auto provider_delta = state[4][2][0][2][0];
+  BOOST_REQUIRE(provider_delta[0] == std::string("provider"));
+  BOOST_REQUIRE(provider_delta[1].size() == 1);
+  BOOST_REQUIRE(provider_delta[1][0][0] == std::string("value"));
+  BOOST_REQUIRE(static_cast<double>(provider_delta[1][0][3]) == 0.0);
+  // Requested keyframe
+  state = update(true);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Keyframe));
+  // Adding an element forces a keyframe
+  builder.addElement({"dummy"}, mc_rtc::gui::Label("other", [] { return 0.0; }));
+  state = update(false);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Keyframe));
+  BOOST_REQUIRE(state[4][1][0].size() == 3);
+}
+
+BOOST_AUTO_TEST_CASE(TestGUIStateBuilderSnapshot)
+{
+  using MessageType = mc_rtc::gui::MessageType;
+  DummyProvider provider;
+  mc_rtc::gui::StateBuilder builder;
+  builder.addElement({"dummy", "provider"}, mc_rtc::gui::Label("value", [&provider] { return provider.value; }));
+  std::vector<char> buffer;
+  // No snapshot yet
+  BOOST_REQUIRE(builder.writeSnapshot(buffer, false) == 0);
+  BOOST_REQUIRE(builder.snapshot());
+  // The message holds the values at the time of the snapshot
+  provider.value = 0.0;
+  auto s = builder.writeSnapshot(buffer, false);
+  BOOST_REQUIRE(s != 0);
+  auto state = mc_rtc::Configuration::fromMessagePack(buffer.data(), s);
+  BOOST_REQUIRE(static_cast<double>(state[4][1][0][1][0][1][3]) == 42.0);
+  // A snapshot is only published once
+  BOOST_REQUIRE(builder.writeSnapshot(buffer, false) == 0);
+  // The snapshot keeps its layout if the GUI is modified before it is written
+  BOOST_REQUIRE(builder.snapshot());
+  builder.removeElement({"dummy", "provider"}, "value");
+  s = builder.writeSnapshot(buffer, false);
+  BOOST_REQUIRE(s != 0);
+  state = mc_rtc::Configuration::fromMessagePack(buffer.data(), s);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Delta));
+  // The next snapshot is a keyframe without the element
+  BOOST_REQUIRE(builder.snapshot());
+  s = builder.writeSnapshot(buffer, false);
+  state = mc_rtc::Configuration::fromMessagePack(buffer.data(), s);
+  BOOST_REQUIRE(static_cast<int>(state[1]) == static_cast<int>(MessageType::Keyframe));
+  BOOST_REQUIRE(state[4][1][0][1][0].size() == 2);
+}
+
+BOOST_AUTO_TEST_CASE(TestGUIStateBuilderPublicationRate)
+{
+  using PublicationRate = mc_rtc::gui::PublicationRate;
+  DummyProvider provider;
+  size_t calls = 0;
+  mc_rtc::gui::StateBuilder builder;
+  builder.addElement({"dummy"}, mc_rtc::gui::Label("value", [&]() -> double {
+                       calls++;
+                       return provider.value;
+                     }));
+  builder.setPublicationRate({"dummy"}, "value", PublicationRate::OnChange());
+  builder.addPlot("plot", mc_rtc::gui::plot::X("t", [&provider]() { return provider.value; }),
+                  mc_rtc::gui::plot::Y("value", [&provider]() { return provider.value; }, mc_rtc::gui::Color::Red));
+  builder.setPlotPublicationRate("plot", PublicationRate::Period(1000.0));
+  std::vector<char> buffer;
+  auto update = [&]() {
+    auto s = builder.update(buffer, false);
+    return mc_rtc::Configuration::fromMessagePack(buffer.data(), s);
+  };
+  // Everything is published in the first message
+  auto state = update();
+  BOOST_REQUIRE(calls == 1);
+  BOOST_REQUIRE(static_cast<double>(state[4][1][0][1][3]) == 42.0);
+  BOOST_REQUIRE(state[5].size() == 1);
+  BOOST_REQUIRE(state[5][0].size() == 7);
+  // Neither the element nor the plot are due
+  provider.value = 0.0;
+  state = update();
+  BOOST_REQUIRE(calls == 1);
+  BOOST_REQUIRE(state[4][2].size() == 0);
+  BOOST_REQUIRE(state[5].size() == 1);
+  BOOST_REQUIRE(state[5][0].size() == 3);
+  BOOST_REQUIRE(state[5][0][2] == std::string("plot"));
+  // A keyframe holds the last published value
+  state = mc_rtc::Configuration::fromMessagePack(buffer.data(), builder.update(buffer, true));
+  BOOST_REQUIRE(calls == 1);
+  BOOST_REQUIRE(static_cast<double>(state[4][1][0][1][3]) == 42.0);
+  // Notified changes are published in the next message
+  builder.notifyChange({"dummy"}, "value");
+  state = update();
+  BOOST_REQUIRE(calls == 2);
+  BOOST_REQUIRE(static_cast<double>(state[4][2][0][1][0][3]) == 0.0);
+  // Elements edited by a client are published in the next message
+  bool checked = false;
+  builder.addElement(
+      {"dummy"},
+      mc_rtc::gui::Checkbox("checkbox", [&checked]() { return checked; }, [&checked]() { checked = !checked; }));
+  builder.setPublicationRate({"dummy"}, "checkbox", PublicationRate::OnChange());
+  state = update();
+  BOOST_REQUIRE(!static_cast<bool>(state[4][1][0][2][3]));
+  BOOST_REQUIRE(builder.handleRequest({"dummy"}, "checkbox", {}));
+  state = update();
+  BOOST_REQUIRE(state[4][2][0][1].size() == 1);
+  BOOST_REQUIRE(static_cast<bool>(state[4][2][0][1][0][3]));
+  state = mc_rtc::Configuration::fromMessagePack(buffer.data(), builder.update(buffer, true));
+  BOOST_REQUIRE(static_cast<bool>(state[4][1][0][2][3]));
+  BOOST_REQUIRE(calls == 2);
+}
@@ -0,0 +1,83 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+#include <mc_rtc/Configuration.h>
+#include <mc_rtc/MessagePackBuilder.h>
+#include <mc_rtc/MessagePackView.h>
+
+#include <boost/test/unit_test.hpp>
+
+#include <limits>
+
+BOOST_AUTO_TEST_CASE(TestMessagePackView)
+{
+  std::vector<char> buffer;
+  mc_rtc::MessagePackBuilder builder(buffer);
+  builder.start_array(9);
+  builder.write();
+  builder.write(true);
+  builder.write(static_cast<int8_t>(-3));
+  builder.write(std::numeric_limits<int64_t>::min());
+  builder.write(std::numeric_limits<uint64_t>::max());
+  builder.write(42.5);
+  builder.write(std::string(300, 'a'));
+  builder.start_map(2);
+  builder.write("int");
+  builder.write(static_cast<uint16_t>(1000));
+  builder.write("array");
+  builder.start_array(2);
+  builder.write("foo");
+  builder.write(0.5f);
+  builder.finish_array();
+  builder.finish_map();
+  builder.start_array(0);
+  builder.finish_array();
+  builder.finish_array();
+  size_t s = builder.finish();
+
+  mc_rtc::MessagePackView view(buffer.data(), s);
+  BOOST_REQUIRE(view.type() == mc_rtc::MessagePackView::Type::Array);
+  BOOST_REQUIRE(view.size() == 9);
+  BOOST_REQUIRE(view.bytes() == s);
+  BOOST_REQUIRE(view[0].isNil());
+  BOOST_REQUIRE(view[1].asBool());
+  BOOST_REQUIRE(view[2].asInt() == -3);
+  BOOST_REQUIRE_THROW(view[2].asUInt(), std::runtime_error);
+  BOOST_REQUIRE(view[3].asInt() == std::numeric_limits<int64_t>::min());
+  BOOST_REQUIRE(view[4].asUInt() == std::numeric_limits<uint64_t>::max());
+  BOOST_REQUIRE_THROW(view[4].asInt(), std::runtime_error);
+  BOOST_REQUIRE(view[5].asDouble() == 42.5);
+  BOOST_REQUIRE(view[6].asString() == std::string(300, 'a'));
+  BOOST_REQUIRE(view[6].equals(std::string(300, 'a')));
+  BOOST_REQUIRE(!view[6].equals("a"));
+  BOOST_REQUIRE_THROW(view[6].asBool(), std::runtime_error);
+
+  auto map = view[7];
+  BOOST_REQUIRE(map.type() == mc_rtc::MessagePackView::Type::Map);
+  BOOST_REQUIRE(map.size() == 2);
+  BOOST_REQUIRE(map.has("int"));
+  BOOST_REQUIRE(!map.has("foo"));
+  BOOST_REQUIRE(map("int").asInt() == 1000);
+  BOOST_REQUIRE(map("array")[0].equals("foo"));
+  BOOST_REQUIRE(map("array")[1].asDouble() == 0.5);
+  BOOST_REQUIRE_THROW(map("foo"), std::runtime_error);
+
+  size_t n = 0;
+  for(auto v : view)
+  {
+    BOOST_REQUIRE(v == view[n]);
+    n++;
+  }
+  BOOST_REQUIRE(n == view.size());
+  BOOST_REQUIRE(view[8].size() == 0);
+  BOOST_REQUIRE(!(view[8].begin() != view[8].end()));
+  BOOST_REQUIRE_THROW(view[9], std::runtime_error);
+
+  // The view agrees with the data converted to a Configuration
+  auto config = mc_rtc::Configuration::fromMessagePack(map.data(), map.bytes());
+  BOOST_REQUIRE(static_cast<int>(config("int")) == 1000);
+
+  // Incomplete data is detected
+  BOOST_REQUIRE_THROW(mc_rtc::MessagePackView(buffer.data(), s - 1), std::runtime_error);
+}
@@ -1,4 +1,5 @@
 #include <mc_rtc/constants.h>
+#include <mc_rtc/utils.h>
 #include <boost/test/unit_test.hpp>
 
 BOOST_AUTO_TEST_CASE(TestConstants)
@@ -11,3 +12,39 @@ BOOST_AUTO_TEST_CASE(TestConstants)
 
   BOOST_REQUIRE(cst::GRAVITY > 0);
 }
+
+BOOST_AUTO_TEST_CASE(TestByteRingBuffer)
+{
+  ByteRingBuffer buffer(80);
+  BOOST_REQUIRE(buffer.empty());
+  const char * data = nullptr;
+  size_t size = 0;
+  BOOST_REQUIRE(!buffer.front(data, size));
+
+  std::string msg(60, 'a');
+  // 60 bytes messages use 72 bytes in the buffer, the second one does not fit
+  BOOST_REQUIRE(buffer.push(msg.data(), msg.size()));
+  BOOST_REQUIRE(!buffer.push(msg.data(), msg.size()));
+  BOOST_REQUIRE(buffer.used() == 72);
+  BOOST_REQUIRE(buffer.front(data, size));
+  BOOST_REQUIRE(std::string(data, size) == msg);
+  buffer.pop();
+  BOOST_REQUIRE(buffer.empty());
+
+  msg = std::string(10, 'a');
+  BOOST_REQUIRE(buffer.push(msg.data(), msg.size()));
+  for(size_t i = 0; i < 10; ++i)
+  {
+    // Every other message wraps around the end of the storage
+    std::string next(10, static_cast<char>('b' + i));
+    BOOST_REQUIRE(buffer.push(next.data(), next.size()));
+    BOOST_REQUIRE(buffer.front(data, size));
+    BOOST_REQUIRE(std::string(data, size) == msg);
+    buffer.pop();
+    msg = next;
+  }
+  BOOST_REQUIRE(buffer.front(data, size));
+  BOOST_REQUIRE(std::string(data, size) == msg);
+  buffer.pop();
+  BOOST_REQUIRE(buffer.empty());
+}
@@ -0,0 +1,53 @@
+/*
+ * Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+ */
+
+/** Write the binary log read by the tests of the Python log tools
+ *
+ * See utils/mc_log_gui/tests/test_mc_log_readers.py for the expected content
+ */
+
+#include <mc_rtc/log/Logger.h>
+
+#include <boost/filesystem.hpp>
+
+#include <cmath>
+#include <iostream>
+#include <limits>
+namespace bfs = boost::filesystem;
+
+int main(int argc, char * argv[])
+{
+  if(argc != 2)
+  {
+    std::cerr << "Usage: " << argv[0] << " [out.bin]\n";
+    return 1;
+  }
+  const size_t n = 1000;
+  auto dir = bfs::temp_directory_path() / bfs::unique_path("mc_rtc_log_ui_%%%%-%%%%");
+  bfs::create_directories(dir);
+  {
+    mc_rtc::Logger logger(mc_rtc::Logger::Policy::NON_THREADED, dir.string(), "test");
+    size_t i = 0;
+    logger.addLogEntry("int", [&i]() { return static_cast<int64_t>(i); });
+    logger.addLogEntry("double", [&i]() {
+      return i % 10 == 0 ? std::numeric_limits<double>::quiet_NaN() : 0.5 * static_cast<double>(i);
+    });
+    logger.addLogEntry("vector", [&i]() { return Eigen::Vector3d(i, 2 * i, 3 * i); });
+    logger.addLogEntry("string", [&i]() { return std::to_string(i / 10); });
+    logger.start("LogUI", 0.005);
+    for(i = 0; i < n; ++i)
+    {
+      // Entries appear and disappear in the middle of the log
+      if(i == n / 2)
+      {
+        logger.removeLogEntry("vector");
+        logger.addLogEntry("bool", [&i]() { return i % 2 == 0; });
+      }
+      logger.log();
+    }
+  }
+  bfs::copy_file(dir / "test-LogUI-latest.bin", argv[1], bfs::copy_option::overwrite_if_exists);
+  bfs::remove_all(dir);
+  return 0;
+}
@@ -3,8 +3,15 @@
  */
 
 #include "mc_bin_utils.h"
+
+#include <mc_rtc/log/CompressedFlatLog.h>
+
+#include <boost/filesystem.hpp>
+namespace bfs = boost::filesystem;
+
 #include <fstream>
 #include <map>
+#include <memory>
 #include <type_traits>
 
 namespace utils
@@ -20,43 +27,85 @@ size_t nEntries(const mc_rtc::log::FlatLog & log, const std::map<std::string, mc
   return s;
 }
 
-void write(uint64_t s, std::ostream & os)
+/** Output of the conversion */
+struct FlatOutput
 {
-  os.write((char *)&s, sizeof(uint64_t));
-}
+  virtual ~FlatOutput() = default;
+  virtual void write(const std::string & entry, const double * data, size_t size) = 0;
+  virtual void write(const std::string & entry, const std::vector<std::string> & data) = 0;
+};
 
-void write(const std::string & entry, bool numeric, std::ostream & os)
+/** Write a .flat file */
+struct FlatFile : public FlatOutput
 {
-  os.put(numeric ? 1 : 0);
-  write(entry.size(), os);
-  os.write(entry.data(), static_cast<int>(entry.size() * sizeof(char)));
-}
+  FlatFile(const std::string & out, uint64_t nEntries) : os(out, std::ofstream::binary)
+  {
+    write(nEntries);
+  }
+
+  void write(uint64_t s)
+  {
+    os.write((char *)&s, sizeof(uint64_t));
+  }
+
+  void write(const std::string & entry, bool numeric)
+  {
+    os.put(numeric ? 1 : 0);
+    write(entry.size());
+    os.write(entry.data(), static_cast<int>(entry.size() * sizeof(char)));
+  }
+
+  void write(const std::string & entry, const double * data, size_t size) override
+  {
+    write(entry, true);
+    write(size);
+    os.write((const char *)data, static_cast<int>(size * sizeof(double)));
+  }
+
+  void write(const std::string & entry, const std::vector<std::string> & data) override
+  {
+    write(entry, false);
+    write(data.size());
+    for(const auto & s : data)
+    {
+      write(s.size());
+      os.write(s.data(), static_cast<int>(s.size() * sizeof(char)));
+    }
+  }
 
-void write(const std::string & entry, const double * data, size_t size, std::ostream & os)
+  std::ofstream os;
+};
+
+/** Write a .cflat file */
+struct CompressedFlatFile : public FlatOutput
 {
-  write(entry, true, os);
-  write(size, os);
-  os.write((const char *)data, static_cast<int>(size * sizeof(double)));
-}
+  CompressedFlatFile(const std::string & out) : writer(out) {}
+
+  void write(const std::string & entry, const double * data, size_t size) override
+  {
+    writer.write(entry, data, size);
+  }
+
+  void write(const std::string & entry, const std::vector<std::string> & data) override
+  {
+    writer.write(entry, data);
+  }
+
+  mc_rtc::log::CompressedFlatLogWriter writer;
+};
 
-void write(const std::string & entry, const std::vector<double> & data, std::ostream & os)
+void write(const std::string & entry, const std::vector<double> & data, FlatOutput & os)
 {
-  write(entry, data.data(), data.size(), os);
+  os.write(entry, data.data(), data.size());
 }
 
-void write(const std::string & entry, const std::vector<std::string> & data, std::ostream & os)
+void write(const std::string & entry, const std::vector<std::string> & data, FlatOutput & os)
 {
-  write(entry, false, os);
-  write(data.size(), os);
-  for(const auto & s : data)
-  {
-    write(s.size(), os);
-    os.write(s.data(), static_cast<int>(s.size() * sizeof(char)));
-  }
+  os.write(entry, data);
 }
 
 template<typename T>
-void write(const std::string & entry, const std::vector<T> & data, std::ostream & os)
+void write(const std::string & entry, const std::vector<T> & data, FlatOutput & os)
 {
   std::vector<double> out(data.size());
   for(size_t i = 0; i < data.size(); ++i)
@@ -69,7 +118,7 @@ void write(const std::string & entry, const std::vector<T> & data, std::ostream
 static const double nan = std::numeric_limits<double>::quiet_NaN();
 
 template<typename T>
-void write(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   static_assert(std::is_arithmetic<T>::value, "This default implementation only works for numeric types");
   static const T nan = std::numeric_limits<T>::quiet_NaN();
@@ -77,13 +126,13 @@ void write(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ost
 }
 
 template<>
-void write<std::string>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<std::string>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   write(entry, log.get<std::string>(entry, ""), os);
 }
 
 template<>
-void write<Eigen::Quaterniond>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<Eigen::Quaterniond>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<Eigen::Quaterniond>(entry);
   std::vector<double> w(data.size(), nan);
@@ -108,7 +157,7 @@ void write<Eigen::Quaterniond>(const mc_rtc::log::FlatLog & log, const std::stri
 }
 
 template<>
-void write<Eigen::Vector3d>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<Eigen::Vector3d>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<Eigen::Vector3d>(entry);
   std::vector<double> x(data.size(), nan);
@@ -130,7 +179,7 @@ void write<Eigen::Vector3d>(const mc_rtc::log::FlatLog & log, const std::string
 }
 
 template<>
-void write<Eigen::Vector6d>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<Eigen::Vector6d>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<Eigen::Vector6d>(entry);
   std::vector<double> v0(data.size(), nan);
@@ -162,7 +211,7 @@ void write<Eigen::Vector6d>(const mc_rtc::log::FlatLog & log, const std::string
 }
 
 template<>
-void write<Eigen::Vector2d>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<Eigen::Vector2d>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<Eigen::Vector2d>(entry);
   std::vector<double> x(data.size(), nan);
@@ -181,7 +230,7 @@ void write<Eigen::Vector2d>(const mc_rtc::log::FlatLog & log, const std::string
 }
 
 template<>
-void write<sva::PTransformd>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<sva::PTransformd>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<sva::PTransformd>(entry);
   std::vector<double> qw(data.size(), nan);
@@ -216,7 +265,7 @@ void write<sva::PTransformd>(const mc_rtc::log::FlatLog & log, const std::string
 }
 
 template<>
-void write<sva::ForceVecd>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<sva::ForceVecd>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<sva::ForceVecd>(entry);
   std::vector<double> cx(data.size(), nan);
@@ -247,7 +296,7 @@ void write<sva::ForceVecd>(const mc_rtc::log::FlatLog & log, const std::string &
 }
 
 template<>
-void write<sva::MotionVecd>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<sva::MotionVecd>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<sva::MotionVecd>(entry);
   std::vector<double> wx(data.size(), nan);
@@ -278,7 +327,7 @@ void write<sva::MotionVecd>(const mc_rtc::log::FlatLog & log, const std::string
 }
 
 template<>
-void write<std::vector<double>>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<std::vector<double>>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<std::vector<double>>(entry);
   std::vector<double> vec{};
@@ -312,12 +361,12 @@ void write<std::vector<double>>(const mc_rtc::log::FlatLog & log, const std::str
   }
   for(size_t i = 0; i < maxS; ++i)
   {
-    write(entry + "_" + std::to_string(i), &vec[i * data.size()], data.size(), os);
+    os.write(entry + "_" + std::to_string(i), &vec[i * data.size()], data.size());
   }
 }
 
 template<>
-void write<Eigen::VectorXd>(const mc_rtc::log::FlatLog & log, const std::string & entry, std::ostream & os)
+void write<Eigen::VectorXd>(const mc_rtc::log::FlatLog & log, const std::string & entry, FlatOutput & os)
 {
   auto data = log.getRaw<Eigen::VectorXd>(entry);
   std::vector<double> vec{};
@@ -351,7 +400,7 @@ void write<Eigen::VectorXd>(const mc_rtc::log::FlatLog & log, const std::string
   }
   for(size_t i = 0; i < maxS; ++i)
   {
-    write(entry + "_" + std::to_string(i), &vec[i * data.size()], data.size(), os);
+    os.write(entry + "_" + std::to_string(i), &vec[i * data.size()], data.size());
   }
 }
 
@@ -361,8 +410,16 @@ void mc_bin_to_flat(const std::string & in, const std::string & out)
 {
   mc_rtc::log::FlatLog log(in);
   auto entries = utils::entries(log);
-  std::ofstream ofs(out, std::ofstream::binary);
-  utils::write(utils::nEntries(log, entries), ofs);
+  std::unique_ptr<utils::FlatOutput> ofs_ptr;
+  if(bfs::path(out).extension() == ".cflat")
+  {
+    ofs_ptr.reset(new utils::CompressedFlatFile(out));
+  }
+  else
+  {
+    ofs_ptr.reset(new utils::FlatFile(out, utils::nEntries(log, entries)));
+  }
+  auto & ofs = *ofs_ptr;
   for(const auto & e : entries)
   {
     const auto & entry = e.first;
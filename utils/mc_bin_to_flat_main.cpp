@@ -12,6 +12,7 @@ namespace bfs = boost::filesystem;
 void usage(const char * bin)
 {
   LOG_ERROR("Usage: " << bin << " [bin] ([flat])")
+  LOG_ERROR("The output is a compressed flat log if [flat] has the .cflat extension")
 }
 
 int main(int argc, char * argv[])
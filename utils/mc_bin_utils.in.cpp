@@ -6,7 +6,8 @@
  * - Display some information about the log
  * - Split the file into N parts
  * - Extract the part(s) where a given entry was recorded
- * - Convert to csv/flat/bag format
+ * - Convert to csv/flat/cflat/bag format
+ * - Write the time index of the log
  */
 
 #include <mc_rtc/config.h>
@@ -40,7 +41,9 @@ void usage()
   std::cout << "    split     Split a log into N part\n";
   std::cout << "    extract   Extra part of a log\n";
   std::cout << "    convert   Convert binary logs to various formats\n";
+  std::cout << "    index     Write the time index of a log\n";
   std::cout << "\nUse mc_bin_utils <command> --help for usage of each command\n";
+  std::cout << "\nThe input of every command can be a binary log or the manifest (.json) of a segmented log\n";
 }
 
 int show(int argc, char * argv[])
@@ -333,11 +336,9 @@ int extract(int argc, char * argv[])
     return true;
   };
   std::vector<std::string> keys;
-  double final_t = 0;
   auto callback_extract_from_to = [&](const std::vector<std::string> & ks,
                                       const std::vector<mc_rtc::log::FlatLog::record> &, double t,
                                       const mc_rtc::log::copy_callback & copy, const char * data, uint64_t dataSize) {
-    final_t = t;
     if(ks.size())
     {
       keys = ks;
@@ -388,12 +389,21 @@ int extract(int argc, char * argv[])
   }
   if(from != 0 || to != std::numeric_limits<double>::infinity())
   {
-    if(!mc_rtc::log::iterate_binary_log(in, mc_rtc::log::binary_log_copy_callback(callback_extract_from_to), false))
+    if(!mc_rtc::log::iterate_binary_log(in, mc_rtc::log::binary_log_copy_callback(callback_extract_from_to), false,
+                                        "t", from, to))
     {
       return 1;
     }
     if(!ofs.is_open())
     {
+      // The callback is not called outside of the time window, go through the whole log to find its last time
+      double final_t = 0;
+      auto callback_final_t = [&final_t](const std::vector<std::string> &,
+                                         const std::vector<mc_rtc::log::FlatLog::record> &, double t) {
+        final_t = t;
+        return true;
+      };
+      mc_rtc::log::iterate_binary_log(in, mc_rtc::log::binary_log_callback(callback_final_t), false);
       std::cout << "Provided start time is higher than last time recorded: " << final_t << "\n";
     }
   }
@@ -410,7 +420,7 @@ int convert(int argc, char * argv[])
     ("help", "Produce this message")
     ("in", po::value<std::string>(), "Input file")
     ("out", po::value<std::string>(), "Output file or template")
-    ("format", po::value<std::string>(), "Log format (csv|flat|bag), can be deduced from [out]")
+    ("format", po::value<std::string>(), "Log format (csv|flat|cflat|bag), can be deduced from [out]")
     ("dt", po::value<double>(&dt), "Log timestep (only for bag conversion)");
   // clang-format on
   po::positional_options_description pos;
@@ -442,7 +452,7 @@ int convert(int argc, char * argv[])
     {
       format = "." + format;
     }
-    if(format != ".bag" && format != ".csv" && format != ".flat")
+    if(format != ".bag" && format != ".csv" && format != ".flat" && format != ".cflat")
     {
       LOG_ERROR("Unsupported format " << format)
       format = "";
@@ -470,7 +480,7 @@ int convert(int argc, char * argv[])
       format = ext;
     }
   }
-  else if(ext == ".flat")
+  else if(ext == ".flat" || ext == ".cflat")
   {
     if(format.size() && format != ext)
     {
@@ -494,7 +504,7 @@ int convert(int argc, char * argv[])
     LOG_ERROR("Could not deduce the desired output format")
     return 1;
   }
-  if(format == ".flat")
+  if(format == ".flat" || format == ".cflat")
   {
     mc_bin_to_flat(in, out_p.string());
   }
@@ -521,6 +531,38 @@ int convert(int argc, char * argv[])
   return 0;
 }
 
+int index(int argc, char * argv[])
+{
+  po::variables_map vm;
+  po::options_description tool("mc_bin_utils index options");
+  // clang-format off
+  tool.add_options()
+    ("help", "Produce this message")
+    ("in", po::value<std::string>(), "Input file");
+  // clang-format on
+  po::positional_options_description pos;
+  pos.add("in", 1);
+  po::store(po::command_line_parser(argc, argv).options(tool).positional(pos).run(), vm);
+  po::notify(vm);
+  if(!vm.count("in") || vm.count("help"))
+  {
+    std::cout << "Usage: mc_bin_utils index [in]\n\n";
+    std::cout << "Write [in].idx, used by other tools to seek a given time in [in]\n\n";
+    std::cout << tool << "\n";
+    return !vm.count("help");
+  }
+  auto in = vm["in"].as<std::string>();
+  for(const auto & segment : mc_rtc::log::log_segments(in))
+  {
+    if(!mc_rtc::log::index_binary_log(segment))
+    {
+      return 1;
+    }
+    std::cout << "Wrote " << mc_rtc::log::log_index_path(segment) << "\n";
+  }
+  return 0;
+}
+
 int main(int argc, char * argv[])
 {
   if(argc < 2)
@@ -547,6 +589,10 @@ int main(int argc, char * argv[])
   {
     return convert(argc, argv);
   }
+  else if(tool == "index")
+  {
+    return index(argc, argv);
+  }
   else
   {
     usage();
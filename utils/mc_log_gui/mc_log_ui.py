@@ -14,7 +14,11 @@ import sys
 if __name__ == '__main__':
   app = QtWidgets.QApplication(sys.argv)
   gui = MCLogUI()
-  if len(sys.argv) > 1:
+  if len(sys.argv) > 2 and sys.argv[1] in ['-f', '--follow']:
+    gui.follow(sys.argv[2])
+  elif len(sys.argv) > 2:
+    gui.compare(sys.argv[1:])
+  elif len(sys.argv) > 1:
     gui.load_csv(sys.argv[1])
   gui.showMaximized()
 
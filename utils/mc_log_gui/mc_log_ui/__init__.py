@@ -1,3 +1,13 @@
-from .mc_log_ui import MCLogUI, read_log, UserPlot, load_UserPlots
-from .mc_log_tab import MCLogTab
+from .mc_log_compare import compare_logs, log_name
+from .mc_log_data import LogData
+from .mc_log_figure import MakeFigure, PlotFigure, UserFigure
+from .mc_log_io import read_log, read_flat, read_csv, UserPlot, load_UserPlots, add_derived_entries, set_joint_limits
 from .mc_log_types import *
+
+# The GUI is only available if PyQt5 is installed, the rest does not need Qt
+try:
+  from .mc_log_ui import MCLogUI
+  from .mc_log_tab import MCLogTab
+except ImportError:
+  MCLogUI = None
+  MCLogTab = None
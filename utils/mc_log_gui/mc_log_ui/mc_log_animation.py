@@ -0,0 +1,173 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import subprocess
+import time
+
+import matplotlib
+import numpy as np
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Fraction of the data range kept around the data when the animation limits grow
+ANIMATION_MARGIN = 0.1
+
+def _grow_limits(current, tight):
+  """Returns current if it contains tight, otherwise tight with some margin
+
+  This keeps the limits of the animation (hence the background) unchanged
+  most of the time while the data grows
+  """
+  if tight is None:
+    return current
+  range_ = tight[1] - tight[0]
+  if current is not None and current[0] <= tight[0] and tight[1] <= current[1]:
+    # Shrink the limits if the data only covers a small part of them
+    if range_ >= 0.5 * (current[1] - current[0]) / (1 + 2 * ANIMATION_MARGIN):
+      return current
+  margin = ANIMATION_MARGIN * range_
+  if margin == 0:
+    margin = max(ANIMATION_MARGIN * abs(tight[0]), 1e-6)
+  return (tight[0] - margin, tight[1] + margin)
+
+class BlitAnimation(object):
+  """Replay the data of a PlotFigure along its time entry
+
+  Only the moving artists are drawn for each frame, the rest of the figure is
+  drawn once and restored from a cached background. The background is only
+  redrawn when the limits of the axes change, the limits grow with the data
+  (see ANIMATION_MARGIN) unless they are locked.
+
+  If window is not 0, only the last window seconds of data are shown.
+
+  The figure must provide:
+  - animate(frame0, frame) which shows the data in [frame0, frame) and returns
+    the artists to draw
+  - animationLimits(frame0, frame) which returns the (x, y1, y2) limits of the
+    data in [frame0, frame)
+  - drawAnimationBackground(x_limits, y1_limits, y2_limits) which prepares the
+    figure for a full draw with the given limits
+  """
+  def __init__(self, figure, t, i0, iN, window = 0, limits = (None, None, None)):
+    self.figure = figure
+    self.t = np.asarray(t[i0:iN + 1], dtype = np.float64)
+    self.i0 = i0
+    self.iN = iN
+    self.window = window
+    self.locked = limits
+    self.limits = None
+    self.background = None
+    self.timer = None
+    self._drawing = False
+    self._callbacks = []
+
+  def _frame(self, t):
+    """Returns the end (exclusive) of the data shown at time t"""
+    frame = self.i0 + int(np.searchsorted(self.t, t, 'right'))
+    return min(max(frame, self.i0 + 1), self.iN + 1)
+
+  def _frame0(self, frame):
+    """Returns the start of the data shown when frame is the end of the data"""
+    if self.window <= 0:
+      return self.i0
+    return self.i0 + int(np.searchsorted(self.t, self.t[frame - 1 - self.i0] - self.window, 'left'))
+
+  def _limits(self, frame0, frame):
+    tight = self.figure.animationLimits(frame0, frame)
+    current = self.limits or (None, None, None)
+    return tuple(l if l is not None else _grow_limits(c, t) for l, c, t in zip(self.locked, current, tight))
+
+  def _invalidate(self, event = None):
+    if not self._drawing:
+      self.background = None
+
+  def _connect(self, canvas):
+    self._disconnect()
+    self._canvas = canvas
+    self._callbacks = [ canvas.mpl_connect(e, self._invalidate) for e in ['draw_event', 'resize_event'] ]
+
+  def _disconnect(self):
+    for cid in self._callbacks:
+      self._canvas.mpl_disconnect(cid)
+    self._callbacks = []
+
+  def render(self, frame):
+    """Draw the given frame in the canvas buffer and returns the moving artists"""
+    frame0 = self._frame0(frame)
+    artists = self.figure.animate(frame0, frame)
+    limits = self._limits(frame0, frame)
+    fig = self.figure.fig
+    canvas = fig.canvas
+    if self.background is None or limits != self.limits:
+      self.limits = limits
+      for a in artists:
+        a.set_animated(True)
+      self.figure.drawAnimationBackground(*limits)
+      self._drawing = True
+      try:
+        canvas.draw()
+      finally:
+        self._drawing = False
+      self.background = canvas.copy_from_bbox(fig.bbox)
+    else:
+      canvas.restore_region(self.background)
+    for a in artists:
+      fig.draw_artist(a)
+    return artists
+
+  def start(self, interval = 50):
+    """Play the animation in real time in the figure canvas, the view is updated every interval ms"""
+    canvas = self.figure.fig.canvas
+    self._connect(canvas)
+    self._start = time.time()
+    self.timer = canvas.new_timer(interval = interval)
+    self.timer.add_callback(self._step)
+    self.timer.start()
+
+  def _step(self):
+    t = self.t[0] + time.time() - self._start
+    if t > self.t[-1]:
+      # Loop over the data
+      self._start = time.time()
+      t = self.t[0]
+    self.render(self._frame(t))
+    self.figure.fig.canvas.blit(self.figure.fig.bbox)
+
+  def stop(self):
+    if self.timer is not None:
+      self.timer.stop()
+      self.timer = None
+    self._disconnect()
+    self.background = None
+
+  def save(self, fpath, fps = 20):
+    """Render the animation offscreen and write it to fpath with ffmpeg
+
+    Frames are written to ffmpeg's standard input as raw RGBA images
+    """
+    fig = self.figure.fig
+    if not isinstance(fig.canvas, FigureCanvasAgg):
+      FigureCanvasAgg(fig)
+    canvas = fig.canvas
+    self._connect(canvas)
+    self.background = None
+    proc = None
+    try:
+      for t in np.arange(self.t[0], self.t[-1], 1.0 / fps):
+        self.render(self._frame(t))
+        frame = np.asarray(canvas.buffer_rgba())
+        if proc is None:
+          h, w = frame.shape[:2]
+          cmd = [matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                 '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', '{}x{}'.format(w, h), '-r', str(fps), '-i', 'pipe:0',
+                 '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-vcodec', matplotlib.rcParams['animation.codec'],
+                 '-pix_fmt', 'yuv420p', fpath]
+          proc = subprocess.Popen(cmd, stdin = subprocess.PIPE)
+        proc.stdin.write(frame.tobytes())
+    finally:
+      self.stop()
+      if proc is not None:
+        proc.stdin.close()
+        if proc.wait() != 0:
+          raise RuntimeError("ffmpeg failed to write {}".format(fpath))
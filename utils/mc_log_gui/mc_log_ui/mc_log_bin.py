@@ -0,0 +1,312 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from mc_log_data import LogData
+from mc_log_strings import StringColumnBuilder
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+# Same as mc_rtc::Logger::magic
+MAGIC = b'ANNE'
+
+# Same order as mc_rtc::log::LogType
+LOG_TYPES = ['None', 'Bool', 'Int8_t', 'Int16_t', 'Int32_t', 'Int64_t', 'Uint8_t', 'Uint16_t', 'Uint32_t', 'Uint64_t',
+             'Float', 'Double', 'String', 'Vector2d', 'Vector3d', 'Vector6d', 'VectorXd', 'Quaterniond', 'PTransformd',
+             'ForceVecd', 'MotionVecd', 'VectorDouble']
+
+# Suffixes used by mc_bin_to_flat for fixed-size types, the size of the
+# serialized data is given as the second member
+FIXED_TYPES = {
+  'Vector2d': (['x', 'y'], 2),
+  'Vector3d': (['x', 'y', 'z'], 3),
+  'Vector6d': ([str(i) for i in range(6)], 6),
+  'Quaterniond': (['w', 'x', 'y', 'z'], 4),
+  'PTransformd': (['qw', 'qx', 'qy', 'qz', 'tx', 'ty', 'tz'], 12),
+  'ForceVecd': (['cx', 'cy', 'cz', 'fx', 'fy', 'fz'], 6),
+  'MotionVecd': (['wx', 'wy', 'wz', 'vx', 'vy', 'vz'], 6)
+}
+
+DYNAMIC_TYPES = ['VectorXd', 'VectorDouble']
+
+# mc_bin_to_flat writes the missing rows of these entries as 0
+INTEGER_TYPES = LOG_TYPES[1:10]
+
+def _unpack(buf, offset):
+  """Minimal MessagePack decoder used when the msgpack module is not available
+
+  Returns the decoded object and the offset past it
+  """
+  def unpack_from(fmt, offset):
+    return struct.unpack_from(fmt, buf, offset)[0]
+  def str_(size, offset):
+    return buf[offset:offset + size].decode('utf-8'), offset + size
+  def array_(size, offset):
+    out = []
+    for i in range(size):
+      v, offset = _unpack(buf, offset)
+      out.append(v)
+    return out, offset
+  def map_(size, offset):
+    out = {}
+    for i in range(size):
+      k, offset = _unpack(buf, offset)
+      v, offset = _unpack(buf, offset)
+      out[k] = v
+    return out, offset
+  b = unpack_from('B', offset)
+  offset += 1
+  if b <= 0x7f:
+    return b, offset
+  if b >= 0xe0:
+    return b - 0x100, offset
+  if b <= 0x8f:
+    return map_(b & 0x0f, offset)
+  if b <= 0x9f:
+    return array_(b & 0x0f, offset)
+  if b <= 0xbf:
+    return str_(b & 0x1f, offset)
+  if b == 0xc0:
+    return None, offset
+  if b == 0xc2:
+    return False, offset
+  if b == 0xc3:
+    return True, offset
+  fixed = {
+    0xca: '>f', 0xcb: '>d',
+    0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+    0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q'
+  }
+  if b in fixed:
+    fmt = fixed[b]
+    return unpack_from(fmt, offset), offset + struct.calcsize(fmt)
+  sized = {
+    0xc4: ('>B', None), 0xc5: ('>H', None), 0xc6: ('>I', None),
+    0xd9: ('>B', str_), 0xda: ('>H', str_), 0xdb: ('>I', str_),
+    0xdc: ('>H', array_), 0xdd: ('>I', array_),
+    0xde: ('>H', map_), 0xdf: ('>I', map_)
+  }
+  if b in sized:
+    fmt, fn = sized[b]
+    size = unpack_from(fmt, offset)
+    offset += struct.calcsize(fmt)
+    if fn is None:
+      return buf[offset:offset + size], offset + size
+    return fn(size, offset)
+  raise ValueError("Unsupported MessagePack type: {:#x}".format(b))
+
+def _unpack_frame(buf):
+  if msgpack is not None:
+    return msgpack.unpackb(buf, raw = False)
+  return _unpack(buf, 0)[0]
+
+def _frames(mm, offset = len(MAGIC)):
+  """Iterate over (offset, size) of complete frames in a mapped binary log, starting from the frame at offset"""
+  while offset + 8 <= len(mm):
+    size = struct.unpack_from('=Q', mm, offset)[0]
+    offset += 8
+    if offset + size > len(mm):
+      break
+    yield offset, size
+    offset += size
+
+def quaternions_from_matrices(E):
+  """Same as Eigen::Quaterniond(const Eigen::Matrix3d &) for every row of E
+
+  E is a (N, 9) array of row-major rotation matrices, returns w, x, y, z
+  """
+  m = lambda i, j: E[:, 3 * i + j]
+  q = np.full((E.shape[0], 4), np.nan)
+  trace = m(0, 0) + m(1, 1) + m(2, 2)
+  pos = trace > 0
+  t = np.sqrt(trace[pos] + 1.0)
+  q[pos, 0] = 0.5 * t
+  t = 0.5 / t
+  q[pos, 1] = (m(2, 1)[pos] - m(1, 2)[pos]) * t
+  q[pos, 2] = (m(0, 2)[pos] - m(2, 0)[pos]) * t
+  q[pos, 3] = (m(1, 0)[pos] - m(0, 1)[pos]) * t
+  diag = np.stack([m(0, 0), m(1, 1), m(2, 2)], axis = 1)
+  ii = np.where(diag[:, 1] > diag[:, 0], 1, 0)
+  ii = np.where(diag[:, 2] > diag[np.arange(len(ii)), ii], 2, ii)
+  for i in range(3):
+    sel = np.logical_and(~pos, ii == i)
+    j = (i + 1) % 3
+    k = (j + 1) % 3
+    t = np.sqrt(m(i, i)[sel] - m(j, j)[sel] - m(k, k)[sel] + 1.0)
+    q[sel, 1 + i] = 0.5 * t
+    t = 0.5 / t
+    q[sel, 0] = (m(k, j)[sel] - m(j, k)[sel]) * t
+    q[sel, 1 + j] = (m(j, i)[sel] + m(i, j)[sel]) * t
+    q[sel, 1 + k] = (m(k, i)[sel] + m(i, k)[sel]) * t
+  # Missing records propagate NaN through the trace
+  q[np.isnan(trace)] = np.nan
+  return q
+
+class BinColumn(object):
+  """Storage for one entry of a binary log, the type is set by the first record
+
+  Values are stored column-major so that every flat column is a contiguous
+  view of the storage. The storage grows geometrically (see resize) so that
+  appending rows to a log that is being written is amortized.
+  """
+  def __init__(self, name, size):
+    self.name = name
+    self.size = size
+    self.type = None
+    self.values = None
+    # Value of the rows where the entry is missing
+    self.missing = np.nan
+    # Rotations of a PTransformd entry converted to quaternions so far
+    self._quat = None
+    self._converted = 0
+  def _init(self, type_, value):
+    self.type = type_
+    if type_ == 'String':
+      self.values = StringColumnBuilder()
+    elif type_ in FIXED_TYPES:
+      self.values = np.full((FIXED_TYPES[type_][1], self.size), np.nan)
+    elif type_ in DYNAMIC_TYPES:
+      self.values = np.full((len(value), self.size), np.nan)
+    else:
+      if type_ in INTEGER_TYPES:
+        self.missing = 0.
+      self.values = np.full(self.size, self.missing)
+  def resize(self, size):
+    """Set the number of rows of the entry, new rows are empty"""
+    if self.values is not None and self.type != 'String' and size > self.values.shape[-1]:
+      values = np.full(self.values.shape[:-1] + (max(size, 2 * self.values.shape[-1]),), self.missing)
+      values[..., :self.size] = self.values[..., :self.size]
+      self.values = values
+    self.size = size
+  def set(self, i, type_id, value):
+    if type_id <= 0 or type_id >= len(LOG_TYPES):
+      return
+    type_ = LOG_TYPES[type_id]
+    if self.type is None:
+      self._init(type_, value)
+    if type_ != self.type:
+      return
+    if type_ in DYNAMIC_TYPES and len(value) > self.values.shape[0]:
+      values = np.full((len(value), self.values.shape[1]), np.nan)
+      values[:self.values.shape[0]] = self.values
+      self.values = values
+    try:
+      if type_ == 'String':
+        self.values.set(i, value)
+      elif type_ in FIXED_TYPES:
+        self.values[:, i] = value
+      elif type_ in DYNAMIC_TYPES:
+        self.values[:len(value), i] = value
+      else:
+        self.values[i] = value
+    except (TypeError, ValueError):
+      pass
+  def _quaternions(self):
+    """Quaternions of a PTransformd entry, only the new rows are converted"""
+    capacity = self.values.shape[1]
+    if self._quat is None or self._quat.shape[1] < capacity:
+      quat = np.full((4, capacity), np.nan)
+      if self._quat is not None:
+        quat[:, :self._converted] = self._quat[:, :self._converted]
+      self._quat = quat
+    if self._converted < self.size:
+      self._quat[:, self._converted:self.size] = quaternions_from_matrices(self.values[:9, self._converted:self.size].T).T
+      self._converted = self.size
+    return self._quat[:, :self.size]
+  def columns(self):
+    """Returns the flat (key, column) pairs corresponding to this entry"""
+    if self.type is None:
+      return []
+    if self.type == 'String':
+      return [(self.name, self.values.column(self.size))]
+    if self.type in FIXED_TYPES:
+      suffixes = FIXED_TYPES[self.type][0]
+      rows = list(self.values[:, :self.size])
+      if self.type == 'PTransformd':
+        rows = list(self._quaternions()) + rows[9:]
+      return [("{}_{}".format(self.name, s), r) for s, r in zip(suffixes, rows)]
+    if self.type in DYNAMIC_TYPES:
+      return [("{}_{}".format(self.name, i), r) for i, r in enumerate(self.values[:, :self.size])]
+    return [(self.name, self.values[:self.size])]
+
+class BinLogReader(object):
+  """Decode a binary log written by mc_rtc::Logger, possibly while it is written
+
+  Every call to update() decodes the frames appended since the previous call
+  and sets the entries of a LogData. Entries are views of BinColumn storage so
+  they are never concatenated.
+  """
+  def __init__(self, fpath):
+    # Resolve links (e.g. the -latest.bin link) once so that we keep reading the same log
+    self.fpath = os.path.realpath(fpath)
+    # Start of the next frame, 0 until the magic number has been checked
+    self.offset = 0
+    self.size = 0
+    self.columns = {}
+    self.current = []
+
+  def update(self, data):
+    """Decode the new frames into data, returns the number of decoded frames
+
+    Raises a ValueError if the file is not a binary log
+    """
+    with open(self.fpath, 'rb') as fd:
+      fsize = os.fstat(fd.fileno()).st_size
+      if fsize < len(MAGIC) or fsize <= self.offset:
+        return 0
+      mm = mmap.mmap(fd.fileno(), 0, access = mmap.ACCESS_READ)
+    try:
+      if self.offset == 0:
+        if mm[:len(MAGIC)] != MAGIC:
+          raise ValueError("Invalid magic number")
+        self.offset = len(MAGIC)
+      # Only complete frames are decoded, an incomplete frame is decoded by the next update
+      frames = list(_frames(mm, self.offset))
+      if not len(frames):
+        return 0
+      size = self.size + len(frames)
+      for c in self.columns.values():
+        c.resize(size)
+      for i, (offset, frame_size) in enumerate(frames, self.size):
+        keys, values = _unpack_frame(mm[offset:offset + frame_size])
+        if keys is not None:
+          self.current = []
+          for k in keys:
+            if k not in self.columns:
+              self.columns[k] = BinColumn(k, size)
+            self.current.append(self.columns[k])
+        for j, c in enumerate(self.current):
+          c.set(i, values[2 * j], values[2 * j + 1])
+      self.size = size
+      self.offset = frames[-1][0] + frames[-1][1]
+    finally:
+      mm.close()
+    for c in self.columns.values():
+      for k, v in c.columns():
+        data[k] = v
+    return len(frames)
+
+def read_bin(fpath):
+  """Decode a binary log written by mc_rtc::Logger into a LogData object
+
+  The file is memory-mapped and its frames are decoded in a single pass, see
+  BinLogReader.
+  """
+  data = LogData()
+  if os.path.getsize(fpath) < len(MAGIC):
+    print("Log {} is not a valid mc_rtc binary log (Empty file)".format(fpath))
+    return data
+  try:
+    BinLogReader(fpath).update(data)
+  except ValueError as exc:
+    print("Log {} is not a valid mc_rtc binary log ({})".format(fpath, exc))
+  return data
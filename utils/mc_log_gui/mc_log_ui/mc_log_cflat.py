@@ -0,0 +1,120 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from mc_log_data import LogData
+from mc_log_strings import StringColumnBuilder
+
+# Same as mc_rtc::log::internal::cflat::magic
+MAGIC = b'MCCF'
+
+# Same as mc_rtc::log::internal::cflat::version
+VERSION = 1
+
+class CFlatBlock(object):
+  def __init__(self, offset, size, min_, max_, nan):
+    self.offset = offset
+    self.size = size
+    self.min = min_
+    self.max = max_
+    self.nan = nan
+
+class CFlatColumn(object):
+  """Description of a column in a .cflat file, see mc_rtc::log::CompressedFlatLogWriter"""
+  def __init__(self, key, numeric, rows, min_, max_, nan, blocks):
+    self.key = key
+    self.numeric = numeric
+    self.rows = rows
+    self.min = min_
+    self.max = max_
+    self.nan = nan
+    self.blocks = blocks
+
+def _read_footer(mm):
+  """Returns the number of rows per block and the columns of a mapped .cflat file"""
+  if len(mm) < len(MAGIC) + 8 or mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+    raise ValueError("Invalid magic number")
+  version = struct.unpack_from('=Q', mm, len(MAGIC))[0]
+  if version != VERSION:
+    raise ValueError("Unsupported version {}".format(version))
+  offset = struct.unpack_from('=Q', mm, len(mm) - len(MAGIC) - 8)[0]
+  block_rows, ncolumns = struct.unpack_from('=QQ', mm, offset)
+  offset += 16
+  columns = []
+  for i in range(ncolumns):
+    numeric, key_size = struct.unpack_from('=?Q', mm, offset)
+    offset += 9
+    key = mm[offset:offset + key_size].decode('utf-8')
+    offset += key_size
+    rows, min_, max_, nan, nblocks = struct.unpack_from('=QddQQ', mm, offset)
+    offset += 40
+    blocks = []
+    for j in range(nblocks):
+      blocks.append(CFlatBlock(*struct.unpack_from('=QQddQ', mm, offset)))
+      offset += 40
+    columns.append(CFlatColumn(key, numeric, rows, min_, max_, nan, blocks))
+  return block_rows, columns
+
+def _decode_numeric(buf, rows):
+  # Undo the byte shuffle then the XOR with the previous value
+  shuffled = np.frombuffer(zlib.decompress(buf), np.uint8).reshape(8, rows)
+  xored = np.ascontiguousarray(shuffled.T).view('<u8').reshape(rows)
+  return np.bitwise_xor.accumulate(xored).view('<f8')
+
+def _decode_strings(buf, rows, out):
+  """Append the strings of a block to the StringColumnBuilder out"""
+  raw = zlib.decompress(buf)
+  offset = 0
+  for i in range(rows):
+    size = struct.unpack_from('=Q', raw, offset)[0]
+    offset += 8
+    out.append(raw[offset:offset + size])
+    offset += size
+
+def _column_loader(mm, block_rows, column):
+  def load():
+    parts = []
+    strings = StringColumnBuilder(decode = lambda s: s.decode('utf-8'))
+    for i, b in enumerate(column.blocks):
+      rows = min(block_rows, column.rows - i * block_rows)
+      buf = mm[b.offset:b.offset + b.size]
+      if column.numeric:
+        parts.append(_decode_numeric(buf, rows))
+      else:
+        _decode_strings(buf, rows, strings)
+    if column.numeric:
+      if len(parts):
+        return np.concatenate(parts)
+      return np.array([])
+    return strings.column()
+  return load
+
+def read_cflat(fpath, tmp = False):
+  """Index a compressed flat log written by mc_rtc::log::CompressedFlatLogWriter
+
+  Only the footer is read here, a column is decompressed the first time it is
+  accessed.
+  """
+  data = LogData()
+  with open(fpath, 'rb') as fd:
+    if os.fstat(fd.fileno()).st_size == 0:
+      print("Log {} is not a valid compressed flat log (Empty file)".format(fpath))
+      return data
+    mm = mmap.mmap(fd.fileno(), 0, access = mmap.ACCESS_READ)
+  try:
+    block_rows, columns = _read_footer(mm)
+  except (ValueError, struct.error) as exc:
+    print("Log {} is not a valid compressed flat log ({})".format(fpath, exc))
+    return data
+  for c in columns:
+    data.set_lazy(c.key, _column_loader(mm, block_rows, c), string = not c.numeric)
+  if tmp:
+    os.unlink(fpath)
+  return data
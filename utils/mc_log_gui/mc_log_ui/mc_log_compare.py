@@ -0,0 +1,109 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import os
+import re
+
+import numpy as np
+
+from mc_log_data import LogData
+from mc_log_strings import StringColumn
+
+def resample(t, t_ref, y):
+  """Values of y (sampled at t) at the times t_ref, NaN outside of t"""
+  return np.interp(t_ref, t, np.asarray(y, dtype = np.float64), left = np.nan, right = np.nan)
+
+def resample_strings(t, t_ref, y):
+  """Values of the StringColumn y (sampled at t) at the times t_ref, empty outside of t
+
+  The value at a time is the last value set before that time
+  """
+  idx = np.searchsorted(t, t_ref, 'right') - 1
+  valid = (idx >= 0) & (t_ref <= t[-1])
+  values = list(y.values)
+  if u"" not in values:
+    values.append(u"")
+  ids = np.full(len(t_ref), values.index(u""), dtype = np.int64)
+  ids[valid] = y.ids[np.searchsorted(y.starts, idx[valid], 'right') - 1]
+  if not len(ids):
+    return StringColumn(values, [], [], 0)
+  starts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+  return StringColumn(values, ids[starts], starts, len(ids))
+
+def event_time(log, key, value):
+  """Time of the first sample where the entry key of log is value, None if it never is"""
+  column = log[key]
+  if not isinstance(column, StringColumn) or value not in column.values:
+    return None
+  runs = np.flatnonzero(column.ids == column.values.index(value))
+  if not len(runs):
+    return None
+  return log['t'][column.starts[runs[0]]]
+
+def log_name(fpath, names = ()):
+  """Name of a log in a comparison, names are the names already in use
+
+  '_' separates the levels of the entries so it is not used in names, t and
+  diff are used by compare_logs
+  """
+  name = re.sub('[^A-Za-z0-9-]', '-', os.path.splitext(os.path.basename(fpath))[0])
+  out = name
+  i = 1
+  while out in names or out in ['t', 'diff']:
+    i += 1
+    out = "{}-{}".format(name, i)
+  return out
+
+def compare_logs(logs, names, align = None):
+  """Gather several logs in a LogData to compare them
+
+  Every entry k of the log named n is available as n_k. Logs are aligned on
+  the start of their time entry t or, if align is a (key, value) pair, on the
+  first sample where the entry key has the given value. The time of the first
+  log shifted by the alignment is the t entry of the comparison.
+
+  The entries of the other logs are resampled on that time and the difference
+  with the first log, diff_n_k, is provided for their numeric entries. Nothing
+  is copied or computed until an entry is accessed, the entries of the first
+  log are shared with it.
+  """
+  out = LogData()
+  ref = None
+  for log, name in zip(logs, names):
+    if 't' not in log or not len(log['t']):
+      print("Cannot compare {}: no time entry".format(name))
+      continue
+    t0 = log['t'][0]
+    if align is not None:
+      t0 = event_time(log, *align) if align[0] in log else None
+      if t0 is None:
+        print("Cannot compare {}: {} is never {}".format(name, *align))
+        continue
+    t = np.asarray(log['t'], dtype = np.float64) - t0
+    if ref is None:
+      ref = (log, name, t)
+      out['t'] = t
+    def entry(log, t, k):
+      def load():
+        y = log[k]
+        t_ref = out['t']
+        if len(t) == len(t_ref) and np.array_equal(t, t_ref):
+          return y
+        if isinstance(y, StringColumn):
+          return resample_strings(t, t_ref, y)
+        return resample(t, t_ref, y)
+      return load
+    for k in log.keys():
+      key = "{}_{}".format(name, k)
+      out.set_lazy(key, entry(log, t, k), string = log.is_string(k))
+      if ref[1] != name and k in ref[0]:
+        out.set_derived("diff_{}_{}".format(name, k), _difference(key, "{}_{}".format(ref[1], k)))
+  return out
+
+def _difference(a, b):
+  def compute(data):
+    if isinstance(data[a], StringColumn) or isinstance(data[b], StringColumn):
+      return np.full(len(data['t']), np.nan)
+    return data[a] - data[b]
+  return compute
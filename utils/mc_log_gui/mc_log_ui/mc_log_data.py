@@ -2,18 +2,64 @@
 # Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
 #
 
-from PyQt5 import QtCore, QtGui, QtWidgets
+import numpy as np
 
-class Data(QtCore.QObject):
-  data_updated = QtCore.pyqtSignal()
+from mc_log_strings import StringColumn
+
+def difference(a, b):
+  """Formula of the entry data[a] - data[b]"""
+  return lambda data: data[a] - data[b]
+
+def constant(ref, value):
+  """Formula of an entry that holds value for every row of data[ref]
+
+  The entry is a read-only view of a single value rather than a full array
+  """
+  return lambda data: np.broadcast_to(np.float64(value), np.shape(data[ref]))
+
+class Signal(object):
+  """Minimal replacement of a Qt signal so that LogData does not depend on Qt"""
+  def __init__(self):
+    self.slots = []
+  def connect(self, slot):
+    self.slots.append(slot)
+  def disconnect(self, slot):
+    self.slots.remove(slot)
+  def emit(self, *args):
+    for slot in list(self.slots):
+      slot(*args)
+
+class LogData(object):
   def __init__(self):
-    QtCore.QObject.__init__(self)
+    self.data_updated = Signal()
     self.data = {}
+    self.lazy = {}
+    self.strings = set()
   def notify_update(self):
     self.data_updated.emit()
+  # Register an entry whose content is only computed by loader() the first time it is accessed, string tells if the entry will hold strings
+  def set_lazy(self, key, loader, string = False):
+    self.data[key] = None
+    self.lazy[key] = loader
+    if string:
+      self.strings.add(key)
+    else:
+      self.strings.discard(key)
+  # Register an entry computed by formula(self) the first time it is accessed, registering the entry again drops the computed value
+  def set_derived(self, key, formula):
+    self.set_lazy(key, lambda: formula(self))
+  # True if the entry holds strings, this does not load lazy entries
+  def is_string(self, key):
+    if key in self.lazy:
+      return key in self.strings
+    return isinstance(self.data[key], StringColumn)
   def __getitem__(self, key):
+    if key in self.lazy:
+      self.data[key] = self.lazy.pop(key)()
     return self.data.__getitem__(key)
   def __setitem__(self, key, value):
+    self.lazy.pop(key, None)
+    self.strings.discard(key)
     self.data.__setitem__(key, value)
   def __len__(self):
     return self.data.__len__()
@@ -24,9 +70,9 @@ class Data(QtCore.QObject):
   def __next__(self):
     return self.data.__next__()
   def items(self):
-    return self.data.items()
+    return [ (k, self[k]) for k in self.data.keys() ]
   def values(self):
-    return self.data.values()
+    return [ self[k] for k in self.data.keys() ]
   def keys(self):
     return self.data.keys()
   def __repr__(self):
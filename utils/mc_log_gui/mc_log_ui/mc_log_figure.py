@@ -0,0 +1,1045 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import functools
+import math
+import re
+
+import numpy as np
+
+import matplotlib.cm
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.collections import PolyCollection
+
+from mpl_toolkits.mplot3d import Axes3D
+
+from collections import OrderedDict
+from math import asin, atan2
+
+from mc_log_animation import BlitAnimation
+from mc_log_lod import LODSeries
+from mc_log_strings import StringColumn, string_type
+from mc_log_types import LineStyle, PlotSide, PlotType
+
+def rpyFromMat(E):
+    """Same as mc_rbdyn::rpyFromMat."""
+    roll = atan2(E[1][2], E[2][2]);
+    pitch = -asin(E[0][2]);
+    yaw = atan2(E[0][1], E[0][0]);
+    return [roll, pitch, yaw]
+
+
+def rpyFromQuat(quat):
+    """Same as mc_rbdyn::rpyFromQuat."""
+    import eigen
+    return rpyFromMat(list(eigen.Quaterniond(*quat).toRotationMatrix()))
+
+def rpyFromQuats(qw, qx, qy, qz):
+    """Same as rpyFromQuat for arrays of quaternions, returns the roll, pitch and yaw arrays."""
+    qw, qx, qy, qz = [ np.asarray(q, dtype = np.float64) for q in [qw, qx, qy, qz] ]
+    # Entries of Eigen::Quaterniond::toRotationMatrix() used by rpyFromMat
+    E00 = 1 - 2 * (qy * qy + qz * qz)
+    E01 = 2 * (qx * qy - qz * qw)
+    E02 = 2 * (qx * qz + qy * qw)
+    E12 = 2 * (qy * qz - qx * qw)
+    E22 = 1 - 2 * (qx * qx + qy * qy)
+    roll = np.arctan2(E12, E22)
+    pitch = -np.arcsin(np.clip(E02, -1, 1))
+    yaw = np.arctan2(E01, E00)
+    return [roll, pitch, yaw]
+
+class PlotPolygonAxis(object):
+  def __init__(self, parent, axis):
+    self.figure = parent
+    self._axis = axis.twinx()
+    self._axis.set_zorder(-1)
+    self._axis.set_yticks([])
+    self._axis.set_ylim(0, 1)
+    self._axis.get_yaxis().set_visible(False)
+    self.data = {}
+    self.source = {}
+    self.plots = OrderedDict()
+    self.colors = OrderedDict()
+  def _plot_string(self, x, y, y_label, style, source = None):
+    if y_label in self.plots:
+      return False
+    self.plots[y_label] = []
+    self.data[y_label] = [x, y]
+    self.source[y_label] = source
+    self.colors[y_label] = {}
+    if not isinstance(y, StringColumn):
+      y = StringColumn.from_list(y)
+    # A run spans from its first sample to the first sample of the next run
+    x = np.asarray(x, dtype = np.float64)
+    x0 = x[y.starts]
+    x1 = x[np.minimum(y.ends, len(x) - 1)]
+    x1 = np.where(np.isnan(x1), x[y.ends - 1], x1)
+    # One collection for every value
+    for id_, label in enumerate(y.values):
+      if len(label) == 0:
+        continue
+      runs = y.ids == id_
+      verts = [ [(a, 0), (a, 1), (b, 1), (b, 0)] for a, b in zip(x0[runs], x1[runs]) ]
+      if label not in self.colors[y_label]:
+        self.colors[y_label][label] = self.figure._next_poly_color()
+      color = self.colors[y_label][label]
+      self.plots[y_label].append(self._axis.add_collection(PolyCollection(verts, label = label, facecolors = color, linewidths = 0)))
+    return True
+  def legend(self):
+    if not len(self.plots):
+      self._axis.clear()
+      return
+    xL = 1.0
+    if len(self.figure._right()):
+      xL = 1.025
+    self._axis.legend(bbox_to_anchor=(xL, 0., 0.2, 0.1), mode="expand", borderaxespad=0.5)
+  def remove_plot(self, y):
+    if y not in self.plots:
+      return
+    for plt in self.plots[y]:
+      plt.remove()
+    del self.data[y]
+    del self.source[y]
+    del self.plots[y]
+    del self.colors[y]
+    self.figure.draw()
+  def update_x(self, x):
+    keys = list(self.data.keys())
+    for y_label in keys:
+      y = self.data[y_label][1]
+      source = self.source[y_label]
+      self.remove_plot(y_label)
+      self._plot_string(x, y, y_label, None, source)
+  def refresh(self, x):
+    """Plot the current content of the entries, used when the log grows"""
+    for y_label, source in self.source.items():
+      if source is not None:
+        self.data[y_label][1] = self.figure.data[source]
+    self.update_x(x)
+
+class PlotYAxis(object):
+  def __init__(self, parent, x_axis = None, poly = None, _3D = False):
+    self.figure = parent
+    self._3D = _3D
+    if x_axis is None:
+      self.is_left = True
+      if not _3D:
+        self._axis = parent.fig.add_subplot(111)
+      else:
+        self._axis = parent.fig.gca(projection='3d')
+        self._axis.set_xlabel('X')
+        self._axis.set_ylabel('Y')
+        self._axis.set_zlabel('Z')
+      self._axis.autoscale(enable = True, axis = 'both', tight = False)
+      self._x_axis = self._axis
+    else:
+      self.is_left = False
+      if not _3D:
+        self._axis = x_axis.twinx()
+      else:
+        self._axis = x_axis
+      self._x_axis = x_axis
+    if poly is None and not _3D:
+      self._polyAxis = PlotPolygonAxis(parent, self._axis)
+    else:
+      self._polyAxis = poly
+    self._axis.set_facecolor((1, 1, 1, 0))
+    box = self._axis.get_position()
+    self._axis.autoscale_view(False,True,True)
+    self._axis.format_coord = parent.format_coord
+    self._axis.get_yaxis().set_visible(False)
+    self.grid = LineStyle(linestyle = '--')
+    self.plots = OrderedDict()
+    self._label_fontsize = 10
+    self._z_label_fontsize = 10
+    self._legend_ncol = 3
+    self.source = {}
+    self.data = {}
+    self.filtered = {}
+    # Caches for _filter
+    self._masks = {}
+    self._filtered = {}
+    # Level-of-detail data of the plots drawn decimated
+    self.lod = {}
+    self._lod_callbacks = {}
+    self._animating = False
+    self._animation_i0 = 0
+    self._animation_limits = {}
+
+  def __len__(self):
+    return len(self.plots)
+
+  def _data(self):
+    return self.figure.data
+
+  def _legend_fontsize(self):
+    return self.figure._legend_fontsize
+
+  def _labelpad(self):
+    return self.figure._labelpad
+
+  def _x_label_fontsize(self):
+    return self.figure._x_label_fontsize
+
+  def axis(self):
+    return self._axis
+
+  def drawGrid(self):
+    if len(self.plots):
+      self._axis.grid(color = self.grid.color, linestyle = self.grid.linestyle, linewidth = self.grid.linewidth, visible = self.grid.visible, which = 'both')
+
+  def legend(self):
+    if not len(self.plots):
+      return
+    if self.is_left:
+      loc = 3
+      top_anchor = 1.02
+    else:
+      loc = 2
+      top_anchor = -0.14
+      if len(self.figure.x_label()):
+        top_anchor = -0.175
+    self._axis.legend(bbox_to_anchor=(0., top_anchor, 1., .102), loc=loc, ncol=self._legend_ncol, mode="expand", borderaxespad=0.5, fontsize=self._legend_fontsize())
+    if self._polyAxis is not None:
+      self._polyAxis.legend()
+
+  def legendNCol(self, n = None):
+    if n is None:
+      return self._legend_ncol
+    self._legend_ncol = n
+    self.legend()
+
+  def legendRows(self):
+    return math.ceil(len(self.plots) / float(self._legend_ncol))
+
+  def legendOffset(self, offset, sign):
+    if self.legendRows() > 3:
+      offset = offset + sign * 0.035 * (self.legendRows() - 3)
+    return offset
+
+  def getLimits(self, frame, idx, frame0 = 0):
+    if not len(self):
+      return None
+    if idx in self._animation_limits and frame0 <= self._animation_i0:
+      # Running min/max computed in startAnimation
+      min_ = self._animation_limits[idx][0][frame - 1 - self._animation_i0]
+      max_ = self._animation_limits[idx][1][frame - 1 - self._animation_i0]
+    else:
+      data = [ d[idx][frame0:frame] for d in self.data.values() ]
+      min_ = min([ np.nanmin(d) for d in data ])
+      max_ = max([ np.nanmax(d) for d in data ])
+    if np.isnan(min_) or np.isnan(max_):
+      return None
+    return min_, max_
+
+
+  def setLimits(self, xlim = None, ylim = None, frame = None, zlim = None):
+    if not len(self):
+      return xlim
+    dataLim = self._axis.dataLim.get_points()
+    def setLimit(lim, idx, set_lim):
+      if lim is not None:
+        min_, max_ = lim
+      elif frame is not None:
+        min_, max_ = self.getLimits(frame, idx)
+      else:
+        range_ = dataLim[1][idx] - dataLim[0][idx]
+        min_ = dataLim[0][idx] - range_ * 0.01
+        max_ = dataLim[1][idx] + range_ * 0.01
+      set_lim([min_, max_])
+      return min_, max_
+    setLimit(ylim, 1, self._axis.set_ylim)
+    if self._3D:
+      frame = -1
+      setLimit(zlim, 2, self._axis.set_zlim)
+    return setLimit(xlim, 0, self._x_axis.set_xlim)
+
+  def _label(self, get_label, set_label, l, size):
+    if l is None:
+      l = get_label()
+    set_label(l, fontsize = size, labelpad = self._labelpad())
+
+  def _label_property(self, get_label, set_label, l = None):
+    if l is None:
+      return get_label()
+    set_label(l)
+
+  def _x_label(self, l = None):
+    self._label(self.x_label, self._x_axis.set_xlabel, l, self._x_label_fontsize())
+
+  def x_label(self, l = None):
+    return self._label_property(self._x_axis.get_xlabel, self._x_label, l)
+
+  def _y_label(self, l = None):
+    self._label(self.y_label, self._axis.set_ylabel, l, self._label_fontsize)
+
+  def y_label(self, l = None):
+    return self._label_property(self._axis.get_ylabel, self._y_label, l)
+
+  def _z_label(self, l = None):
+    self._label(self.z_label, self._axis.set_zlabel, l, self._z_label_fontsize)
+
+  def z_label(self, l = None):
+    return self._label_property(self._axis.get_zlabel, self._z_label, l)
+
+  def y_label_fontsize(self, fontsize = None):
+    if fontsize is None:
+      return self._label_fontsize
+    self._label_fontsize = fontsize
+    self._y_label()
+
+  def z_label_fontsize(self, fontsize = None):
+    if fontsize is None:
+      return self._z_label_fontsize
+    self._z_label_fontsize = fontsize
+    self._z_label()
+
+  def animate(self, frame0, frame):
+    for y_label in self.plots.keys():
+      if y_label in self.lod:
+        self.plots[y_label].set_data(*self.lod[y_label].decimate_range(frame0, frame, self._lod_width()))
+      else:
+        self.plots[y_label].set_data(self.data[y_label][0][frame0:frame], self.data[y_label][1][frame0:frame])
+      if self._3D:
+        self.plots[y_label].set_3d_properties(self.data[y_label][2][frame0:frame])
+    return list(self.plots.values())
+
+  def _set_x(self, y_label, x):
+    # For filtered plots (XY/XYZ) x is the time used for filtering
+    if self.data[y_label][-1] is None:
+      self.data[y_label][0] = x
+    else:
+      self.data[y_label][-1] = x
+
+  def update_x(self, x):
+    for y_label in self.data.keys():
+      self._set_x(y_label, x)
+    self._replot()
+
+  def _replot(self):
+    styles = { y_label: self.style(y_label) for y_label in self.data.keys() }
+    self.clear()
+    # The data or the filters might have been replaced
+    self._drop_filtered()
+    for y_label in self.data.keys():
+      x, y, z, filter_ = self.data[y_label]
+      self._plot(x, y, y_label, styles[y_label], filter_ = filter_, z = z, source = self.source[y_label])
+
+  def refresh(self, x):
+    """Plot the current content of the entries, used when the log grows
+
+    Plots that are not made from an entry (e.g. diff plots) are not updated
+    """
+    data = self._data()
+    for y_label, source in self.source.items():
+      if isinstance(source, list):
+        # XY/XYZ plots: [x, y, (z,) t, label] where t is the time used for filtering
+        self.data[y_label][0] = data[source[0]]
+        self.data[y_label][1] = data[source[1]]
+        if len(source) == 5:
+          self.data[y_label][2] = data[source[2]]
+        self.data[y_label][3] = data[source[-2]]
+        continue
+      if source is not None:
+        self.data[y_label][1] = data[source]
+      self._set_x(y_label, x)
+    self._replot()
+
+  def _filter_mask(self, filter_):
+    """Mask of the samples removed by filter_, cached for every filter"""
+    key = id(filter_)
+    if key not in self._masks or self._masks[key][0] is not filter_:
+      self._masks[key] = (filter_, np.isnan(np.asarray(filter_, dtype = np.float64)))
+    return self._masks[key][1]
+
+  def _filter(self, data, filter_):
+    if data is None:
+      return None
+    # Filtered data is cached for every (series, filter) pair
+    key = (id(data), id(filter_))
+    cached = self._filtered.get(key)
+    if cached is not None and cached[0] is data and cached[1] is filter_:
+      return cached[2]
+    mask = self._filter_mask(filter_)
+    out = np.array(data, dtype = np.float64)
+    n = min(len(out), len(mask))
+    out[:n][mask[:n]] = np.nan
+    self._filtered[key] = (data, filter_, out)
+    return out
+
+  def _drop_filtered(self):
+    """Drop the cached filtered data that is not used by any plot"""
+    used = [id(d) for v in self.data.values() for d in v]
+    for key in list(self._filtered.keys()):
+      if key[0] not in used:
+        del self._filtered[key]
+    for key in list(self._masks.keys()):
+      if key not in used:
+        del self._masks[key]
+
+  def _lod_width(self):
+    return self._axis.bbox.width
+
+  def _lod_data(self, y_label):
+    """Data drawn for a plot, decimated for the current view if the plot is large"""
+    if y_label in self.lod:
+      return self.lod[y_label].decimate(self._x_axis.get_xlim(), self._lod_width())
+    return self.data[y_label][0], self.data[y_label][1]
+
+  def _connect_lod(self):
+    # Clearing an axis also drops its callbacks
+    for axis in [self._axis, self._x_axis]:
+      if self._lod_callbacks.get(id(axis)) is not axis.callbacks:
+        axis.callbacks.connect('xlim_changed', self._update_lod)
+        self._lod_callbacks[id(axis)] = axis.callbacks
+
+  def _update_lod(self, axis):
+    if self._animating:
+      return
+    for y_label, lod in self.lod.items():
+      if y_label in self.plots:
+        self.plots[y_label].set_data(*lod.decimate(axis.get_xlim(), self._lod_width()))
+
+  def _plot(self, x, y, y_label, style = None, filter_ = None, z = None, source = None):
+    if type(y[0]) is string_type:
+      if filter_ is not None:
+        return False
+      return self._polyAxis._plot_string(x, y, y_label, style, source)
+    if style is None:
+      return self._plot(x, y, y_label, LineStyle(color = self.figure._next_color()), filter_ = filter_, z = z, source = source)
+    if y_label in self.plots:
+      return False
+    self._axis.get_yaxis().set_visible(True)
+    self.data[y_label] = [x, y, z, filter_]
+    if filter_ is not None:
+      x = self._filter(x, filter_)
+      y = self._filter(y, filter_)
+      z = self._filter(z, filter_)
+      self.filtered[y_label] = [x, y, z]
+    else:
+      self.filtered[y_label] = None
+    self.source[y_label] = source
+    if LODSeries.supports(x, y, z, filter_):
+      self.lod[y_label] = LODSeries(x, y)
+      self._connect_lod()
+      # Draw the whole series first so that the data limits cover it
+      x, y = self.lod[y_label].decimate(None, self._lod_width())
+    else:
+      self.lod.pop(y_label, None)
+    if z is None:
+      self.plots[y_label] = self._axis.plot(x, y, label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+    else:
+      self.plots[y_label] = self._axis.plot(x, y, z, label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+    self.legend()
+    return True
+
+  def startAnimation(self, i0):
+    self._animating = True
+    # Running min/max of the data from i0 so that getLimits does not go through the data on every frame
+    self._animation_i0 = i0
+    self._animation_limits = {}
+    for idx in range(3 if self._3D else 2):
+      data = [ np.asarray(d[idx][i0:], dtype = np.float64) for d in self.data.values() ]
+      if len(data):
+        self._animation_limits[idx] = (np.fmin.accumulate(functools.reduce(np.fmin, data)), np.fmax.accumulate(functools.reduce(np.fmax, data)))
+    for y_label in self.plots.keys():
+      style = self.style(y_label)
+      self.plots[y_label].remove()
+      if not self._3D:
+        self.plots[y_label] = self._axis.plot(self.data[y_label][0][i0], self.data[y_label][1][i0], label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+      else:
+        self.plots[y_label] = self._axis.plot([self.data[y_label][0][i0]], [self.data[y_label][1][i0]], [self.data[y_label][2][0]], label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+
+  def stopAnimation(self):
+    self._animating = False
+    self._animation_limits = {}
+    for y_label in self.plots.keys():
+      style = self.style(y_label)
+      self.plots[y_label].remove()
+      if self.filtered[y_label] is not None:
+        if not self._3D:
+          self.plots[y_label] = self._axis.plot(self.filtered[y_label][0], self.filtered[y_label][1], label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+        else:
+          self.plots[y_label] = self._axis.plot(self.filtered[y_label][0], self.filtered[y_label][1], self.filtered[y_label][2], label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+      else:
+        x, y = self._lod_data(y_label)
+        self.plots[y_label] = self._axis.plot(x, y, label = y_label, color = style.color, linestyle = style.linestyle, linewidth = style.linewidth)[0]
+
+  def add_plot(self, x, y, y_label, style = None):
+    return self._plot(self._data()[x], self._data()[y], y_label, style, source = y)
+
+  def add_plot_xy(self, x, y, y_label, t, style = None):
+    return self._plot(self._data()[x], self._data()[y], y_label, style, filter_ = self._data()[t], source = [x, y, t, y_label])
+
+  def add_plot_xyz(self, x, y, z, y_label, t, style = None):
+    return self._plot(self._data()[x], self._data()[y], y_label, style, filter_ = self._data()[t], z = self._data()[z], source = [x, y, z, t, y_label])
+
+  def add_diff_plot(self, x, y, y_label):
+    dt = self._data()[x][1] - self._data()[x][0]
+    return self._plot(self._data()[x][1:], np.diff(self._data()[y])//dt, y_label)
+
+  def _add_rpy_plot(self, x_label, y, idx):
+    assert (idx >= 0 and idx <= 2),"index must be 0, 1 or 2"
+    rpy_label = ['roll', 'pitch', 'yaw']
+    y_label = "{}_{}".format(y, rpy_label[idx])
+    fmt = ""
+    if "{}_qw".format(y) in self._data().keys():
+      fmt = "q"
+    quat = [ self._data()[k] for k in [ "{}_{}{}".format(y, fmt, ax) for ax in ["w", "x", "y", "z"] ] ]
+    data = self.figure._rpy_data(y, quat)[idx]
+    return self._plot(self._data()[x_label], data, y_label)
+
+  def add_roll_plot(self, x, y):
+    return self._add_rpy_plot(x, y, 0)
+
+  def add_pitch_plot(self, x, y):
+    return self._add_rpy_plot(x, y, 1)
+
+  def add_yaw_plot(self, x, y):
+    return self._add_rpy_plot(x, y, 2)
+
+  def add_rpy_plot(self, x, y):
+    r = self.add_roll_plot(x, y)
+    p = self.add_pitch_plot(x, y)
+    y = self.add_yaw_plot(x, y)
+    return r or p or y
+
+  def remove_plot(self, y):
+    if y not in self.plots:
+      self._polyAxis.remove_plot(y)
+      return
+    self.plots[y].remove()
+    del self.plots[y]
+    del self.data[y]
+    self._drop_filtered()
+    del self.filtered[y]
+    del self.source[y]
+    self.lod.pop(y, None)
+    if len(self.plots):
+      self._axis.relim()
+      self.legend()
+    else:
+      self._axis.get_yaxis().set_visible(False)
+      self._axis.clear()
+
+  def clear(self):
+    self.plots = {}
+    self.lod = {}
+    self._axis.clear()
+
+  # Get or set the style of a given plot
+  def style(self, y, style = None):
+    if y not in self.plots:
+      raise KeyError("No plot named {}".format(y))
+    plt = self.plots[y]
+    if style is None:
+      return LineStyle(plt.get_color(), plt.get_linestyle(), plt.get_linewidth(), label = plt.get_label())
+    plt.set_color(style.color)
+    plt.set_linestyle(style.linestyle)
+    plt.set_linewidth(style.linewidth)
+    if len(style.label):
+      plt.set_label(style.label)
+
+class PlotFigure(object):
+  def __init__(self, type_ = PlotType.TIME, canvas = FigureCanvasAgg):
+    self.fig = Figure(figsize=(5, 4), dpi=100)
+    self.canvas = canvas(self.fig)
+    self.axes = {}
+    self._3D = type_ is PlotType._3D
+    self.axes[PlotSide.LEFT] = PlotYAxis(self, _3D = self._3D)
+    if not self._3D:
+      self.axes[PlotSide.RIGHT] = PlotYAxis(self, self._left().axis(), self._left()._polyAxis, _3D = self._3D)
+    else:
+      self.axes[PlotSide.RIGHT] = None
+    self.animation = None
+
+    self._title_fontsize = 12
+    self._x_label_fontsize = 10
+    self._labelpad = 10
+    self._tick_labelsize = 10
+    self._legend_fontsize = 10
+    self._top_offset = 0.9
+    self._bottom_offset = 0.1
+    if self._3D:
+      self._bottom_offset = 0
+
+    self.data = None
+    self.computed_data = {}
+
+    self.color = 0
+    cm = matplotlib.cm.Set1
+    self.Ncolor = min(cm.N, 12)
+    cm2rgb = (np.array(cm(x)[0:3]) for x in np.linspace(0, 1, self.Ncolor))
+    self.colors = ['#%02x%02x%02x' % tuple((255 * rgb).astype(int)) for rgb in cm2rgb]
+
+    self.polyColor = 0
+    cm = matplotlib.cm.Pastel1
+    cm2rgb = (np.array(cm(x)[0:3] + (0.5,)) for x in np.linspace(0, 1, min(cm.N, 32)))
+    self.polyColors = [rgb for rgb in cm2rgb]
+
+    self.x_data = 't'
+
+  # Helper function to call something on all axes, call expects an axis argument
+  def _axes(self, call):
+    call(self._left())
+    if self._right() is not None:
+      call(self._right())
+
+  # Shortcut to get the polygon axis
+  def _polygons(self):
+    return self._left()._polyAxis
+
+  # Shortcut to the left axis
+  def _left(self):
+    return self.axes[PlotSide.LEFT]
+
+  # Shortcut to the right axis
+  def _right(self):
+    return self.axes[PlotSide.RIGHT]
+
+  def _drawGrid(self):
+    self._axes(lambda axis: axis.drawGrid())
+
+  def _legend(self):
+    self._axes(lambda axis: axis.legend())
+
+  def draw(self, x_limits = None, y1_limits = None, y2_limits = None, frame = None):
+    if self._3D:
+      x_limits = self._left().setLimits(x_limits, y1_limits, frame = frame, zlim = y2_limits)
+    else:
+      x_limits = self._left().setLimits(x_limits, y1_limits, frame = frame)
+      self._right().setLimits(x_limits, y2_limits, frame = frame)
+    self._legend()
+    self._drawGrid()
+    top_offset = self._left().legendOffset(self._top_offset, -1)
+    if self._right() is not None:
+      bottom_offset = self._right().legendOffset(self._bottom_offset, 1)
+    else:
+      bottom_offset = self._bottom_offset
+    left_offset = 0.125
+    right_offset = 0.9
+    if self._left()._polyAxis is not None and len(self._left()._polyAxis.plots):
+      left_offset, right_offset = 0.05, right_offset - (left_offset - 0.05)
+    self.fig.subplots_adjust(left = left_offset, right = right_offset, top = top_offset, bottom = bottom_offset)
+
+  # Show the data in [frame0, frame) and returns the artists that changed
+  def animate(self, frame0, frame):
+    ret = self._left().animate(frame0, frame)
+    if self._right():
+      ret.extend(self._right().animate(frame0, frame))
+    return ret
+
+  # Limits of the data in [frame0, frame) for the x, y1 and y2 (or z) axes
+  def animationLimits(self, frame0, frame):
+    def merge(a, b):
+      if a is None or b is None:
+        return a or b
+      return min(a[0], b[0]), max(a[1], b[1])
+    x = self._left().getLimits(frame, 0, frame0)
+    y1 = self._left().getLimits(frame, 1, frame0)
+    if self._3D:
+      y2 = self._left().getLimits(frame, 2, frame0)
+    else:
+      x = merge(x, self._right().getLimits(frame, 0, frame0))
+      y2 = self._right().getLimits(frame, 1, frame0)
+    return x, y1, y2
+
+  def drawAnimationBackground(self, x_limits, y1_limits, y2_limits):
+    PlotFigure.draw(self, x_limits = x_limits, y1_limits = y1_limits, y2_limits = y2_limits)
+
+  def getFrameRange(self):
+    if self.data is None or len(self.data) == 0:
+      return 0, 0
+    x_data = self.data[self.x_data]
+    i0 = 0
+    while i0 < len(x_data) and np.isnan(x_data[i0]):
+      i0 += 1
+    iN = i0
+    while iN + 1 < len(x_data) and not np.isnan(x_data[iN + 1]):
+      iN += 1
+    assert(iN > i0 and i0 < len(x_data)),"Strange time range"
+    return i0, iN
+
+  def makeAnimation(self, window = 0, x_limits = None, y1_limits = None, y2_limits = None):
+    """Start an animation of the figure along x_data, returns None if there is nothing to animate
+
+    If window is not 0 only the last window seconds of data are shown
+    """
+    i0, iN = self.getFrameRange()
+    if i0 == iN:
+      return None
+    self._axes(lambda a: a.startAnimation(i0))
+    return BlitAnimation(self, self.data[self.x_data], i0, iN, window, (x_limits, y1_limits, y2_limits))
+
+  def exportAnimation(self, fpath, fps = 20, window = 0, x_limits = None, y1_limits = None, y2_limits = None):
+    """Render the animation offscreen and save it to fpath (requires ffmpeg)"""
+    animation = self.makeAnimation(window, x_limits, y1_limits, y2_limits)
+    if animation is None:
+      return
+    try:
+      animation.save(fpath, fps)
+    finally:
+      PlotFigure.stopAnimation(self)
+
+  def stopAnimation(self):
+    self._axes(lambda a: a.stopAnimation())
+
+  def setData(self, data):
+    self.data = data
+    self.computed_data = {}
+
+  # Plot the current content of the data, used when the log grows
+  def refresh(self):
+    x = self.data[self.x_data]
+    self._axes(lambda a: a.refresh(x))
+    if self._polygons():
+      self._polygons().refresh(x)
+
+  # Roll, pitch and yaw of the quaternion entry y, computed once for all the axes
+  def _rpy_data(self, y, quat):
+    key = "{}_rpy".format(y)
+    if key in self.computed_data:
+      source, rpy = self.computed_data[key]
+      if all(a is b for a, b in zip(source, quat)):
+        return rpy
+    rpy = rpyFromQuats(*quat)
+    self.computed_data[key] = (quat, rpy)
+    return rpy
+
+  def setColors(self, colors):
+    self.colors = colors
+    self.Ncolor = len(self.colors)
+
+  def setPolyColors(self, colors):
+    self.polyColors = colors
+
+  def show(self):
+    self.fig.show()
+
+  def top_offset(self, off = None):
+    if off is None:
+      return self._top_offset
+    else:
+      self._top_offset = off
+
+  def bottom_offset(self, off = None):
+    if off is None:
+      return self._bottom_offset
+    else:
+      self._bottom_offset = off
+
+  def title(self, title = None):
+    if title is None:
+      if self.fig._suptitle is None:
+        return ""
+      return self.fig._suptitle.get_text()
+    self.fig.suptitle(title)
+
+  def title_fontsize(self, fontsize = None):
+    if fontsize is None:
+      return self._title_fontsize
+    self._title_fontsize = fontsize
+    self.fig.suptitle(self.title(), fontsize = self._title_fontsize)
+
+  def tick_fontsize(self, size = None):
+    if size is None:
+      return self._tick_labelsize
+    self._tick_labelsize = size
+    self._axes(lambda a: a.axis().tick_params(labelsize = self._tick_labelsize))
+
+  def labelpad(self, pad = None):
+    if pad is None:
+      return self._labelpad
+    self._labelpad = pad
+    self._left()._x_label()
+    self._axes(lambda axis: axis._y_label())
+
+  def _x_label(self, label = None):
+    self._left()._x_label(label)
+
+  def _y1_label(self, label = None):
+    self._left()._y_label(label)
+
+  def _y2_label(self, label = None):
+    self._right()._y_label(label)
+
+  def x_label(self, label = None):
+    return self._left().x_label(label)
+
+  def x_label_fontsize(self, fontsize = None):
+    if fontsize is None:
+      return self._x_label_fontsize
+    self._x_label_fontsize = fontsize
+    self._x_label()
+
+  def y1_label(self, label = None):
+    return self._left().y_label(label)
+
+  def y1_label_fontsize(self, fontsize = None):
+    return self._left().y_label_fontsize(fontsize)
+
+  def y2_label(self, label = None):
+    if self._3D:
+      return self._left().z_label(label)
+    return self._right().y_label(label)
+
+  def y2_label_fontsize(self, fontsize = None):
+    if self._3D:
+      return self._left().z_label_fontsize(fontsize)
+    return self._right().y_label_fontsize(fontsize)
+
+  def _next_poly_color(self):
+    self.polyColor += 1
+    return self.polyColors[ (self.polyColor - 1) % len(self.polyColors) ]
+
+  def _next_color(self):
+    self.color += 1
+    return self.colors[ (self.color - 1) % self.Ncolor ]
+
+  def legend_fontsize(self, size = None):
+    if size is None:
+      return self._legend_fontsize
+    self._legend_fontsize = size
+    self._legend()
+
+  def y1_legend_ncol(self, n = None):
+    return self._left().legendNCol(n)
+
+  def y2_legend_ncol(self, n = None):
+    if self._right() is not None:
+      return self._right().legendNCol(n)
+    else:
+      return 0
+
+  def add_plot_left(self, x, y, y_label, style = None):
+    return self._left().add_plot(x, y, y_label, style)
+
+  def add_plot_left_xy(self, x, y, y_label, style = None):
+    return self._left().add_plot_xy(x, y, y_label, self.x_data, style)
+
+  def add_plot_left_xyz(self, x, y, z, y_label, style = None):
+    return self._left().add_plot_xyz(x, y, z, y_label, self.x_data, style)
+
+  def add_plot_right(self, x, y, y_label, style = None):
+    return self._right().add_plot(x, y, y_label, style)
+
+  def add_plot_right_xy(self, x, y, y_label, style = None):
+    return self._right().add_plot_xy(x, y, y_label, self.x_data, style)
+
+  def add_plot_right_xyz(self, x, y, z, y_label, style = None):
+    return self._right().add_plot_xyz(x, y, z, y_label, self.x_data, style)
+
+  def add_diff_plot_left(self, x, y, y_label):
+    return self._left().add_diff_plot(x, y, y_label)
+
+  def add_diff_plot_right(self, x, y, y_label):
+    return self._right().add_diff_plot(x, y, y_label)
+
+  def add_roll_plot_left(self, x, y):
+    return self._left().add_roll_plot(x, y)
+
+  def add_pitch_plot_left(self, x, y):
+    return self._left().add_pitch_plot(x, y)
+
+  def add_yaw_plot_left(self, x, y):
+    return self._left().add_yaw_plot(x, y)
+
+  def add_roll_plot_right(self, x, y):
+    return self._right().add_roll_plot(x, y)
+
+  def add_pitch_plot_right(self, x, y):
+    return self._right().add_pitch_plot(x, y)
+
+  def add_yaw_plot_right(self, x, y):
+    return self._right().add_yaw_plot(x, y)
+
+  def add_rpy_plot_left(self, x, y):
+    return self._left().add_rpy_plot(x, y)
+
+  def add_rpy_plot_right(self, x, y):
+    return self._right().add_rpy_plot(x, y)
+
+  def _remove_plot(self, SIDE, y_label):
+    self.axes[SIDE].remove_plot(y_label)
+    if len(self._left()) == 0 and self._right() and len(self._right()) == 0:
+      self.color = 0
+
+  def remove_plot_left(self, y_label):
+    self._remove_plot(PlotSide.LEFT, y_label)
+
+  def remove_plot_right(self, y_label):
+    self._remove_plot(PlotSide.RIGHT, y_label)
+
+  def format_coord(self, x, y):
+    if self._right() is not None:
+      display_coord = self.axes[PlotSide.RIGHT].axis().transData.transform((x,y))
+      inv = self.axes[PlotSide.LEFT].axis().transData.inverted()
+      ax_coord = inv.transform(display_coord)
+      if len(self._left()) and len(self._right()):
+        return "x: {:.3f}    y1: {:.3f}    y2: {:.3f}".format(x, ax_coord[1], y)
+      elif len(self._left()):
+        return "x: {:.3f}    y1: {:.3f}".format(x, ax_coord[1])
+      elif len(self._right()):
+        return "x: {:.3f}    y2: {:.3f}".format(x, y)
+      else:
+        return "x: {:.3f}".format(x)
+    else:
+      axis = self.axes[PlotSide.LEFT].axis()
+      return type(axis).format_coord(axis, x, y)
+
+  def clear_all(self):
+    self.color = 0
+    self._axes(lambda a: a.clear())
+
+  def style_left(self, y, styleIn = None):
+    return self._left().style(y, styleIn)
+
+  def style_right(self, y, styleIn = None):
+    return self._right().style(y, styleIn)
+
+class SpecialPlot(object):
+  def __init__(self, name, figure, idx, special_id):
+    self.figure = figure
+    self.idx = idx
+    self.name = name
+    self.id = special_id
+    self.added = []
+    if idx == 0:
+      self.remove = self.figure.remove_plot_left
+    else:
+      self.remove = self.figure.remove_plot_right
+    if special_id == "diff":
+      self.__plot = self.__add_diff
+    elif special_id == "rpy":
+      self.__plot = self.__add_rpy
+    elif special_id == "r":
+      self.__plot = self.__add_roll
+    elif special_id == "p":
+      self.__plot = self.__add_pitch
+    elif special_id == "y":
+      self.__plot = self.__add_yaw
+    else:
+      print("Cannot handle this special plot: {}".format(special_id))
+    self.plot()
+  def __add_diff(self):
+    added = filter(lambda x: re.match("{}($|_.*$)".format(self.name), x) is not None, self.figure.data.keys())
+    if self.idx == 0:
+      add_fn = self.figure.add_diff_plot_left
+    else:
+      add_fn = self.figure.add_diff_plot_right
+    for a in added:
+      label = "{}_diff".format(a)
+      if add_fn(self.figure.x_data, a, label):
+        self.added.append(label)
+  def __add_rpy(self):
+    if self.idx == 0:
+      add_fn = self.figure.add_rpy_plot_left
+    else:
+      add_fn = self.figure.add_rpy_plot_right
+    if add_fn(self.figure.x_data, self.name):
+      self.added = [ "{}_{}".format(self.name, s) for s in ["roll", "pitch", "yaw"] ]
+  def __add_roll(self):
+    if self.idx == 0:
+      add_fn = self.figure.add_roll_plot_left
+    else:
+      add_fn = self.figure.add_roll_plot_right
+    if add_fn(self.figure.x_data, self.name):
+      self.added = [ "{}_{}".format(self.name, "roll") ]
+  def __add_pitch(self):
+    if self.idx == 0:
+      add_fn = self.figure.add_pitch_plot_left
+    else:
+      add_fn = self.figure.add_pitch_plot_right
+    if add_fn(self.figure.x_data, self.name):
+      self.added = [ "{}_{}".format(self.name, "pitch") ]
+  def __add_yaw(self):
+    if self.idx == 0:
+      add_fn = self.figure.add_yaw_plot_left
+    else:
+      add_fn = self.figure.add_yaw_plot_right
+    if add_fn(self.figure.x_data, self.name):
+      self.added = [ "{}_{}".format(self.name, "yaw") ]
+  def plot(self):
+    self.__plot()
+
+def MakeFigure(type_, data, x, y1, y2, y1_label = None, y2_label = None, figure = None):
+  """Plot the given entries of data in figure (a new PlotFigure by default)"""
+  def labels(yN):
+    if type_ is PlotType.TIME:
+      return yN
+    elif type_ is PlotType.XY:
+      return [l for x,y,l in yN]
+    else:
+      return [l for x,y,z,l in yN]
+  if y1_label is None:
+    return MakeFigure(type_, data, x, y1, y2, labels(y1), y2_label, figure)
+  if y2_label is None:
+    return MakeFigure(type_, data, x, y1, y2, y1_label, labels(y2), figure)
+  if figure is None:
+    return MakeFigure(type_, data, x, y1, y2, y1_label, y2_label, PlotFigure())
+  figure.setData(data)
+  if type_ is PlotType.TIME:
+    for y,yl in zip(y1, y1_label):
+      figure.add_plot_left(x, y, yl)
+    for y,yl in zip(y2, y2_label):
+      figure.add_plot_right(x, y, yl)
+  elif type_ is PlotType.XY:
+    for x,y,label in y1:
+      figure.add_plot_left_xy(x, y, label)
+    for x,y,label in y2:
+      figure.add_plot_right_xy(x, y, label)
+  else:
+    for x,y,z,label in y1:
+      figure.add_plot_left_xyz(x, y, z, label)
+    for x,y,z,label in y2:
+      figure.add_plot_right_xyz(x, y, z, label)
+  return figure
+
+def UserFigure(data, p, figure = None, special = None):
+  """Plot the UserPlot p in figure (a new PlotFigure by default)
+
+  special(y, idx, id) adds the special plots (diff, rpy...) of p, by default
+  they are added by a SpecialPlot
+  """
+  if figure is None:
+    return UserFigure(data, p, MakeFigure(p.type, data, p.x, p.y1, p.y2), special)
+  if special is None:
+    return UserFigure(data, p, figure, lambda y, idx, id_: SpecialPlot(y, figure, idx, id_))
+  def set_label(label_fn, label_size_fn, label):
+    if len(label.text):
+      label_fn(label.text)
+      label_size_fn(label.fontsize)
+  set_label(figure.title, figure.title_fontsize, p.graph_labels.title)
+  set_label(figure.x_label, figure.x_label_fontsize, p.graph_labels.x_label)
+  set_label(figure.y1_label, figure.y1_label_fontsize, p.graph_labels.y1_label)
+  set_label(figure.y2_label, figure.y2_label_fontsize, p.graph_labels.y2_label)
+  def handle_yd(yds, idx):
+    for yd in yds:
+      match = re.match("(.*)_(.*)$", yd)
+      if match is None:
+        special(yd, idx, "diff")
+      elif match.group(2) in ["rpy", "r", "p", "y"]:
+        special(match.group(1), idx, match.group(2))
+      else:
+        special(match.group(1), idx, "diff")
+  handle_yd(p.y1d, 0)
+  handle_yd(p.y2d, 1)
+  if not isinstance(p.grid1, LineStyle):
+    figure._left().grid = LineStyle(**p.grid1)
+  else:
+    figure._left().grid = p.grid1
+  if figure._right() is not None:
+    if not isinstance(p.grid2, LineStyle):
+      figure._right().grid = LineStyle(**p.grid2)
+    else:
+      figure._right().grid = p.grid2
+  for y,s in p.style.iteritems():
+    figure.style_left(y, s)
+  for y,s in p.style2.iteritems():
+    figure.style_right(y, s)
+  for param, value in p.extra.iteritems():
+    getattr(figure, param)(value)
+  return figure
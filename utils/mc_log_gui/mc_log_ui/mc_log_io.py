@@ -0,0 +1,164 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import collections
+import csv
+import ctypes
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from mc_log_bin import read_bin
+from mc_log_cflat import read_cflat
+from mc_log_data import LogData, constant, difference
+from mc_log_strings import StringColumn, StringColumnBuilder, string_type
+from mc_log_types import LineStyle, TextWithFontSize, GraphLabels, PlotType
+
+UserPlot = collections.namedtuple('UserPlot', ['title', 'x', 'y1', 'y1d', 'y2', 'y2d', 'grid1', 'grid2', 'style', 'style2', 'graph_labels', 'extra', 'type'])
+
+def safe_float(v):
+    if len(v):
+        return float(v)
+    else:
+        return None
+
+def read_flat(f, tmp = False):
+    """Index a .flat file and map its columns lazily
+
+    The file is memory-mapped and only the entries' headers are read here.
+    Numeric columns are read-only views on the mapped file and string columns
+    are decoded into a StringColumn the first time they are accessed.
+    """
+    def read_size(mm, offset):
+        return struct.unpack_from('=Q', mm, offset)[0], offset + 8
+    def read_bool(mm, offset):
+        return struct.unpack_from('=?', mm, offset)[0], offset + 1
+    def read_string(mm, offset, size):
+        return mm[offset:offset + size].decode('ascii'), offset + size
+    def array_loader(mm, offset, size):
+        return lambda: np.frombuffer(mm, np.double, size, offset)
+    def string_array_loader(mm, offset, size):
+        def load():
+            out = StringColumnBuilder(decode = lambda s: s.decode('ascii'))
+            off = offset
+            for i in range(size):
+                s, off = read_size(mm, off)
+                out.append(mm[off:off + s])
+                off += s
+            return out.column()
+        return load
+    data = LogData()
+    with open(f, 'rb') as fd:
+        if os.fstat(fd.fileno()).st_size == 0:
+            return data
+        mm = mmap.mmap(fd.fileno(), 0, access = mmap.ACCESS_READ)
+    nrEntries, offset = read_size(mm, 0)
+    for i in range(nrEntries):
+        is_numeric, offset = read_bool(mm, offset)
+        key_size, offset = read_size(mm, offset)
+        key, offset = read_string(mm, offset, key_size)
+        size, offset = read_size(mm, offset)
+        if is_numeric:
+            data.set_lazy(key, array_loader(mm, offset, size))
+            offset += size * ctypes.sizeof(ctypes.c_double)
+        else:
+            data.set_lazy(key, string_array_loader(mm, offset, size), string = True)
+            for j in range(size):
+                str_size, offset = read_size(mm, offset)
+                offset += str_size
+    if tmp:
+      os.unlink(f)
+    return data
+
+def read_csv(fpath, tmp = False):
+  data = LogData()
+  string_entries = {}
+  with open(fpath) as fd:
+    reader = csv.DictReader(fd, delimiter=';')
+    for k in reader.fieldnames:
+      if not(len(k)):
+        continue
+      data[k] = []
+    for row in reader:
+      for k in reader.fieldnames:
+        if not(len(k)):
+          continue
+        try:
+          data[k].append(safe_float(row[k]))
+        except ValueError:
+          data[k].append(row[k].decode('ascii'))
+  for k in data:
+    if type(data[k][0]) is string_type:
+      data[k] = StringColumn.from_list(data[k])
+    else:
+      data[k] = np.array(data[k])
+  if tmp:
+    os.unlink(fpath)
+  return data
+
+def read_log(fpath, tmp = False):
+  if fpath.endswith('.bin'):
+    return read_bin(fpath)
+  elif fpath.endswith('.flat'):
+    return read_flat(fpath, tmp)
+  elif fpath.endswith('.cflat'):
+    return read_cflat(fpath, tmp)
+  else:
+    return read_csv(fpath, tmp)
+
+def load_UserPlots(fpath):
+    if not os.path.exists(fpath):
+      return []
+    userPlotList = []
+    with open(fpath) as f:
+      userPlotList = [UserPlot(*x) for x in json.load(f)]
+      for i,plt in enumerate(userPlotList):
+        for y in plt.style:
+          plt.style[y] = LineStyle(**plt.style[y])
+        for y in plt.style2:
+          plt.style2[y] = LineStyle(**plt.style2[y])
+        if not isinstance(plt.graph_labels, GraphLabels):
+          for key, value in plt.graph_labels.items():
+            plt.graph_labels[key] = TextWithFontSize(**plt.graph_labels[key])
+          userPlotList[i] = plt._replace(graph_labels = GraphLabels(**plt.graph_labels))
+          plt = userPlotList[i]
+        userPlotList[i] = plt._replace(type = PlotType(plt.type))
+    return userPlotList
+
+def add_derived_entries(data):
+  """Register the entries computed from a log (joint errors, limits...)
+
+  They are only computed when they are accessed, the limits are set to 0
+  until MCLogTab.setRobotModule provides the robot's limits
+  """
+  i = 0
+  while "qIn_{}".format(i) in data and "qOut_{}".format(i) in data:
+    data.set_derived("error_q_{}".format(i), difference("qOut_{}".format(i), "qIn_{}".format(i)))
+    for q in ["qIn", "qOut"]:
+      for bound in ["lower", "upper"]:
+        data.set_derived("{}_limits_{}_{}".format(q, bound, i), constant("{}_{}".format(q, i), 0))
+    i += 1
+  for tau in ["tauIn", "tauOut"]:
+    i = 0
+    while "{}_{}".format(tau, i) in data:
+      for bound in ["lower", "upper"]:
+        data.set_derived("{}_limits_{}_{}".format(tau, bound, i), constant("{}_{}".format(tau, i), 0))
+      i += 1
+  if 'perf_SolverBuildAndSolve' in data and 'perf_SolverSolve' in data:
+    data.set_derived('perf_SolverBuild', difference('perf_SolverBuildAndSolve', 'perf_SolverSolve'))
+
+def set_joint_limits(data, rm):
+  """Set the limits entries registered by add_derived_entries from the bounds of the RobotModule rm"""
+  bounds = rm.bounds()
+  # (lower, upper) indices in rm.bounds()
+  limits = { "qIn": (0, 1), "qOut": (0, 1), "tauIn": (4, 5), "tauOut": (4, 5) }
+  for i, jn in enumerate(rm.ref_joint_order()):
+    for prefix, (lower, upper) in limits.items():
+      ref = "{}_{}".format(prefix, i)
+      if "{}_limits_lower_{}".format(prefix, i) in data:
+        data.set_derived("{}_limits_lower_{}".format(prefix, i), constant(ref, bounds[lower][jn][0]))
+        data.set_derived("{}_limits_upper_{}".format(prefix, i), constant(ref, bounds[upper][jn][0]))
@@ -0,0 +1,249 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+from PyQt5 import QtCore
+
+import bisect
+import weakref
+
+# Trees and indexes built for a given data set, see _cached
+_trees = weakref.WeakKeyDictionary()
+
+# Top-level entries whose numbered children are named after the robot's joints
+JOINT_ENTRIES = ("q", "alpha", "error", "tau")
+
+def _cached(data, name, build):
+  """Returns build(keys of data), the result is kept until the keys change"""
+  keys = frozenset(data.keys())
+  cache = _trees.setdefault(data, {})
+  if name not in cache or cache[name][0] != keys:
+    cache[name] = (keys, build(keys))
+  return cache[name][1]
+
+class KeyIndex(object):
+  """Search index over log keys
+
+  Keys are kept sorted for prefix queries and concatenated (one per line) for
+  substring queries that are then done by str.find. The last search is kept
+  so that refining it only goes through its results.
+  """
+  def __init__(self, keys):
+    self.keys = sorted(keys)
+    self._blob = '\n'.join(self.keys)
+    self._lower = self._blob.lower()
+    self._offsets = []
+    offset = 0
+    for k in self.keys:
+      self._offsets.append(offset)
+      offset += len(k) + 1
+    self._last = None
+
+  @staticmethod
+  def get(data):
+    """Returns the index of the keys of data, shared like KeyTree.get"""
+    return _cached(data, KeyIndex, KeyIndex)
+
+  def with_prefix(self, prefix):
+    """Keys that start with prefix"""
+    i = bisect.bisect_left(self.keys, prefix)
+    out = []
+    while i < len(self.keys) and self.keys[i].startswith(prefix):
+      out.append(self.keys[i])
+      i += 1
+    return out
+
+  def has_prefix(self, prefix):
+    i = bisect.bisect_left(self.keys, prefix)
+    return i < len(self.keys) and self.keys[i].startswith(prefix)
+
+  def contains(self, text, case_sensitive = True):
+    """Keys that contain text"""
+    if not len(text):
+      return list(self.keys)
+    blob = self._blob
+    if not case_sensitive:
+      blob = self._lower
+      text = text.lower()
+    out = []
+    i = blob.find(text)
+    while i != -1:
+      k = bisect.bisect_right(self._offsets, i) - 1
+      out.append(self.keys[k])
+      # Continue after the current key
+      i = blob.find(text, self._offsets[k] + len(self.keys[k]) + 1)
+    return out
+
+  def search(self, query):
+    """Keys that contain every word of query (case insensitive)"""
+    terms = query.lower().split()
+    if not len(terms):
+      return list(self.keys)
+    if self._last is not None and all([any([t.find(p) != -1 for t in terms]) for p in self._last[0]]):
+      # Every previous term is part of a new term so the results are a subset of the previous ones
+      keys = [ k for k in self._last[1] if all([k.lower().find(t) != -1 for t in terms]) ]
+    else:
+      keys = self.contains(max(terms, key = len), False)
+      keys = [ k for k in keys if all([k.lower().find(t) != -1 for t in terms]) ]
+    self._last = (terms, keys)
+    return keys
+
+class KeyTree(object):
+  """Prefix tree of log keys split on '_'
+
+  A node without data and with a single child is merged with its child, e.g.
+  the keys a_b_c and a_b_d give the nodes a_b, a_b_c and a_b_d. Every node is
+  also indexed by its full key in the root's nodes.
+  """
+  def __init__(self, name = None, parent = None):
+    self.name = name
+    self.parent = parent
+    if parent is not None and parent.dataName is not None:
+      self.dataName = parent.dataName + "_" + name
+    else:
+      self.dataName = name
+    self.hasData = False
+    self.leafs = []
+    self.row = 0
+    self._leafs = {}
+    self.nodes = {}
+
+  @staticmethod
+  def build(keys):
+    root = KeyTree()
+    for k in sorted(keys):
+      node = root
+      for name in k.split('_'):
+        leaf = node._leafs.get(name)
+        if leaf is None:
+          leaf = node._leafs[name] = KeyTree(name, node)
+          node.leafs.append(leaf)
+        node = leaf
+      node.hasData = True
+    for l in root.leafs:
+      l._simplify()
+    root._index(root.nodes)
+    return root
+
+  @staticmethod
+  def get(data, filter_ = None):
+    """Returns the tree of the keys of data (that pass filter_(data, key))
+
+    Trees are shared between all the users of the same data and only rebuilt
+    when its keys change.
+    """
+    if filter_ is None:
+      return _cached(data, KeyTree, KeyTree.build)
+    return _cached(data, (KeyTree, filter_), lambda keys: KeyTree.build([k for k in keys if filter_(data, k)]))
+
+  def _simplify(self):
+    while len(self.leafs) == 1 and not(self.hasData):
+      leaf = self.leafs[0]
+      self.name = self.name + '_' + leaf.name
+      self.dataName = leaf.dataName
+      self.hasData = leaf.hasData
+      self.leafs = leaf.leafs
+      for l in self.leafs:
+        l.parent = self
+    self._leafs = {}
+    if all([l.name.isdigit() for l in self.leafs]):
+      self.leafs.sort(key = lambda x: int(x.name))
+    for l in self.leafs:
+      l._simplify()
+
+  def _index(self, nodes):
+    for i, l in enumerate(self.leafs):
+      l.row = i
+      nodes[l.dataName] = l
+      l._index(nodes)
+
+  def find(self, key):
+    """Returns the node of a given key or None"""
+    return self.nodes.get(key, None)
+
+  def keys(self):
+    """Keys with data in this node's subtree"""
+    if self.hasData:
+      yield self.dataName
+    for l in self.leafs:
+      for k in l.keys():
+        yield k
+
+  def top(self):
+    """Top-level node this node belongs to"""
+    node = self
+    while node.parent is not None and node.parent.parent is not None:
+      node = node.parent
+    return node
+
+class KeyTreeModel(QtCore.QAbstractItemModel):
+  """Read-only model of a KeyTree
+
+  The view only queries the children of the nodes it shows so the cost of a
+  model does not depend on the size of the tree.
+  """
+  def __init__(self, tree, parent = None):
+    super(KeyTreeModel, self).__init__(parent)
+    self.tree = tree
+    self.joints = []
+
+  def node(self, index):
+    if index.isValid():
+      return index.internalPointer()
+    return self.tree
+
+  def indexOf(self, node):
+    return self.createIndex(node.row, 0, node)
+
+  def index(self, row, column, parent = QtCore.QModelIndex()):
+    node = self.node(parent)
+    if column != 0 or row < 0 or row >= len(node.leafs):
+      return QtCore.QModelIndex()
+    return self.createIndex(row, 0, node.leafs[row])
+
+  def parent(self, index):
+    if not index.isValid():
+      return QtCore.QModelIndex()
+    node = index.internalPointer().parent
+    if node is None or node is self.tree:
+      return QtCore.QModelIndex()
+    return self.indexOf(node)
+
+  def rowCount(self, parent = QtCore.QModelIndex()):
+    if parent.column() > 0:
+      return 0
+    return len(self.node(parent).leafs)
+
+  def columnCount(self, parent = QtCore.QModelIndex()):
+    return 1
+
+  def hasChildren(self, parent = QtCore.QModelIndex()):
+    return len(self.node(parent).leafs) != 0
+
+  def flags(self, index):
+    if not index.isValid():
+      return QtCore.Qt.NoItemFlags
+    return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+  def data(self, index, role = QtCore.Qt.DisplayRole):
+    if not index.isValid() or role != QtCore.Qt.DisplayRole:
+      return None
+    return self.displayText(index.internalPointer())
+
+  def headerData(self, section, orientation, role = QtCore.Qt.DisplayRole):
+    if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole and section == 0:
+      return "Data"
+    return None
+
+  def displayText(self, node):
+    """Text shown for a node, numbered joint entries show the joint's name"""
+    if len(self.joints) and not len(node.leafs) and node.name.isdigit() and node.top().name.startswith(JOINT_ENTRIES):
+      jIndex = int(node.name)
+      if jIndex < len(self.joints):
+        return self.joints[jIndex]
+    return node.name
+
+  def setJointNames(self, joints):
+    self.layoutAboutToBeChanged.emit()
+    self.joints = joints
+    self.layoutChanged.emit()
@@ -0,0 +1,103 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import numpy as np
+
+# Series with fewer points than this are always drawn as-is
+LOD_MIN_SIZE = 20000
+
+# Minimum number of buckets used to draw the visible part of a series
+LOD_MIN_BUCKETS = 1024
+
+def _merge(y, imin, imax):
+  """Merge pairs of consecutive buckets given by the indices of their min/max"""
+  if len(imin) % 2:
+    imin = np.append(imin, imin[-1])
+    imax = np.append(imax, imax[-1])
+  # NaN samples (gaps in the log) are never selected over a number
+  with np.errstate(invalid = 'ignore'):
+    a, b = imin[0::2], imin[1::2]
+    ya, yb = y[a], y[b]
+    imin = np.where((ya <= yb) | np.isnan(yb), a, b)
+    a, b = imax[0::2], imax[1::2]
+    ya, yb = y[a], y[b]
+    imax = np.where((ya >= yb) | np.isnan(yb), a, b)
+  return imin, imax
+
+class LODSeries(object):
+  """Multi-resolution view of a (x, y) series sorted along x
+
+  Level k of the pyramid holds the indices of the minimum and maximum of y in
+  consecutive buckets of 2**k samples. Levels are built when they are first
+  needed and kept for the lifetime of the series.
+
+  decimate() returns at most a few points per pixel for the visible range
+  while keeping every local extremum so that the drawing is the same as the
+  full-resolution one.
+  """
+  def __init__(self, x, y):
+    self.x = np.asarray(x)
+    self.y = np.asarray(y, dtype = np.float64)
+    idx = np.arange(len(self.y))
+    self.levels = [(idx, idx)]
+    self._last = None
+
+  @staticmethod
+  def supports(x, y, z = None, filter_ = None):
+    """True if a plot of this data benefits from a LODSeries"""
+    if z is not None or filter_ is not None or len(y) < LOD_MIN_SIZE:
+      return False
+    x = np.asarray(x)
+    if x.dtype.kind != 'f' or len(x) != len(y):
+      return False
+    # NaN fail the comparison so x must be sorted and finite
+    return bool(np.all(x[1:] >= x[:-1]))
+
+  def _level(self, k):
+    while len(self.levels) <= k and len(self.levels[-1][0]) > 1:
+      self.levels.append(_merge(self.y, *self.levels[-1]))
+    return self.levels[min(k, len(self.levels) - 1)]
+
+  def _indices(self, i0, i1, buckets):
+    """Indices of the points that represent [i0, i1) with about buckets buckets"""
+    k = int(np.ceil(np.log2(max(float(i1 - i0) / buckets, 1.0))))
+    if k == 0:
+      return np.arange(i0, i1)
+    imin, imax = self._level(k)
+    j0 = i0 >> k
+    j1 = min(((i1 - 1) >> k) + 1, len(imin))
+    idx = np.sort(np.stack([imin[j0:j1], imax[j0:j1]], axis = 1), axis = 1).ravel()
+    return np.concatenate([[i0], idx[(idx >= i0) & (idx < i1)], [i1 - 1]])
+
+  def decimate_range(self, i0, i1, width = 0):
+    """Returns the x and y data to draw the samples in [i0, i1) with width pixels"""
+    idx = self._indices(i0, i1, max(int(width), LOD_MIN_BUCKETS))
+    return self.x[idx], self.y[idx]
+
+  def decimate(self, xlim = None, width = 0):
+    """Returns the x and y data to draw the series for the given view
+
+    xlim is the visible x range and width the number of pixels of the view.
+    The visible part is drawn with a few points per pixel, the rest of the
+    series at a coarser resolution that keeps its extrema so that the data
+    limits of the plot do not depend on the view.
+    """
+    n = len(self.y)
+    buckets = max(int(width), LOD_MIN_BUCKETS)
+    if xlim is None:
+      xlim = (self.x[0], self.x[-1])
+    key = (xlim[0], xlim[1], buckets)
+    if self._last is not None and self._last[0] == key:
+      return self._last[1]
+    i0 = max(int(np.searchsorted(self.x, xlim[0], 'left')) - 1, 0)
+    i1 = min(int(np.searchsorted(self.x, xlim[1], 'right')) + 1, n)
+    if i1 <= i0:
+      i0, i1 = 0, n
+    idx = self._indices(i0, i1, buckets)
+    if i0 != 0 or i1 != n:
+      coarse = self._indices(0, n, buckets)
+      idx = np.concatenate([coarse[coarse < i0], idx, coarse[coarse >= i1]])
+    out = (self.x[idx], self.y[idx])
+    self._last = (key, out)
+    return out
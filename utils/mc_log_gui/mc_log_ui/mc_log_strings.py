@@ -0,0 +1,100 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import numpy as np
+
+try:
+  string_type = unicode
+except NameError:
+  # Python 3
+  string_type = str
+
+class StringColumn(object):
+  """Run-length encoded column of strings
+
+  values holds the distinct strings of the column, run i covers the rows
+  [starts[i], starts[i + 1]) and its value is values[ids[i]].
+
+  The column can be used as a read-only list of strings.
+  """
+  def __init__(self, values, ids, starts, size):
+    self.values = values
+    self.ids = np.asarray(ids, dtype = np.int64)
+    self.starts = np.asarray(starts, dtype = np.int64)
+    self.size = size
+
+  @staticmethod
+  def from_list(data):
+    builder = StringColumnBuilder()
+    for s in data:
+      builder.append(s)
+    return builder.column()
+
+  @property
+  def ends(self):
+    """End (exclusive) of every run"""
+    return np.append(self.starts[1:], self.size)
+
+  @property
+  def lengths(self):
+    return self.ends - self.starts
+
+  def __len__(self):
+    return self.size
+
+  def __getitem__(self, i):
+    if isinstance(i, slice):
+      return [ self[j] for j in range(*i.indices(self.size)) ]
+    if i < 0:
+      i += self.size
+    if i < 0 or i >= self.size:
+      raise IndexError("StringColumn index out of range")
+    return self.values[self.ids[np.searchsorted(self.starts, i, 'right') - 1]]
+
+  def __iter__(self):
+    for id_, n in zip(self.ids, self.lengths):
+      value = self.values[id_]
+      for i in range(n):
+        yield value
+
+  def __repr__(self):
+    return "StringColumn({} rows, {} runs, {} values)".format(self.size, len(self.ids), len(self.values))
+
+class StringColumnBuilder(object):
+  """Build a StringColumn from rows given in increasing order
+
+  If decode is provided, rows are compared in their raw form and only decoded
+  once for every distinct value. Rows that are skipped hold empty.
+  """
+  def __init__(self, decode = None, empty = u""):
+    self.decode = decode
+    self.empty = empty
+    self.values = []
+    self.ids = []
+    self.starts = []
+    self.size = 0
+    self._ids = {}
+    self._last = None
+
+  def append(self, value, count = 1):
+    if count <= 0:
+      return
+    if not len(self.ids) or value != self._last:
+      id_ = self._ids.get(value)
+      if id_ is None:
+        id_ = self._ids[value] = len(self.values)
+        self.values.append(self.decode(value) if self.decode else value)
+      self.ids.append(id_)
+      self.starts.append(self.size)
+      self._last = value
+    self.size += count
+
+  def set(self, i, value):
+    self.append(self.empty, i - self.size)
+    self.append(value)
+
+  def column(self, size = None):
+    if size is not None:
+      self.append(self.empty, size - self.size)
+    return StringColumn(self.values, self.ids, self.starts, self.size)
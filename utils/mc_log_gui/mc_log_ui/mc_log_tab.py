@@ -8,7 +8,10 @@ from PyQt5 import QtCore, QtWidgets
 
 import ui
 
-from mc_log_plotcanvas import PlotFigure, PlotCanvasWithToolbar
+from mc_log_keytree import KeyIndex, KeyTree, KeyTreeModel
+from mc_log_figure import MakeFigure, SpecialPlot, UserFigure
+from mc_log_io import set_joint_limits
+from mc_log_plotcanvas import PlotCanvasWithToolbar
 from mc_log_types import LineStyle, PlotType
 from mc_log_utils import InitDialogWithOkCancel
 
@@ -17,96 +20,9 @@ from functools import partial
 import copy
 import re
 
-class MCLogTreeWidgetItem(QtWidgets.QTreeWidgetItem):
-  def __init__(self, parent, displayText, actualText, hasData):
-    super(MCLogTreeWidgetItem, self).__init__(parent, [displayText])
-    self._displayText = displayText
-    self.originalText = displayText
-    self.actualText = actualText
-    self.hasData = hasData
-  @property
-  def displayText(self):
-    return self._displayText
-  @displayText.setter
-  def displayText(self, value):
-    self._displayText = value
-    self.setText(0, self._displayText)
-
-class TreeView(object):
-  def __init__(self, name = None, parent = None, dataName = None):
-    self.name = name
-    if dataName is None:
-      if parent is not None and parent.dataName is not None:
-        self.dataName = parent.dataName + "_" + self.name
-      else:
-        self.dataName = self.name
-    else:
-      self.dataName = dataName
-    self.hasData = False
-    self.leafs = []
-    self.parent = parent
-    self.modelIdxs = []
-    self.widgets = []
-  def leaf(self, name):
-    for l in self.leafs:
-      if l.name == name:
-        return l
-    self.leafs.append(TreeView(name, self))
-    return self.leafs[-1]
-  def add(self, key):
-    if len(key) == 0:
-      self.hasData = True
-      return
-    self.leaf(key[0]).add(key[1:])
-  def simplify(self):
-    while len(self.leafs) == 1 and not(self.hasData):
-      self.name = self.name + '_' + self.leafs[0].name
-      self.dataName = self.leafs[0].dataName
-      self.hasData = self.leafs[0].hasData
-      self.leafs = self.leafs[0].leafs
-      for l in self.leafs:
-        l.parent = self
-    for l in self.leafs:
-      l.simplify()
-  def update_y_selector(self, ySelector, parent, baseModelIdx = None):
-    row = 0
-    needExpand = False
-    if all([l.name.isdigit() for l in self.leafs]):
-      self.leafs.sort(key = lambda x: x.name)
-    for l in self.leafs:
-      l.widgets.append(MCLogTreeWidgetItem(parent, l.name, l.dataName, l.hasData))
-      if baseModelIdx is not None:
-        l.modelIdxs.append(ySelector.model().index(row, 0, baseModelIdx))
-      else:
-        l.modelIdxs.append(ySelector.model().index(row, 0))
-      l.update_y_selector(ySelector, l.widgets[-1], l.modelIdxs[-1])
-      row += 1
-  def select(self, name, ySelector, idx, fullName = ""):
-    if name == fullName:
-      selection = ySelector.selectionModel()
-      selection.select(self.modelIdxs[idx], QtCore.QItemSelectionModel.Select)
-      ySelector.setSelectionModel(selection)
-      parent = self.parent
-      while parent is not None and idx < len(parent.widgets):
-        parent.widgets[idx].setExpanded(True)
-        parent = parent.parent
-    else:
-      for l in self.leafs:
-        if len(fullName):
-          fName = fullName + "_" + l.name
-        else:
-          fName = l.name
-        if name.startswith(fName):
-          l.select(name, ySelector, idx, fName)
-  def __print(self, indent):
-    ret = "\n"
-    if self.name is not None:
-      ret = " "*indent + "| " + self.name + '\n'
-    for l in self.leafs:
-      ret += l.__print(indent + 1)
-    return ret
-  def __str__(self):
-    return self.__print(-1)
+# Filter for KeyTree.get that only keeps numeric entries, lazy entries are not loaded
+def is_numeric(data, k):
+  return not data.is_string(k)
 
 class FilterRightClick(QtCore.QObject):
   def __init__(self, parent):
@@ -118,71 +34,6 @@ class FilterRightClick(QtCore.QObject):
         return True
     return False
 
-class SpecialPlot(object):
-  def __init__(self, name, figure, idx, special_id):
-    self.figure = figure
-    self.idx = idx
-    self.name = name
-    self.id = special_id
-    self.added = []
-    if idx == 0:
-      self.remove = self.figure.remove_plot_left
-    else:
-      self.remove = self.figure.remove_plot_right
-    if special_id == "diff":
-      self.__plot = self.__add_diff
-    elif special_id == "rpy":
-      self.__plot = self.__add_rpy
-    elif special_id == "r":
-      self.__plot = self.__add_roll
-    elif special_id == "p":
-      self.__plot = self.__add_pitch
-    elif special_id == "y":
-      self.__plot = self.__add_yaw
-    else:
-      print("Cannot handle this special plot: {}".format(special_id))
-    self.plot()
-  def __add_diff(self):
-    added = filter(lambda x: re.match("{}($|_.*$)".format(self.name), x) is not None, self.figure.data.keys())
-    if self.idx == 0:
-      add_fn = self.figure.add_diff_plot_left
-    else:
-      add_fn = self.figure.add_diff_plot_right
-    for a in added:
-      label = "{}_diff".format(a)
-      if add_fn(self.figure.x_data, a, label):
-        self.added.append(label)
-  def __add_rpy(self):
-    if self.idx == 0:
-      add_fn = self.figure.add_rpy_plot_left
-    else:
-      add_fn = self.figure.add_rpy_plot_right
-    if add_fn(self.figure.x_data, self.name):
-      self.added = [ "{}_{}".format(self.name, s) for s in ["roll", "pitch", "yaw"] ]
-  def __add_roll(self):
-    if self.idx == 0:
-      add_fn = self.figure.add_roll_plot_left
-    else:
-      add_fn = self.figure.add_roll_plot_right
-    if add_fn(self.figure.x_data, self.name):
-      self.added = [ "{}_{}".format(self.name, "roll") ]
-  def __add_pitch(self):
-    if self.idx == 0:
-      add_fn = self.figure.add_pitch_plot_left
-    else:
-      add_fn = self.figure.add_pitch_plot_right
-    if add_fn(self.figure.x_data, self.name):
-      self.added = [ "{}_{}".format(self.name, "pitch") ]
-  def __add_yaw(self):
-    if self.idx == 0:
-      add_fn = self.figure.add_yaw_plot_left
-    else:
-      add_fn = self.figure.add_yaw_plot_right
-    if add_fn(self.figure.x_data, self.name):
-      self.added = [ "{}_{}".format(self.name, "yaw") ]
-  def plot(self):
-    self.__plot()
-
 class RemoveSpecialPlotButton(SpecialPlot, QtWidgets.QPushButton):
   def __init__(self, name, logtab, idx, special_id):
     self.logtab = logtab
@@ -229,18 +80,14 @@ class XYSelectorDialog(QtWidgets.QDialog):
   def __init__(self, parent, data):
     self.setWindowTitle("Add X/Y data to the plot")
     self.data = data
-    self.tree_view = TreeView()
-    for k in sorted(data.keys()):
-      if type(data[k][0]) is not unicode:
-        self.tree_view.add(k.split('_'))
-    self.tree_view.simplify()
-    self.treeSelector = QtWidgets.QTreeWidget(self)
+    self.tree_view = KeyTree.get(data, is_numeric)
+    self.treeSelector = QtWidgets.QTreeView(self)
     self.treeSelector.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
     self.treeSelector.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectItems)
-    self.treeSelector.setColumnCount(1)
-    self.treeSelector.itemClicked.connect(self.itemClicked)
+    self.treeSelector.setUniformRowHeights(True)
+    self.treeSelector.setModel(KeyTreeModel(self.tree_view, self.treeSelector))
+    self.treeSelector.clicked.connect(self.itemClicked)
     self.treeSelector.header().setVisible(False)
-    self.tree_view.update_y_selector(self.treeSelector, self.treeSelector)
     self.layout.addRow(self.treeSelector)
 
     self.xLabel = QtWidgets.QLabel(self)
@@ -252,30 +99,31 @@ class XYSelectorDialog(QtWidgets.QDialog):
     self.nextLabel = 0
     self.labels = [self.xLabel, self.yLabel]
 
-  def itemClicked(self, item, col):
-    if item.isSelected():
+  def itemClicked(self, index):
+    item = index.internalPointer()
+    selection = self.treeSelector.selectionModel()
+    if selection.isSelected(index):
       if not item.hasData:
-        childs = [ k for k in self.data.keys() if k.startswith("{}_".format(item.actualText)) ]
-        childs.sort()
+        childs = sorted(item.keys())
         if len(childs) == len(self.labels) and all([len(l.text()) == 0 for l in self.labels]):
           [ l.setText(c) for c,l in zip(childs, self.labels) ]
           self.nextLabel = len(self.labels)
         else:
-          item.setSelected(False)
+          selection.select(index, QtCore.QItemSelectionModel.Deselect)
       else:
         if self.nextLabel < len(self.labels):
-          self.labels[self.nextLabel].setText(item.actualText)
+          self.labels[self.nextLabel].setText(item.dataName)
           while self.nextLabel < len(self.labels) and len(self.labels[self.nextLabel].text()) != 0:
             self.nextLabel += 1
         else:
-          item.setSelected(False)
+          selection.select(index, QtCore.QItemSelectionModel.Deselect)
     else:
       if not item.hasData:
         [ label.setText("") for label in self.labels ]
         self.nextLabel = 0
         return
       for label in self.labels:
-        if label.text() == item.actualText:
+        if label.text() == item.dataName:
           label.setText("")
           break
       for i, label in enumerate(self.labels):
@@ -352,7 +200,6 @@ class MCLogTab(QtWidgets.QWidget):
     self.ui = ui.MCLogTab()
     self.ui.setupUi(self)
     def setupSelector(ySelector):
-      ySelector.setHeaderLabels(["Data"])
       ySelector.header().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
       ySelector.viewport().installEventFilter(FilterRightClick(ySelector))
     setupSelector(self.ui.y1Selector)
@@ -386,6 +233,12 @@ class MCLogTab(QtWidgets.QWidget):
     self.ui.y1SelectorLayout.addWidget(self.modeSelector)
     self.modeSelector.currentTextChanged.connect(self.changeCanvasMode)
 
+    self.searchBox = QtWidgets.QLineEdit(self)
+    self.searchBox.setPlaceholderText("Search")
+    self.searchBox.setClearButtonEnabled(True)
+    self.searchBox.textChanged.connect(lambda: self.update_y_selectors())
+    self.ui.y1SelectorLayout.insertWidget(0, self.searchBox)
+
     self.data = None
     self.rm = None
     self.ui.canvas.x_data = 't'
@@ -423,6 +276,7 @@ class MCLogTab(QtWidgets.QWidget):
       self.activeSelectors = [self.XYZSelector1]
     self.activeCanvas.show()
     [ s.show() for s in self.activeSelectors ]
+    self.searchBox.setVisible(type_ is PlotType.TIME)
 
   def setData(self, data):
     self.data = data
@@ -430,6 +284,11 @@ class MCLogTab(QtWidgets.QWidget):
       c.setData(data)
     self.update_y_selectors()
 
+  # Update the plots when the data grows
+  def refresh(self):
+    if self.data is not None and self.activeCanvas.x_data in self.data:
+      self.activeCanvas.refresh()
+
   def setGridStyles(self, gridStyles):
     for c in [self.ui.canvas, self.XYCanvas, self._3DCanvas]:
       c._left().grid = copy.deepcopy(gridStyles['left'])
@@ -449,38 +308,13 @@ class MCLogTab(QtWidgets.QWidget):
     if self.rm is None:
       return
     def setQNames(ySelector):
-      qList = ySelector.findItems("q", QtCore.Qt.MatchStartsWith)
-      qList += ySelector.findItems("alpha", QtCore.Qt.MatchStartsWith)
-      qList += ySelector.findItems("error", QtCore.Qt.MatchStartsWith)
-      qList += ySelector.findItems("tau", QtCore.Qt.MatchStartsWith)
-      def update_child_display(items):
-        for itm in items:
-          cCount = itm.childCount()
-          if cCount == 0:
-            if itm.originalText.isdigit():
-              jIndex = int(itm.originalText)
-              if jIndex < len(self.rm.ref_joint_order()):
-                itm.displayText = self.rm.ref_joint_order()[jIndex]
-          else:
-            update_child_display([itm.child(i) for i in range(cCount)])
-      update_child_display(qList)
+      if ySelector.model() is not None:
+        ySelector.model().setJointNames(self.rm.ref_joint_order())
     setQNames(self.ui.y1Selector)
     setQNames(self.ui.y2Selector)
-    bounds = self.rm.bounds()
     if self.data is None:
       return
-    for i, jn in enumerate(self.rm.ref_joint_order()):
-      if "qIn_limits_lower_{}".format(i) in self.data:
-        self.data["qIn_limits_lower_{}".format(i)].fill(bounds[0][jn][0])
-        self.data["qIn_limits_upper_{}".format(i)].fill(bounds[1][jn][0])
-        self.data["qOut_limits_lower_{}".format(i)].fill(bounds[0][jn][0])
-        self.data["qOut_limits_upper_{}".format(i)].fill(bounds[1][jn][0])
-      if "tauIn_limits_lower_{}".format(i) in self.data:
-        self.data["tauIn_limits_lower_{}".format(i)].fill(bounds[4][jn][0])
-        self.data["tauIn_limits_upper_{}".format(i)].fill(bounds[5][jn][0])
-      if "tauOut_limits_lower_{}".format(i) in self.data:
-        self.data["tauOut_limits_lower_{}".format(i)].fill(bounds[4][jn][0])
-        self.data["tauOut_limits_upper_{}".format(i)].fill(bounds[5][jn][0])
+    set_joint_limits(self.data, self.rm)
 
 
   def on_xSelector_activated(self, canvas, k):
@@ -490,12 +324,12 @@ class MCLogTab(QtWidgets.QWidget):
     for _,s in self.specials.iteritems():
       s.plot()
 
-  @QtCore.Slot(QtWidgets.QTreeWidgetItem, int)
-  def on_y1Selector_itemClicked(self, item, col):
+  @QtCore.Slot(QtCore.QModelIndex)
+  def on_y1Selector_clicked(self, index):
     self.y1Selected = self.itemSelectionChanged(self.ui.y1Selector, self.y1Selected, 0)
 
-  @QtCore.Slot(QtWidgets.QTreeWidgetItem, int)
-  def on_y2Selector_itemClicked(self, item, col):
+  @QtCore.Slot(QtCore.QModelIndex)
+  def on_y2Selector_clicked(self, index):
     self.y2Selected = self.itemSelectionChanged(self.ui.y2Selector, self.y2Selected, 1)
 
   @QtCore.Slot(QtCore.QPoint)
@@ -515,20 +349,20 @@ class MCLogTab(QtWidgets.QWidget):
       remove_fn = self.ui.canvas.remove_plot_left
     else:
       remove_fn = self.ui.canvas.remove_plot_right
-    selected_items = [(i.actualText,i.hasData) for i in ySelector.selectedItems()]
-    def is_selected(s, x):
-      if s[1]:
-        return x == s[0]
-      return re.match("{}($|_.*$)".format(s[0]), x) is not None
-    selected = sorted(filter(lambda x: any([is_selected(s, x) for s in selected_items]), self.data.keys()))
-    def find_item(s):
-      itm = QtWidgets.QTreeWidgetItemIterator(ySelector)
-      while itm:
-        if itm.value().actualText == s:
-          return itm.value()
-        itm += 1
-      return None
-    legends = [itm.actualText.replace(itm.originalText, itm.displayText) for itm in [ find_item(s) for s in selected ] ]
+    model = ySelector.model()
+    selected = set()
+    for index in ySelector.selectionModel().selectedIndexes():
+      item = index.internalPointer()
+      if item.hasData:
+        selected.add(item.dataName)
+      else:
+        selected.update(item.keys())
+    # Entries hidden by the search are still selected
+    hidden = [ s for s in prevSelected if self.tree_view.find(s) is None ]
+    selected = sorted(selected)
+    items = [ self.tree_view.find(s) for s in selected ]
+    legends = [itm.dataName.replace(itm.name, model.displayText(itm)) for itm in items]
+    selected = selected + hidden
     for s,l in zip(selected, legends):
       if s not in prevSelected:
         add_fn(self.x_data, s, l)
@@ -539,44 +373,71 @@ class MCLogTab(QtWidgets.QWidget):
     return selected
 
   def update_y_selectors(self):
+    if self.data is None:
+      return
     canvas = self.ui.canvas
-    self.ui.y1Selector.clear()
-    self.ui.y2Selector.clear()
-    self.tree_view = TreeView()
-    for k in sorted(self.data.keys()):
-      self.tree_view.add(k.split('_'))
-    self.tree_view.simplify()
+    query = self.searchBox.text()
+    if len(query.strip()):
+      self.tree_view = KeyTree.build(KeyIndex.get(self.data).search(query))
+    else:
+      self.tree_view = KeyTree.get(self.data)
     def update_y_selector(ySelector):
-      self.tree_view.update_y_selector(ySelector, ySelector)
+      model = ySelector.model()
+      if model is None or model.tree is not self.tree_view:
+        ySelector.setModel(KeyTreeModel(self.tree_view, ySelector))
+        if self.rm is not None:
+          ySelector.model().setJointNames(self.rm.ref_joint_order())
+        if model is not None:
+          model.deleteLater()
+      else:
+        ySelector.clearSelection()
+      if self.tree_view is not KeyTree.get(self.data):
+        # Show all the results of small searches
+        if len(self.tree_view.nodes) < 500:
+          ySelector.expandAll()
+        return
       ySelector.resizeColumnToContents(0)
       cWidth = ySelector.sizeHintForColumn(0)
       ySelector.setMaximumWidth(cWidth + 75)
     update_y_selector(self.ui.y1Selector)
     update_y_selector(self.ui.y2Selector)
-    y1 = filter(lambda k: k in self.data.keys(), canvas._left().plots.keys())
-    [ self.tree_view.select(y, self.ui.y1Selector, 0) for y in y1 ]
-    y2 = filter(lambda k: k in self.data.keys(), canvas._right().plots.keys())
-    [ self.tree_view.select(y, self.ui.y2Selector, 1) for y in y2 ]
-    poly = filter(lambda k: k in self.data.keys(), canvas._polygons().plots.keys())
-    [ self.tree_view.select(y, self.ui.y1Selector, 0) for y in poly ]
+    y1 = filter(lambda k: k in self.data, canvas._left().plots.keys())
+    [ self.select(self.ui.y1Selector, y) for y in y1 ]
+    y2 = filter(lambda k: k in self.data, canvas._right().plots.keys())
+    [ self.select(self.ui.y2Selector, y) for y in y2 ]
+    poly = filter(lambda k: k in self.data, canvas._polygons().plots.keys())
+    [ self.select(self.ui.y1Selector, y) for y in poly ]
+
+  # Select the entry y in ySelector and show it
+  def select(self, ySelector, y):
+    item = self.tree_view.find(y)
+    if item is None:
+      return
+    index = ySelector.model().indexOf(item)
+    ySelector.selectionModel().select(index, QtCore.QItemSelectionModel.Select)
+    parent = index.parent()
+    while parent.isValid():
+      ySelector.expand(parent)
+      parent = parent.parent()
 
   def showCustomMenu(self, ySelector, point, idx):
-    item = ySelector.itemAt(point)
-    if item is None:
+    index = ySelector.indexAt(point)
+    if not index.isValid():
       return
+    item = index.internalPointer()
     menu = QtWidgets.QMenu(ySelector)
     addedAction = False
-    action = QtWidgets.QAction(u"Plot diff".format(item.actualText), menu)
-    action.triggered.connect(lambda: RemoveSpecialPlotButton(item.actualText, self, idx, "diff"))
+    action = QtWidgets.QAction(u"Plot diff".format(item.dataName), menu)
+    action.triggered.connect(lambda: RemoveSpecialPlotButton(item.dataName, self, idx, "diff"))
     menu.addAction(action)
-    s = re.match('^(.*)_q?[wxyz]$', item.actualText)
+    s = re.match('^(.*)_q?[wxyz]$', item.dataName)
     if s is not None:
       for item_label, axis_label in [("RPY angles", "rpy"), ("ROLL angle", "r"), ("PITCH angle", "p"), ("YAW angle", "y")]:
-        action = QtWidgets.QAction(u"Plot {}".format(item_label, item.actualText), menu)
+        action = QtWidgets.QAction(u"Plot {}".format(item_label, item.dataName), menu)
         action.triggered.connect(lambda checked, label=axis_label: RemoveSpecialPlotButton(s.group(1), self, idx, label))
         menu.addAction(action)
     else:
-      quat_childs = filter(lambda x: x is not None, [ re.match('{}((_.+)*)_q?w$'.format(item.actualText), x) for x in self.data.keys() ])
+      quat_childs = filter(lambda x: x is not None, [ re.match('{}((_.+)*)_q?w$'.format(item.dataName), x) for x in KeyIndex.get(self.data).with_prefix(item.dataName) ])
       for qc in quat_childs:
         for item_label, axis_label in [("RPY angles", "rpy"), ("ROLL angle", "r"), ("PITCH angle", "p"), ("YAW angle", "y")]:
           if len(qc.group(1)):
@@ -584,7 +445,7 @@ class MCLogTab(QtWidgets.QWidget):
           else:
             action_text = u"Plot {}".format(item_label)
           action = QtWidgets.QAction(action_text, menu)
-          plot_name = item.actualText + qc.group(1)
+          plot_name = item.dataName + qc.group(1)
           action.triggered.connect(lambda checked, name=plot_name, label=axis_label: RemoveSpecialPlotButton(name, self, idx, label))
           menu.addAction(action)
     menu.exec_(ySelector.viewport().mapToGlobal(point))
@@ -597,36 +458,7 @@ class MCLogTab(QtWidgets.QWidget):
 
   @staticmethod
   def MakeFigure(type_, data, x, y1, y2, y1_label = None, y2_label = None, figure = None):
-    def labels(yN):
-      if type_ is PlotType.TIME:
-        return yN
-      elif type_ is PlotType.XY:
-        return [l for x,y,l in yN]
-      else:
-        return [l for x,y,z,l in yN]
-    if y1_label is None:
-      return MCLogTab.MakeFigure(type_, data, x, y1, y2, labels(y1), y2_label, figure)
-    if y2_label is None:
-      return MCLogTab.MakeFigure(type_, data, x, y1, y2, y1_label, labels(y2), figure)
-    if figure is None:
-      return MCLogTab.MakeFigure(type_, data, x, y1, y2, y1_label, y2_label, PlotFigure())
-    figure.setData(data)
-    if type_ is PlotType.TIME:
-      for y,yl in zip(y1, y1_label):
-        figure.add_plot_left(x, y, yl)
-      for y,yl in zip(y2, y2_label):
-        figure.add_plot_right(x, y, yl)
-    elif type_ is PlotType.XY:
-      for x,y,label in y1:
-        figure.add_plot_left_xy(x, y, label)
-      for x,y,label in y2:
-        figure.add_plot_right_xy(x, y, label)
-    else:
-      for x,y,z,label in y1:
-        figure.add_plot_left_xyz(x, y, z, label)
-      for x,y,z,label in y2:
-        figure.add_plot_right_xyz(x, y, z, label)
-    return figure
+    return MakeFigure(type_, data, x, y1, y2, y1_label, y2_label, figure)
 
   @staticmethod
   def MakePlot(parent, type_, x_data, y1, y2, y1_label = None, y2_label = None):
@@ -647,9 +479,9 @@ class MCLogTab(QtWidgets.QWidget):
     tab.setRobotModule(parent.rm)
     if type_ is PlotType.TIME:
       for y,yl in zip(y1, y1_label):
-        tab.tree_view.select(y, tab.ui.y1Selector, 0)
+        tab.select(tab.ui.y1Selector, y)
       for y,yl in zip(y2, y2_label):
-        tab.tree_view.select(y, tab.ui.y2Selector, 1)
+        tab.select(tab.ui.y2Selector, y)
       tab.y1Selected = y1
       tab.y2Selected = y2
     elif type_ is PlotType.XY:
@@ -666,45 +498,7 @@ class MCLogTab(QtWidgets.QWidget):
 
   @staticmethod
   def UserFigure(data, p, figure = None, special = None):
-    if figure is None:
-      return MCLogTab.UserFigure(data, p, MCLogTab.MakeFigure(p.type, data, p.x, p.y1, p.y2), special)
-    if special is None:
-      return MCLogTab.UserFigure(data, p, figure, lambda y, idx, id_: UserPlot(y, figure, idx, id_))
-    def set_label(label_fn, label_size_fn, label):
-      if len(label.text):
-        label_fn(label.text)
-        label_size_fn(label.fontsize)
-    set_label(figure.title, figure.title_fontsize, p.graph_labels.title)
-    set_label(figure.x_label, figure.x_label_fontsize, p.graph_labels.x_label)
-    set_label(figure.y1_label, figure.y1_label_fontsize, p.graph_labels.y1_label)
-    set_label(figure.y2_label, figure.y2_label_fontsize, p.graph_labels.y2_label)
-    def handle_yd(yds, idx):
-      for yd in yds:
-        match = re.match("(.*)_(.*)$", yd)
-        if match is None:
-          special(yd, idx, "diff")
-        elif match.group(2) in ["rpy", "r", "p", "y"]:
-          special(match.group(1), idx, match.group(2))
-        else:
-          special(match.group(1), idx, "diff")
-    handle_yd(p.y1d, 0)
-    handle_yd(p.y2d, 1)
-    if not isinstance(p.grid1, LineStyle):
-      figure._left().grid = LineStyle(**p.grid1)
-    else:
-      figure._left().grid = p.grid1
-    if figure._right() is not None:
-      if not isinstance(p.grid2, LineStyle):
-        figure._right().grid = LineStyle(**p.grid2)
-      else:
-        figure._right().grid = p.grid2
-    for y,s in p.style.iteritems():
-      figure.style_left(y, s)
-    for y,s in p.style2.iteritems():
-      figure.style_right(y, s)
-    for param, value in p.extra.iteritems():
-      getattr(figure, param)(value)
-    return figure
+    return UserFigure(data, p, figure, special)
 
   @staticmethod
   def UserPlot(parent, p):
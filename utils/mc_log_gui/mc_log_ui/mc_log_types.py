@@ -11,9 +11,7 @@ import os
 
 import numpy as np
 
-import matplotlib
-matplotlib.use('Qt5Agg')
-import matplotlib.pyplot as plt
+import matplotlib.cm
 
 class PlotSide(Enum):
   LEFT = 0
@@ -64,7 +62,7 @@ class ColorsSchemeConfiguration(object):
       self._select_custom_set(data['colors'])
   def _select_pyplot_set(self, name, ncolors):
     self.cm_ = name
-    cm = plt.cm.get_cmap(name)
+    cm = matplotlib.cm.get_cmap(name)
     self.ncolors_ = min(cm.N, ncolors)
     cm2rgb = (np.array(cm(x)[0:3]) for x in np.linspace(0, 1, self.ncolors_))
     self.colors_ = ['#%02x%02x%02x' % tuple((255 * rgb).astype(int)) for rgb in cm2rgb]
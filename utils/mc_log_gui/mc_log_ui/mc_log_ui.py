@@ -2,10 +2,7 @@
 # Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
 #
 
-import collections
 import copy
-import csv
-import ctypes
 import functools
 import json
 import numpy as np
@@ -13,14 +10,17 @@ import os
 import re
 import signal
 import sys
-import tempfile
 
 from functools import partial
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 import ui
-from mc_log_data import Data
+from mc_log_bin import BinLogReader
+from mc_log_compare import compare_logs, log_name
+from mc_log_data import LogData
+from mc_log_io import add_derived_entries, read_flat, read_csv, read_log, load_UserPlots, safe_float, set_joint_limits, UserPlot
+from mc_log_keytree import KeyIndex
 from mc_log_tab import MCLogTab
 from mc_log_types import LineStyle, TextWithFontSize, GraphLabels, ColorsSchemeConfiguration, PlotType
 from mc_log_utils import InitDialogWithOkCancel
@@ -30,94 +30,8 @@ try:
 except ImportError:
   mc_rbdyn = None
 
-UserPlot = collections.namedtuple('UserPlot', ['title', 'x', 'y1', 'y1d', 'y2', 'y2d', 'grid1', 'grid2', 'style', 'style2', 'graph_labels', 'extra', 'type'])
-
-def safe_float(v):
-    if len(v):
-        return float(v)
-    else:
-        return None
-
-def read_flat(f, tmp = False):
-    def read_size(fd):
-        return ctypes.c_size_t.from_buffer_copy(fd.read(ctypes.sizeof(ctypes.c_size_t))).value
-    def read_bool(fd):
-        return ctypes.c_bool.from_buffer_copy(fd.read(ctypes.sizeof(ctypes.c_bool))).value
-    def read_string(fd, size):
-        if size == 0:
-            return "".decode('ascii')
-        return fd.read(size).decode('ascii')
-    def read_array(fd, size):
-        return np.frombuffer(fd.read(size * ctypes.sizeof(ctypes.c_double)), np.double)
-    def read_string_array(fd, size):
-        return [ read_string(fd, read_size(fd)) for i in range(size) ]
-    data = Data()
-    with open(f, 'rb') as fd:
-        nrEntries = read_size(fd)
-        for i in range(nrEntries):
-            is_numeric = read_bool(fd)
-            key = read_string(fd, read_size(fd))
-            if is_numeric:
-                data[key] = read_array(fd, read_size(fd))
-            else:
-                data[key] = read_string_array(fd, read_size(fd))
-    if tmp:
-      os.unlink(f)
-    return data
-
-def read_csv(fpath, tmp = False):
-  data = Data()
-  string_entries = {}
-  with open(fpath) as fd:
-    reader = csv.DictReader(fd, delimiter=';')
-    for k in reader.fieldnames:
-      if not(len(k)):
-        continue
-      data[k] = []
-    for row in reader:
-      for k in reader.fieldnames:
-        if not(len(k)):
-          continue
-        try:
-          data[k].append(safe_float(row[k]))
-        except ValueError:
-          data[k].append(row[k].decode('ascii'))
-  for k in data:
-    if type(data[k][0]) is unicode:
-      continue
-    data[k] = np.array(data[k])
-  if tmp:
-    os.unlink(fpath)
-  return data
-
-def read_log(fpath, tmp = False):
-  if fpath.endswith('.bin'):
-    tmpf = tempfile.mkstemp(suffix = '.flat')[1]
-    os.system("mc_bin_to_flat {} {}".format(fpath, tmpf))
-    return read_log(tmpf, True)
-  elif fpath.endswith('.flat'):
-    return read_flat(fpath, tmp)
-  else:
-    return read_csv(fpath, tmp)
-
-def load_UserPlots(fpath):
-    if not os.path.exists(fpath):
-      return []
-    userPlotList = []
-    with open(fpath) as f:
-      userPlotList = [UserPlot(*x) for x in json.load(f)]
-      for i,plt in enumerate(userPlotList):
-        for y in plt.style:
-          plt.style[y] = LineStyle(**plt.style[y])
-        for y in plt.style2:
-          plt.style2[y] = LineStyle(**plt.style2[y])
-        if not isinstance(plt.graph_labels, GraphLabels):
-          for key, value in plt.graph_labels.items():
-            plt.graph_labels[key] = TextWithFontSize(**plt.graph_labels[key])
-          userPlotList[i] = plt._replace(graph_labels = GraphLabels(**plt.graph_labels))
-          plt = userPlotList[i]
-        userPlotList[i] = plt._replace(type = PlotType(plt.type))
-    return userPlotList
+# Period (ms) of the updates of a followed log
+FOLLOW_INTERVAL = 1000
 
 class RobotAction(QtWidgets.QAction):
   def __init__(self, display, parent):
@@ -629,9 +543,14 @@ class MCLogUI(QtWidgets.QMainWindow):
 
     self.tab_re = re.compile('^Plot [0-9]+$')
 
-    self.data = Data()
+    self.data = LogData()
     self.data.data_updated.connect(self.update_data)
 
+    # Reader and timer of the followed log, see follow
+    self.reader = None
+    self.followTimer = QtCore.QTimer(self)
+    self.followTimer.timeout.connect(self.update_follow)
+
     self.gridStyles = {'left': LineStyle(linestyle = '--'), 'right': LineStyle(linestyle = ':') }
     self.gridStyleFile = os.path.expanduser("~") + "/.config/mc_log_ui/grid_style.json"
     if os.path.exists(self.gridStyleFile):
@@ -919,6 +838,25 @@ class MCLogUI(QtWidgets.QMainWindow):
     if len(fpath):
       self.load_csv(fpath)
 
+  @QtCore.Slot()
+  def on_actionFollow_triggered(self):
+    fpath = QtWidgets.QFileDialog.getOpenFileName(self, "Log file", filter = "Binary log (*.bin)")[0]
+    if len(fpath):
+      self.follow(fpath)
+
+  @QtCore.Slot()
+  def on_actionCompare_triggered(self):
+    fpaths = QtWidgets.QFileDialog.getOpenFileNames(self, "Log files")[0]
+    if not len(fpaths):
+      return
+    text, ok = QtWidgets.QInputDialog.getText(self, "Align logs", "Align the logs on the start of the logs (empty) or on the first time an entry has a value (entry=value)")
+    if not ok:
+      return
+    align = None
+    if '=' in text:
+      align = tuple(s.strip() for s in text.split('=', 1))
+    self.compare(fpaths, align)
+
   @QtCore.Slot()
   def on_actionExit_triggered(self):
     QtWidgets.QApplication.quit()
@@ -980,30 +918,61 @@ class MCLogUI(QtWidgets.QMainWindow):
     self.ui.tabWidget.currentWidget().activeCanvas.axesDialog()
 
   def load_csv(self, fpath):
+    self.followTimer.stop()
+    self.reader = None
     self.data = read_log(fpath)
     self.data.data_updated.connect(self.update_data)
-    i = 0
-    while "qIn_{}".format(i) in self.data and "qOut_{}".format(i) in self.data:
-      self.data["error_q_{}".format(i)] = self.data["qOut_{}".format(i)] - self.data["qIn_{}".format(i)]
-      self.data["qIn_limits_lower_{}".format(i)] = np.full_like(self.data["qIn_{}".format(i)], 0)
-      self.data["qIn_limits_upper_{}".format(i)] = np.full_like(self.data["qIn_{}".format(i)], 0)
-      self.data["qOut_limits_lower_{}".format(i)] = self.data["qIn_limits_lower_{}".format(i)]
-      self.data["qOut_limits_upper_{}".format(i)] = self.data["qIn_limits_upper_{}".format(i)]
-      i += 1
-    i = 0
-    while "tauIn_{}".format(i) in self.data:
-      self.data["tauIn_limits_lower_{}".format(i)] = np.full_like(self.data["tauIn_{}".format(i)], 0)
-      self.data["tauIn_limits_upper_{}".format(i)] = np.full_like(self.data["tauIn_{}".format(i)], 0)
-      i += 1
-    while "tauOut_{}".format(i) in self.data:
-      self.data["tauOut_limits_lower_{}".format(i)] = np.full_like(self.data["tauOut_{}".format(i)], 0)
-      self.data["tauOut_limits_upper_{}".format(i)] = np.full_like(self.data["tauOut_{}".format(i)], 0)
-      i += 1
-    if 'perf_SolverBuildAndSolve' in self.data and 'perf_SolverSolve' in self.data:
-      self.data['perf_SolverBuild'] = self.data['perf_SolverBuildAndSolve'] - self.data['perf_SolverSolve']
+    add_derived_entries(self.data)
     self.update_data()
     self.setWindowTitle("MC Log Plotter - {}".format(os.path.basename(fpath)))
 
+  # Load several logs to compare them, see mc_log_compare.compare_logs
+  def compare(self, fpaths, align = None):
+    self.followTimer.stop()
+    self.reader = None
+    names = []
+    for f in fpaths:
+      names.append(log_name(f, names))
+    self.data = compare_logs([read_log(f) for f in fpaths], names, align)
+    self.data.data_updated.connect(self.update_data)
+    self.update_data()
+    self.setWindowTitle("MC Log Plotter - {}".format(", ".join(names)))
+
+  # Load a binary log that is being written and update the plots every FOLLOW_INTERVAL ms as it grows
+  def follow(self, fpath):
+    self.followTimer.stop()
+    self.reader = BinLogReader(fpath)
+    self.data = LogData()
+    self.data.data_updated.connect(self.update_data)
+    try:
+      self.reader.update(self.data)
+    except ValueError as exc:
+      self.reader = None
+      QtWidgets.QMessageBox.warning(self, "Cannot follow log", "{} is not a valid mc_rtc binary log ({})".format(fpath, exc))
+      return
+    add_derived_entries(self.data)
+    self.update_data()
+    self.setWindowTitle("MC Log Plotter - {} (following)".format(os.path.basename(self.reader.fpath)))
+    self.followTimer.start(FOLLOW_INTERVAL)
+
+  def update_follow(self):
+    keys = set(self.data.keys())
+    try:
+      if not self.reader.update(self.data):
+        return
+    except ValueError as exc:
+      self.followTimer.stop()
+      print("Stopped following {}: {}".format(self.reader.fpath, exc))
+      return
+    # Derived entries must be computed again
+    add_derived_entries(self.data)
+    if self.rm is not None:
+      set_joint_limits(self.data, self.rm)
+    if set(self.data.keys()) != keys:
+      self.update_data()
+    for i in range(self.ui.tabWidget.count() - 1):
+      self.ui.tabWidget.widget(i).refresh()
+
   def setColorsScheme(self, scheme):
     self.colorsScheme = scheme
     for i in range(self.ui.tabWidget.count() - 1):
@@ -1043,16 +1012,16 @@ class MCLogUI(QtWidgets.QMainWindow):
         ("Encoders/Encoders velocity", "qIn", None, None, "qIn"),
         ("Command/Command velocity", "qOut", None, None, "qOut"),
         ]
+    index = KeyIndex.get(self.data)
     def validEntry(y):
-      return any([ y is None or (y is not None and k.startswith(y)) for k in self.data.keys() ])
+      return y is None or index.has_prefix(y)
     menuEntries = [ (n, y1, y2, y1d, y2d) for n, y1, y2, y1d, y2d in menuEntries if all([validEntry(y) for y in [y1, y2, y1d, y2d]]) ]
     for n, y1, y2, y1d, y2d in menuEntries:
       act = QtWidgets.QAction(n, self.ui.menuCommonPlots)
       act.triggered.connect(lambda checked, n_=n, y1_=y1, y2_=y2, y1d_=y1d, y2d_=y2: MCLogJointDialog(self, self.rm, n_, y1_, y2_, y1d_, y2d_).exec_())
       self.ui.menuCommonPlots.addAction(act)
     fSensors = set()
-    for k in self.data:
-      if k.find('ForceSensor') != -1:
+    for k in index.contains('ForceSensor'):
         fSensors.add(k[:k.find('ForceSensor')])
     if len(fSensors):
       fsMenu = QtWidgets.QMenu("Force sensors", self.ui.menuCommonPlots)
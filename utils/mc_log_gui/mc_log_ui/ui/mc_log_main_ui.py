@@ -47,9 +47,15 @@ class Ui_MainWindow(object):
         MainWindow.setStatusBar(self.statusbar)
         self.actionLoad = QtWidgets.QAction(MainWindow)
         self.actionLoad.setObjectName("actionLoad")
+        self.actionFollow = QtWidgets.QAction(MainWindow)
+        self.actionFollow.setObjectName("actionFollow")
+        self.actionCompare = QtWidgets.QAction(MainWindow)
+        self.actionCompare.setObjectName("actionCompare")
         self.actionExit = QtWidgets.QAction(MainWindow)
         self.actionExit.setObjectName("actionExit")
         self.menuFile.addAction(self.actionLoad)
+        self.menuFile.addAction(self.actionFollow)
+        self.menuFile.addAction(self.actionCompare)
         self.menuFile.addAction(self.actionExit)
         self.menubar.addAction(self.menuFile.menuAction())
         self.menubar.addAction(self.menuCommonPlots.menuAction())
@@ -68,6 +74,8 @@ class Ui_MainWindow(object):
         self.menuCommonPlots.setTitle(_translate("MainWindow", "Common plots"))
         self.menuUserPlots.setTitle(_translate("MainWindow", "User plots"))
         self.actionLoad.setText(_translate("MainWindow", "Load..."))
+        self.actionFollow.setText(_translate("MainWindow", "Follow..."))
+        self.actionCompare.setText(_translate("MainWindow", "Compare..."))
         self.actionExit.setText(_translate("MainWindow", "Exit"))
 
 from mc_log_ui.mc_log_tab import MCLogTab
@@ -16,12 +16,11 @@ class Ui_MCLogTab(object):
         self.horizontalLayout.setObjectName("horizontalLayout")
         self.y1SelectorLayout = QtWidgets.QVBoxLayout()
         self.y1SelectorLayout.setObjectName("y1SelectorLayout")
-        self.y1Selector = QtWidgets.QTreeWidget(MCLogTab)
+        self.y1Selector = QtWidgets.QTreeView(MCLogTab)
         self.y1Selector.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
         self.y1Selector.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectItems)
-        self.y1Selector.setColumnCount(1)
+        self.y1Selector.setUniformRowHeights(True)
         self.y1Selector.setObjectName("y1Selector")
-        self.y1Selector.headerItem().setText(0, "1")
         self.y1Selector.header().setVisible(True)
         self.y1SelectorLayout.addWidget(self.y1Selector)
         self.horizontalLayout.addLayout(self.y1SelectorLayout)
@@ -33,11 +32,10 @@ class Ui_MCLogTab(object):
         self.horizontalLayout.addLayout(self.verticalLayout)
         self.y2SelectorLayout = QtWidgets.QVBoxLayout()
         self.y2SelectorLayout.setObjectName("y2SelectorLayout")
-        self.y2Selector = QtWidgets.QTreeWidget(MCLogTab)
+        self.y2Selector = QtWidgets.QTreeView(MCLogTab)
         self.y2Selector.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
-        self.y2Selector.setColumnCount(1)
+        self.y2Selector.setUniformRowHeights(True)
         self.y2Selector.setObjectName("y2Selector")
-        self.y2Selector.headerItem().setText(0, "1")
         self.y2Selector.header().setVisible(True)
         self.y2SelectorLayout.addWidget(self.y2Selector)
         self.horizontalLayout.addLayout(self.y2SelectorLayout)
@@ -5,29 +5,126 @@
 # Copyright 2015-2019 CNRS-UM LIRMM, CNRS-AIST JRL
 #
 
+from __future__ import print_function
+
+import argparse
 import json
+import multiprocessing
+import os
 import sys
+import time
 
 from mc_log_ui import *
 UserPlot.__new__.__defaults__ = (LineStyle(), LineStyle(), {}, {}, GraphLabels(), {}, PlotType(0))
 
-import matplotlib.pyplot as plt
-plt.rcParams['svg.fonttype'] = 'none'
+import matplotlib
+matplotlib.rcParams['svg.fonttype'] = 'none'
 
-def usage():
-    print "{} [log] [plots] [format=png]".format(sys.argv[0])
-    sys.exit(1)
+# Log and plots rendered by the workers, set before the pool is created so
+# that forked workers share them with the main process (columns of .flat and
+# .cflat logs are memory-mapped so they are also shared between the workers)
+_data = None
+_plots = []
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        usage()
-    data = read_log(sys.argv[1])
-    plots = load_UserPlots(sys.argv[2])
-    format_ = "png"
-    if len(sys.argv) > 3:
-        format_ = sys.argv[3]
-    for plot in plots:
-        figure = MCLogTab.UserFigure(data, plot)
+def render(args):
+    """Render _plots[i] to fpath, returns an entry of the index"""
+    i, fpath = args
+    plot = _plots[i]
+    entry = { "title": plot.title, "file": fpath }
+    start = time.time()
+    try:
+        figure = UserFigure(_data, plot)
         figure.fig.set_size_inches(30, 20)
-        figure.fig.savefig("{}.{}".format(plot.title, format_))
-        plt.close(figure.fig)
+        figure.fig.savefig(fpath)
+    except Exception as exc:
+        # Nothing was written
+        del entry["file"]
+        entry["error"] = "{}: {}".format(type(exc).__name__, exc)
+    entry["time"] = time.time() - start
+    return entry
+
+def log_directories(logs):
+    """Sub-directory of the figures of each log, the name of the log is
+    suffixed by a counter if several logs have the same name"""
+    out = []
+    for log in logs:
+        name = os.path.splitext(os.path.basename(log))[0]
+        dname = name
+        i = 1
+        while dname in out:
+            i += 1
+            dname = "{}-{}".format(name, i)
+        out.append(dname)
+    return out
+
+def output_path(out, log_dir, plot, format_):
+    name = "{}.{}".format(plot.title.replace(os.sep, '_'), format_)
+    if log_dir is not None:
+        out = os.path.join(out, log_dir)
+    if not os.path.exists(out):
+        os.makedirs(out)
+    return os.path.join(out, name)
+
+def export(logs, plots, format_ = "png", out = ".", jobs = 1):
+    """Render every plot for every log, returns the index of the outputs
+
+    Each log is loaded once then its plots are rendered by jobs processes
+    """
+    global _data, _plots
+    _plots = plots
+    # Forked workers are required to share the log
+    if not hasattr(os, 'fork'):
+        jobs = 1
+    index = []
+    log_dirs = log_directories(logs) if len(logs) > 1 else [None] * len(logs)
+    for log, log_dir in zip(logs, log_dirs):
+        start = time.time()
+        _data = read_log(log)
+        add_derived_entries(_data)
+        entry = { "log": log, "load_time": time.time() - start, "plots": [] }
+        tasks = [ (i, output_path(out, log_dir, p, format_)) for i, p in enumerate(plots) ]
+        if jobs > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(min(jobs, len(tasks)))
+            try:
+                entry["plots"] = pool.map(render, tasks, chunksize = 1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            entry["plots"] = [ render(t) for t in tasks ]
+        _data = None
+        index.append(entry)
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Render user plots of mc_log_ui for one or more logs",
+                                     usage = "%(prog)s [log] [plots] [format=png]\n       %(prog)s -p plots.json [-p ...] [options] log [log ...]")
+    parser.add_argument("args", nargs = "+", help = "logs (or log, plots and format if -p is not provided)")
+    parser.add_argument("-p", "--plots", action = "append", default = [], help = "user plots (JSON), can be repeated")
+    parser.add_argument("-f", "--format", default = None, help = "output format (default: png)")
+    parser.add_argument("-o", "--output", default = ".", help = "output directory, figures of each log go in a sub-directory if several logs are provided")
+    parser.add_argument("-j", "--jobs", type = int, default = multiprocessing.cpu_count(), help = "number of rendering processes (default: number of CPUs)")
+    parser.add_argument("-i", "--index", default = None, help = "write a JSON summary of the outputs to this file")
+    args = parser.parse_args()
+    logs = args.args
+    format_ = args.format
+    if not len(args.plots):
+        if len(args.args) < 2 or len(args.args) > 3:
+            parser.print_usage()
+            sys.exit(1)
+        logs = args.args[:1]
+        args.plots = args.args[1:2]
+        if len(args.args) > 2 and format_ is None:
+            format_ = args.args[2]
+    plots = []
+    for p in args.plots:
+        plots += load_UserPlots(p)
+    index = export(logs, plots, format_ or "png", args.output, max(args.jobs, 1))
+    if args.index is not None:
+        with open(args.index, 'w') as f:
+            json.dump(index, f, indent = 2)
+    failed = [ (l["log"], p) for l in index for p in l["plots"] if "error" in p ]
+    for log, p in failed:
+        print("Failed to plot {} for {}: {}".format(p["title"], log, p["error"]))
+    if len(failed):
+        sys.exit(1)
@@ -0,0 +1,47 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mc_log_ui'))
+
+import numpy as np
+
+from mc_log_data import LogData, difference
+from mc_log_strings import StringColumn
+
+def not_loaded():
+  raise AssertionError("The entry should not be loaded")
+
+def test_is_string_lazy():
+  data = LogData()
+  data.set_lazy('numeric', not_loaded)
+  data.set_lazy('string', not_loaded, string = True)
+  data.set_derived('derived', lambda d: not_loaded())
+  assert not data.is_string('numeric')
+  assert data.is_string('string')
+  assert not data.is_string('derived')
+
+def test_is_string_loaded():
+  data = LogData()
+  data['numeric'] = np.zeros(3)
+  data['string'] = StringColumn.from_list([u'a', u'b', u'b'])
+  data.set_lazy('lazy', lambda: StringColumn.from_list([u'a']), string = True)
+  assert not data.is_string('numeric')
+  assert data.is_string('string')
+  assert data.is_string('lazy')
+  data['lazy']
+  assert data.is_string('lazy')
+  # Replacing a lazy entry drops what was recorded about it
+  data.set_lazy('other', not_loaded, string = True)
+  data['other'] = np.zeros(3)
+  assert not data.is_string('other')
+
+def test_derived():
+  data = LogData()
+  data['a'] = np.array([1., 2.])
+  data['b'] = np.array([0., 1.])
+  data.set_derived('diff', difference('a', 'b'))
+  assert np.array_equal(data['diff'], [1., 1.])
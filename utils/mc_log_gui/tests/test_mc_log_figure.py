@@ -0,0 +1,64 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mc_log_ui'))
+
+import numpy as np
+
+from mc_log_data import LogData
+from mc_log_figure import PlotFigure
+
+def test_refresh_xy_filter():
+  data = LogData()
+  data['t'] = np.array([0., 1., 2.])
+  data['x'] = np.array([0., 1., 2.])
+  data['y'] = np.array([0., 1., 4.])
+  # Time entry used to filter the XY plot, NaN samples are not plotted
+  data['t_filter'] = np.array([0., np.nan, 2.])
+  figure = PlotFigure()
+  figure.setData(data)
+  axis = figure._left()
+  assert axis.add_plot_xy('x', 'y', 'xy', 't_filter')
+  assert figure.add_plot_left('t', 'y', 'y')
+  assert np.array_equal(np.isnan(axis.filtered['xy'][1]), [False, True, False])
+  # The log grows, the new samples are filtered with the new time entry
+  data['t'] = np.array([0., 1., 2., 3., 4.])
+  data['x'] = np.array([0., 1., 2., 3., 4.])
+  data['y'] = np.array([0., 1., 4., 9., 16.])
+  data['t_filter'] = np.array([0., np.nan, 2., np.nan, 4.])
+  figure.refresh()
+  assert axis.data['xy'][3] is data['t_filter']
+  x, y, z = axis.filtered['xy']
+  assert len(x) == 5 and len(y) == 5
+  assert np.array_equal(np.isnan(x), [False, True, False, True, False])
+  assert np.array_equal(np.isnan(y), [False, True, False, True, False])
+  assert y[4] == 16.
+  # Other plots use the new time
+  assert axis.data['y'][0] is data['t']
+  assert axis.data['y'][1] is data['y']
+
+def test_refresh_filter_cache():
+  data = LogData()
+  figure = PlotFigure()
+  axis = figure._left()
+  for i in range(10):
+    n = 10 * (i + 1)
+    data['t'] = np.arange(n, dtype = np.float64)
+    data['x'] = np.arange(n, dtype = np.float64)
+    data['y'] = np.arange(n, dtype = np.float64)
+    if i == 0:
+      figure.setData(data)
+      assert axis.add_plot_xy('x', 'y', 'xy', 't')
+    else:
+      figure.refresh()
+    # Only the filtered x/y of the last refresh and the mask of t are kept
+    assert len(axis._filtered) == 2
+    assert len(axis._masks) == 1
+    assert len(axis.filtered['xy'][0]) == n
+  axis.remove_plot('xy')
+  assert len(axis._filtered) == 0
+  assert len(axis._masks) == 0
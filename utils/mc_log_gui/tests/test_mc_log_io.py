@@ -0,0 +1,34 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mc_log_ui'))
+
+import numpy as np
+
+from mc_log_data import LogData
+from mc_log_io import add_derived_entries
+
+def test_derived_entries():
+  data = LogData()
+  for i in range(2):
+    data["qIn_{}".format(i)] = np.array([0., 1.])
+    data["qOut_{}".format(i)] = np.array([1., 3.])
+    data["tauIn_{}".format(i)] = np.zeros(2)
+  for i in range(3):
+    data["tauOut_{}".format(i)] = np.zeros(2)
+  add_derived_entries(data)
+  for i in range(2):
+    assert np.array_equal(data["error_q_{}".format(i)], [1., 2.])
+    for q in ["qIn", "qOut", "tauIn"]:
+      for bound in ["lower", "upper"]:
+        assert np.array_equal(data["{}_limits_{}_{}".format(q, bound, i)], [0., 0.])
+  assert "tauIn_limits_lower_2" not in data
+  # The tauOut limits do not depend on the number of tauIn entries
+  for i in range(3):
+    for bound in ["lower", "upper"]:
+      assert np.array_equal(data["tauOut_limits_{}_{}".format(bound, i)], [0., 0.])
+  assert "tauOut_limits_lower_3" not in data
@@ -0,0 +1,26 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mc_log_ui'))
+
+import numpy as np
+
+from mc_log_lod import LODSeries
+
+def test_nan_gaps():
+  x = np.arange(100000, dtype = np.float64)
+  y = np.sin(x / 1000.)
+  y[1000:2000] = np.nan
+  y[50001] = np.nan
+  lod = LODSeries(x, y)
+  with warnings.catch_warnings():
+    warnings.simplefilter('error')
+    dx, dy = lod.decimate(None, 100)
+  assert len(dx) < len(x)
+  assert np.nanmax(dy) == np.nanmax(y)
+  assert np.nanmin(dy) == np.nanmin(y)
@@ -0,0 +1,80 @@
+#
+# Copyright 2015-2020 CNRS-UM LIRMM, CNRS-AIST JRL
+#
+
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mc_log_ui'))
+
+import numpy as np
+import pytest
+
+from mc_log_bin import BinLogReader
+from mc_log_data import LogData
+from mc_log_io import read_log
+from mc_log_strings import StringColumn
+
+# Set by CTest, see tests/CMakeLists.txt
+WRITE_TEST_LOG = os.environ.get('MC_LOG_UI_WRITE_TEST_LOG')
+MC_BIN_UTILS = os.environ.get('MC_LOG_UI_MC_BIN_UTILS')
+
+pytestmark = pytest.mark.skipif(WRITE_TEST_LOG is None or MC_BIN_UTILS is None,
+                                reason = "the log writer and mc_bin_utils are provided by CTest")
+
+# Number of rows written by tests/writeTestLog.cpp
+N = 1000
+
+@pytest.fixture(scope = 'module')
+def logs(tmpdir_factory):
+  """The log written by mc_rtc::Logger and its conversions, indexed by extension"""
+  out = tmpdir_factory.mktemp('logs')
+  bin_log = str(out.join('test.bin'))
+  subprocess.check_call([WRITE_TEST_LOG, bin_log])
+  paths = { 'bin': bin_log }
+  for ext in ['flat', 'cflat']:
+    paths[ext] = str(out.join('test.{}'.format(ext)))
+    subprocess.check_call([MC_BIN_UTILS, 'convert', bin_log, paths[ext]])
+  return paths
+
+def check_log(data):
+  i = np.arange(N, dtype = np.float64)
+  before = i < N / 2
+  nan = np.full(N, np.nan)
+  assert sorted(data.keys()) == ['bool', 'double', 'int', 'string', 't', 'vector_x', 'vector_y', 'vector_z']
+  for k in data.keys():
+    assert len(data[k]) == N
+  assert np.allclose(data['t'], 0.005 * i)
+  assert np.array_equal(data['int'], i)
+  np.testing.assert_array_equal(data['double'], np.where(i % 10 == 0, nan, 0.5 * i))
+  for s, scale in [('x', 1.), ('y', 2.), ('z', 3.)]:
+    np.testing.assert_array_equal(data['vector_' + s], np.where(before, scale * i, nan))
+  # Missing rows of a bool entry are 0
+  assert np.array_equal(data['bool'], np.where(before, 0., i % 2 == 0))
+  assert isinstance(data['string'], StringColumn)
+  assert list(data['string']) == [str(r // 10) for r in range(N)]
+  assert not data.is_string('double') and data.is_string('string')
+
+@pytest.mark.parametrize('ext', ['bin', 'flat', 'cflat'])
+def test_read_log(logs, ext):
+  check_log(read_log(logs[ext]))
+
+def test_read_growing_bin(logs, tmpdir):
+  """A log that is being written is read in several updates"""
+  with open(logs['bin'], 'rb') as fd:
+    content = fd.read()
+  path = str(tmpdir.join('growing.bin'))
+  data = LogData()
+  reader = BinLogReader(path)
+  # The first update stops in the middle of a frame
+  with open(path, 'wb') as fd:
+    fd.write(content[:len(content) // 3])
+  first = reader.update(data)
+  assert 0 < first < N
+  assert len(data['t']) == first
+  with open(path, 'ab') as fd:
+    fd.write(content[len(content) // 3:])
+  assert reader.update(data) == N - first
+  assert reader.update(data) == 0
+  check_log(data)